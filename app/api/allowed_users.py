@@ -9,9 +9,10 @@ from app.models.pydantic import (
     EmailSchema,
     ResponseMessage,
 )
+from app.helpers.http_caching import NOT_MODIFIED_RESPONSE, ConditionalGet
 from app.models.tortoise import AllowedUsers, Users
 from app.services.v1.auth import RoleChecker
-from app.services.v1.mail import Mailer
+from app.services.v2.mail import Mailer
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
 from fastapi.param_functions import Depends
@@ -80,7 +81,11 @@ async def post_allowed_users(
 @router.get(
     "/",
     response_model=List[AllowedUsersResponseSchema],
-    dependencies=[Depends(RoleChecker(["admin"]))],
+    dependencies=[
+        Depends(RoleChecker(["admin"])),
+        Depends(ConditionalGet(AllowedUsers)),
+    ],
+    responses=NOT_MODIFIED_RESPONSE,
 )
 async def get_allowed_users():
     return await AllowedUsers.all()
@@ -1,6 +1,6 @@
 import os
 
-from app.config import Settings, get_fastapi_mail_config, get_settings
+from app.config import get_fastapi_mail_config
 from app.models.pydantic import (
     CreateUser,
     EmailSchema,
@@ -9,8 +9,13 @@ from app.models.pydantic import (
     User_Pydantic,
 )
 from app.models.tortoise import AllowedUsers, Roles, Users
-from app.services.v1.auth import Auth
-from app.services.v1.mail import Mailer
+from app.services.rate_limit import login_rate_limit
+from app.services.refresh_sessions import RefreshTokenReused, refresh_sessions
+from app.services.token_keys import get_key_ring
+from app.services.token_revocation import revocation_list
+from app.services.v1.auth import Auth, optional_oauth2_scheme
+from app.services.v2.mail import Mailer
+from app.services.invalidation import invalidation_bus
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_mail import ConnectionConfig
@@ -56,6 +61,7 @@ async def register(
             name="werknemer", description="User met algemene werknemers rechten"
         )
         await user.roles.add(role)
+        await invalidation_bus.publish("user_roles", user.id)
         await Mailer.send_welcome_message(
             email=EmailSchema(
                 recipient_addresses=[user.email],
@@ -84,18 +90,12 @@ async def register(
 
 
 @router.post("/activate_account", status_code=200)
-async def activate_account(
-    token: TokenSchema, settings: Settings = Depends(get_settings)
-):
+async def activate_account(token: TokenSchema):
     token = token.token
     invalid_token_error = HTTPException(status_code=400, detail="Deze link is ongeldig")
     # Check if token expiration date is reached
     try:
-        payload = jwt.decode(
-            token,
-            settings.secret_key.get_secret_value(),
-            algorithms=settings.token_algorithm,
-        )
+        payload = get_key_ring().decode(token)
     except jwt.JWTError:
         raise HTTPException(status_code=400, detail="Deze link is verlopen")
     # Check if scope of the token is valid
@@ -165,7 +165,7 @@ async def resent_activation_code(
         )
 
 
-@router.post("/login")
+@router.post("/login", dependencies=[Depends(login_rate_limit)])
 async def get_login_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
 ):
@@ -186,6 +186,7 @@ async def get_login_token(
         )
     access_token = Auth.get_access_token(email=user.email)
     refresh_token = Auth.get_refresh_token(email=user.email)
+    await refresh_sessions.start(user.id, refresh_token)
     return JSONResponse(
         {
             "access_token": access_token["token"],
@@ -196,7 +197,7 @@ async def get_login_token(
     )
 
 
-@router.post("/new-login")
+@router.post("/new-login", dependencies=[Depends(login_rate_limit)])
 async def get_new_login_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
 ):
@@ -217,6 +218,7 @@ async def get_new_login_token(
         )
     access_token = Auth.get_access_token(email=user.email)
     refresh_token = Auth.get_refresh_token(email=user.email)
+    await refresh_sessions.start(user.id, refresh_token)
     response = JSONResponse(
         {
             "access_token": f"{access_token['token']}",
@@ -233,27 +235,28 @@ async def get_new_login_token(
 
 
 @router.post("/refresh")
-async def refresh(request: Request, settings: Settings = Depends(get_settings)):
+async def refresh(request: Request):
     invalid_token_error = HTTPException(status_code=400, detail="Invalid token")
     # Check if token expiration date is reached
     try:
-        payload = jwt.decode(
-            request.cookies.get("refresh_token"),
-            settings.secret_key.get_secret_value(),
-            algorithms=settings.token_algorithm,
-        )
+        payload = get_key_ring().decode(request.cookies.get("refresh_token"))
     except jwt.JWTError:
         raise HTTPException(status_code=403, detail="Refresh toke is verlopen")
     # Check if scope of the token is valid
     if payload["scope"] != "refresh":
         raise invalid_token_error
-    user = await Users.get_or_none(email=payload["sub"])
-    # Check if token belongs to user and not already been used
-    if not user:
+    if revocation_list.is_revoked(payload.get("jti")):
         raise invalid_token_error
-    access_token = Auth.get_access_token(email=user.email)
-    refresh_token = Auth.get_refresh_token(email=user.email)
-    return JSONResponse(
+    # Exchange the token for a new one, it can't be used a second time
+    refresh_token = Auth.get_refresh_token(email=payload["sub"])
+    try:
+        session = await refresh_sessions.rotate(payload["jti"], refresh_token)
+    except RefreshTokenReused:
+        raise invalid_token_error
+    if session is None or not session.is_active:
+        raise invalid_token_error
+    access_token = Auth.get_access_token(email=session.email)
+    response = JSONResponse(
         {
             "access_token": access_token["token"],
             "refresh_token": refresh_token["token"],
@@ -261,33 +264,48 @@ async def refresh(request: Request, settings: Settings = Depends(get_settings)):
         },
         status_code=200,
     )
+    # The cookie has to follow the rotation, the old token can't be used again
+    response.set_cookie(
+        key="refresh_token",
+        value=refresh_token["token"],
+        httponly=True,
+        samesite=None,
+    )
+    return response
 
 
 @router.get("/new-refresh")
-async def refresh(request: Request, settings: Settings = Depends(get_settings)):
+async def new_refresh(request: Request):
     # get refresh token from cookie header
     refresh_token = request.cookies.get("refresh_token")
     if refresh_token is None:
         return Response(status_code=403)
     # Check if token expiration date is reached
     try:
-        payload = jwt.decode(
-            refresh_token,
-            settings.secret_key.get_secret_value(),
-            algorithms=settings.token_algorithm,
-        )
+        payload = get_key_ring().decode(refresh_token)
     except jwt.JWTError:
         raise HTTPException(status_code=403, detail="Refresh token is verlopen")
     # Check if scope of the token is valid
     if payload["scope"] != "refresh":
-        raise Response(status_code=400)
-    user = await Users.get_or_none(email=payload["sub"])
-    # Check if token belongs to user and not already been used
-    if not user:
-        raise Response(status_code=400)
-    access_token = Auth.get_access_token(email=user.email)
-    refresh_token = Auth.get_refresh_token(email=user.email)
-    return JSONResponse(
+        raise HTTPException(status_code=400, detail="Invalid token")
+    if revocation_list.is_revoked(payload.get("jti")):
+        raise HTTPException(status_code=403, detail="Refresh token is ingetrokken")
+    # Exchange the token for a new one, it can't be used a second time
+    refresh_token = Auth.get_refresh_token(email=payload["sub"])
+    try:
+        session = await refresh_sessions.rotate(payload["jti"], refresh_token)
+    except RefreshTokenReused:
+        raise HTTPException(
+            status_code=403, detail="Refresh token is al gebruikt, log opnieuw in"
+        )
+    if session is None:
+        raise HTTPException(status_code=403, detail="Refresh token is ingetrokken")
+    if not session.is_active:
+        raise HTTPException(
+            status_code=403, detail="Gebruiker is nog niet geactiveerd!"
+        )
+    access_token = Auth.get_access_token(email=session.email)
+    response = JSONResponse(
         {
             "access_token": access_token["token"],
             "refresh_token": refresh_token["token"],
@@ -295,6 +313,14 @@ async def refresh(request: Request, settings: Settings = Depends(get_settings)):
         },
         status_code=200,
     )
+    # The cookie has to follow the rotation, the old token can't be used again
+    response.set_cookie(
+        key="refresh_token",
+        value=refresh_token["token"],
+        httponly=True,
+        samesite=None,
+    )
+    return response
 
 
 @router.get("/forgot_password/{email}")
@@ -345,17 +371,11 @@ async def forgot_password(
 
 
 @router.post("/reset_password")
-async def reset_password(
-    reset_info: ResetPassword, settings: Settings = Depends(get_settings)
-):
+async def reset_password(reset_info: ResetPassword):
     invalid_token_error = HTTPException(status_code=400, detail="Deze link is ongeldig")
     # Check if token expiration date is reached
     try:
-        payload = jwt.decode(
-            reset_info.token,
-            settings.secret_key.get_secret_value(),
-            algorithms=settings.token_algorithm,
-        )
+        payload = get_key_ring().decode(reset_info.token)
     except jwt.JWTError:
         raise HTTPException(status_code=403, detail="Deze link is verlopen")
     # Check if scope of the token is valid
@@ -376,7 +396,11 @@ async def reset_password(
 
 
 @router.post("/logout")
-async def logout():
+async def logout(request: Request, token: str = Depends(optional_oauth2_scheme)):
+    # Revoke both tokens, so a copy of them can't be used anymore either
+    await revocation_list.revoke_token(token)
+    await revocation_list.revoke_token(request.cookies.get("refresh_token"))
+    await refresh_sessions.end(request.cookies.get("refresh_token"))
     response = JSONResponse({"detail": "Uitgelogd"}, status_code=200)
     response.delete_cookie(key="refresh_token")
     return response
@@ -2,13 +2,16 @@ from datetime import date
 from typing import List
 
 from app.helpers.excel_functions import excel_to_list_of_dicts
+from app.helpers.http_caching import NOT_MODIFIED_RESPONSE, check_validators
 from app.models.pydantic import BouwPlanDataModelIn, BouwPlanDataModelOut
 from app.models.tortoise import BouwPlan
-from fastapi import APIRouter, File, UploadFile
+from fastapi import APIRouter, File, Request, Response, UploadFile
 from fastapi.param_functions import Depends
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError, parse_obj_as
 
+from app.services.invalidation import invalidation_bus
+from app.services.reference_data import bouwplan_cache
 from app.services.v1.auth import get_current_active_user, RoleChecker
 
 router = APIRouter()
@@ -19,10 +22,12 @@ router = APIRouter()
     "/",
     dependencies=[Depends(RoleChecker(["admin", "werknemer", "monteur"]))],
     response_model=List[BouwPlanDataModelOut],
+    responses=NOT_MODIFIED_RESPONSE,
 )
-async def get_bouwplan(year: int):
-    bouwplannen = await BouwPlan.filter(year=year)
-    return bouwplannen
+async def get_bouwplan(year: int, request: Request, response: Response):
+    bouwplannen = await bouwplan_cache.get(year)
+    check_validators(request, response, bouwplannen.etag, bouwplannen.last_modified)
+    return bouwplannen.rows
 
 
 # TODO: Create test
@@ -66,5 +71,6 @@ async def upload_bouwplan(
         bouwplan["created_by"] = current_user.email
         bouwplan["last_modified_by"] = current_user.email
         await BouwPlan.create(**bouwplan)
+    await invalidation_bus.publish("bouwplannen", year)
     bouwplannen = await BouwPlan.filter(year=year)
     return bouwplannen
@@ -0,0 +1,34 @@
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.services.cache import cache_stats
+from app.services.db_pool import check_pool
+from app.services.v2.auth import RoleChecker
+
+log = logging.getLogger("uvicorn")
+
+router = APIRouter()
+
+
+@router.get("/live")
+async def live():
+    # The process is running and the event loop is responsive
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready():
+    # Only ready to get traffic when a database connection can be used
+    try:
+        status = await check_pool()
+    except Exception as e:
+        log.warning(f"Readiness check mislukt: {e!r}")
+        raise HTTPException(status_code=503, detail="Database niet beschikbaar")
+    return {"status": "ok", **status}
+
+
+@router.get("/caches", dependencies=[Depends(RoleChecker(["admin"]))])
+async def caches():
+    # Hits, misses and loads of the in-process caches of this worker, for admins only
+    return cache_stats()
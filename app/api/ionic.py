@@ -1,6 +1,17 @@
-from app.models.tortoise import LoginStatusDevices
-from app.services.v1.auth import Auth, get_current_user, get_current_active_user
-from fastapi import APIRouter, Form, HTTPException
+from typing import Optional
+
+from app.models.tortoise import LoginStatusDevices, RefreshSessions
+from app.services.rate_limit import login_rate_limit
+from app.services.refresh_sessions import RefreshTokenReused, refresh_sessions
+from app.services.token_keys import get_key_ring
+from app.services.token_revocation import revocation_list
+from app.services.v1.auth import (
+    Auth,
+    get_current_active_user,
+    oauth2_scheme,
+)
+from fastapi import APIRouter, Form, Header, HTTPException
+from jose import jwt
 from fastapi.responses import JSONResponse
 from starlette import status
 from fastapi.param_functions import Depends
@@ -15,38 +26,108 @@ async def hello_world():
 
 
 @router.get("/device_id_status")
-async def get_device_id_status(device_id: str):
-    login_status_device = await LoginStatusDevices.get_or_none(device_id=device_id)
+async def get_device_id_status(
+    device_id: str,
+    refresh_token: Optional[str] = Header(
+        default=None,
+        description=(
+            "The refresh token the device got last, from /login or from the "
+            "previous call of this route; it is replaced by the one in the response"
+        ),
+    ),
+):
+    """
+    New tokens for a device that is still logged in, in exchange for the refresh
+    token the device got last (header "refresh-token"). The device id alone is
+    not a credential: without the header, or with a token that isn't the device's
+    latest, the answer is 401 and the app has to log in again.
+
+    On Postgres the exchange is a single query. Otherwise, and to tell what was
+    wrong when it fails, the device and the token are checked step by step.
+    """
+    invalid_token_error = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Refresh token van dit device is ongeldig, log opnieuw in",
+    )
+    payload = _refresh_token_payload(refresh_token)
+    if payload is not None:
+        access_token = Auth.get_access_token(email=payload["sub"])
+        new_refresh_token = Auth.get_refresh_token(email=payload["sub"])
+        if await refresh_sessions.rotate_device(
+            device_id, payload["jti"], new_refresh_token, access_token["token"]
+        ):
+            return _device_tokens(access_token, new_refresh_token)
+
+    login_status_device = (
+        await LoginStatusDevices.filter(device_id=device_id)
+        .first()
+        .values("id", "logged_in", "user_id", "refresh_family_id")
+    )
     if login_status_device is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Dit device is nog niet ingelogd geweest",
         )
-    elif login_status_device.logged_in is False:
+    if login_status_device["logged_in"] is False:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Login status van dit device is: uitgelogd",
         )
-    else:
-        # opgeslagen token decrypten en een nieuwe token maken op basis van de claims
-        user = await get_current_user(
-            token=login_status_device.last_provided_access_token
-        )
-        access_token = Auth.get_access_token(email=user.email)
-        refresh_token = Auth.get_refresh_token(email=user.email)
-        login_status_device.last_provided_access_token = access_token["token"]
-        await login_status_device.save()
-        return JSONResponse(
-            {
-                "access_token": access_token["token"],
-                "refresh_token": refresh_token["token"],
-                "token_type": "bearer",
-            },
-            status_code=200,
+    if payload is None:
+        raise invalid_token_error
+    # Only a token of the device's own family is exchanged, so the token of another
+    # device isn't used up here
+    if not await RefreshSessions.exists(
+        jti=payload["jti"],
+        family_id=login_status_device["refresh_family_id"],
+        user_id=login_status_device["user_id"],
+    ):
+        raise invalid_token_error
+    try:
+        session = await refresh_sessions.rotate(payload["jti"], new_refresh_token)
+    except RefreshTokenReused:
+        raise invalid_token_error
+    if session is None:
+        raise invalid_token_error
+    if not session.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Gebruiker is nog niet geactiveerd!",
         )
+    access_token = Auth.get_access_token(email=session.email)
+    # Kept to revoke the access token on logout
+    await LoginStatusDevices.filter(id=login_status_device["id"]).update(
+        last_provided_access_token=access_token["token"]
+    )
+    return _device_tokens(access_token, new_refresh_token)
 
 
-@router.post("/login")
+def _refresh_token_payload(refresh_token: Optional[str]) -> Optional[dict]:
+    if refresh_token is None:
+        return None
+    try:
+        payload = get_key_ring().decode(refresh_token)
+    except jwt.JWTError:
+        return None
+    if payload.get("scope") != "refresh" or revocation_list.is_revoked(
+        payload.get("jti")
+    ):
+        return None
+    return payload
+
+
+def _device_tokens(access_token: dict, refresh_token: dict) -> JSONResponse:
+    return JSONResponse(
+        {
+            "access_token": access_token["token"],
+            "refresh_token": refresh_token["token"],
+            "token_type": "bearer",
+        },
+        status_code=200,
+    )
+
+
+@router.post("/login", dependencies=[Depends(login_rate_limit)])
 async def login_ionic(
     username: str = Form(default=""),
     password: str = Form(default=""),
@@ -68,6 +149,7 @@ async def login_ionic(
     else:
         access_token = Auth.get_access_token(email=user.email)
         refresh_token = Auth.get_refresh_token(email=user.email)
+        family_id = await refresh_sessions.start(user.id, refresh_token)
         # Kijken of er al een device login status aanwezig is, zo ja bijwerken, zo niet aanmaken
         device_login_status = await LoginStatusDevices.get_or_none(device_id=device_id)
         if device_login_status is None:
@@ -76,10 +158,19 @@ async def login_ionic(
                 logged_in=True,
                 user=user,
                 last_provided_access_token=access_token["token"],
+                refresh_family_id=family_id,
             )
         else:
+            # The previous login of the device ends
+            if device_login_status.refresh_family_id:
+                await refresh_sessions.revoke_family(
+                    device_login_status.refresh_family_id
+                )
             device_login_status.logged_in = True
+            # The device may have been handed over to someone else
+            device_login_status.user = user
             device_login_status.last_provided_access_token = access_token["token"]
+            device_login_status.refresh_family_id = family_id
             await device_login_status.save()
 
         return JSONResponse(
@@ -96,6 +187,7 @@ async def login_ionic(
 async def logout_ionic(
     logoutRequestData: LogoutRequest,
     current_active_user=Depends(get_current_active_user),
+    token: str = Depends(oauth2_scheme),
 ):
     login_status_device = await LoginStatusDevices.get_or_none(
         device_id=logoutRequestData.device_id
@@ -106,6 +198,13 @@ async def logout_ionic(
             detail="Dit device is nog niet ingelogd geweest",
         )
     else:
+        # A stolen copy of the device's tokens stops working as well
+        await revocation_list.revoke_token(token)
+        await revocation_list.revoke_token(
+            login_status_device.last_provided_access_token
+        )
+        if login_status_device.refresh_family_id:
+            await refresh_sessions.revoke_family(login_status_device.refresh_family_id)
         await login_status_device.delete()
         return JSONResponse(
             {
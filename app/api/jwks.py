@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.services.token_keys import get_key_ring
+
+router = APIRouter()
+
+
+@router.get("/jwks.json")
+async def jwks():
+    # Other services verify our tokens with these keys, and pick up a new key within
+    # the max-age after a rotation
+    return JSONResponse(
+        get_key_ring().jwks(), headers={"Cache-Control": "public, max-age=300"}
+    )
@@ -7,12 +7,16 @@ from app.models.pydantic import (
     MachineResponseSchema,
     SingleMachineDataReponse,
 )
+from app.helpers.http_caching import NOT_MODIFIED_RESPONSE, check_validators
 from app.models.tortoise import Machines, TankTransactions
+from app.services.db_replica import read_only_connection
+from app.services.reference_data import machines_cache
 from app.services.v1.auth import RoleChecker, get_current_active_user
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request, Response
 from fastapi.param_functions import Depends
 from starlette import status
 from starlette.responses import JSONResponse
+from tortoise.backends.base.client import BaseDBAsyncClient
 
 from app.models.tortoise import MaintenanceMachines
 
@@ -76,25 +80,40 @@ async def update_machine(
         return machine
 
 
-@router.get("/", status_code=200, response_model=List[MachineResponseSchema])
+@router.get(
+    "/",
+    status_code=200,
+    response_model=List[MachineResponseSchema],
+    responses=NOT_MODIFIED_RESPONSE,
+)
 async def get_machines(
+    request: Request,
+    response: Response,
     current_active_user=Depends(get_current_active_user),
 ) -> List[MachineResponseSchema]:
-    return await Machines.all()
+    machines = await machines_cache.get()
+    check_validators(request, response, machines.etag, machines.last_modified)
+    return machines.rows
 
 
 @router.get("/{id}", status_code=200, response_model=SingleMachineDataReponse)
 async def get_single_machines(
-    id: int, current_active_user=Depends(get_current_active_user)
+    id: int,
+    current_active_user=Depends(get_current_active_user),
+    db: BaseDBAsyncClient = Depends(read_only_connection),
 ) -> SingleMachineDataReponse:
-    machine = await Machines.get_or_none(id=id)
+    machine = await Machines.get_or_none(id=id).using_db(db)
     if machine is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Machine met ID {id} niet gevonden",
         )
-    maintenance_issues = await MaintenanceMachines.filter(machine=machine.id)
-    tank_transactions = await TankTransactions.filter(vehicle=machine.work_name)
+    maintenance_issues = await MaintenanceMachines.filter(machine=machine.id).using_db(
+        db
+    )
+    tank_transactions = await TankTransactions.filter(
+        vehicle=machine.work_name
+    ).using_db(db)
 
     return {
         "info": machine,
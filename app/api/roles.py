@@ -1,10 +1,12 @@
 from os import name
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from app.helpers.http_caching import NOT_MODIFIED_RESPONSE, check_validators
 from app.models.pydantic import RolesSchema
 from app.models.tortoise import Roles
 
 from typing import List
 
+from app.services.reference_data import roles_cache
 from app.services.v1.auth import RoleChecker
 
 
@@ -26,6 +28,9 @@ async def create_role(role: RolesSchema):
     "/",
     response_model=List[RolesSchema],
     dependencies=[Depends(RoleChecker(["admin"]))],
+    responses=NOT_MODIFIED_RESPONSE,
 )
-async def get_all_roles():
-    return await Roles.all()
+async def get_all_roles(request: Request, response: Response):
+    roles = await roles_cache.get()
+    check_validators(request, response, roles.etag, roles.last_modified)
+    return roles.rows
@@ -10,13 +10,16 @@ from app.models.pydantic import (
     TankTransactionCreate,
     TankTransactionResponseSchema,
 )
+from app.helpers.responses import values_response
 from app.models.tortoise import TankTransactions
+from app.services.db_replica import read_only_connection
 from app.services.v1.auth import RoleChecker, get_current_active_user
 from dateutil.relativedelta import relativedelta
 from fastapi import APIRouter, HTTPException
 from fastapi.param_functions import Depends
 from starlette import status
 from starlette.responses import JSONResponse
+from tortoise.backends.base.client import BaseDBAsyncClient
 
 router = APIRouter()
 
@@ -56,10 +59,12 @@ async def post_tank_transaction(
 async def get_tank_transactions(
     current_active_user=Depends(get_current_active_user),
 ) -> List[TankTransactionResponseSchema]:
-    return (
-        await TankTransactions.all()
+    # Flat rows, dumped straight from values() without model instances
+    return await values_response(
+        TankTransactions.all()
         .exclude(vehicle="Klein materiaal")
-        .order_by("-start_date_time")
+        .order_by("-start_date_time"),
+        TankTransactionResponseSchema,
     )
 
 
@@ -116,6 +121,7 @@ async def get_data_for_chart_between_two_dates(
     from_date: date = date.today() - relativedelta(months=1),
     to_date: date = date.today(),
     current_active_user=Depends(get_current_active_user),
+    db: BaseDBAsyncClient = Depends(read_only_connection),
 ):
     data = []
     transactions = (
@@ -124,6 +130,7 @@ async def get_data_for_chart_between_two_dates(
         )
         .exclude(vehicle="Klein materiaal")
         .order_by("start_date_time")
+        .using_db(db)
     )
     for transaction in transactions:
         list_item = {
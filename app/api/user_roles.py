@@ -4,6 +4,7 @@ from app.models.pydantic import User_Pydantic
 from app.models.tortoise import Roles, Users
 
 from app.services.v1.auth import RoleChecker
+from app.services.invalidation import invalidation_bus
 
 
 router = APIRouter()
@@ -21,5 +22,6 @@ async def create_user_role(email: str, role: str):
     if role is None:
         raise HTTPException(status_code=400, detail="Role does not exist")
     await user.roles.add(role)
+    await invalidation_bus.publish("user_roles", user.id)
     await user.fetch_related("roles")
     return user
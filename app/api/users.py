@@ -1,5 +1,5 @@
-from fastapi import APIRouter
-from typing import List
+from fastapi import APIRouter, Query, Response
+from typing import List, Optional
 
 from fastapi.param_functions import Depends
 from starlette.exceptions import HTTPException
@@ -7,6 +7,7 @@ from starlette.exceptions import HTTPException
 from app.services.v1.auth import get_current_active_user, RoleChecker
 from app.models.pydantic import (
     User_Pydantic,
+    UserList_Pydantic,
     UpdateUser,
     ResponseMessage,
     UpdateAddress,
@@ -14,6 +15,8 @@ from app.models.pydantic import (
     DeleteUserRole,
 )
 from app.models.tortoise import Users, Addresses, Roles
+from app.services.invalidation import invalidation_bus
+from app.services.user_listing import NEXT_CURSOR_HEADER, list_users
 
 router = APIRouter()
 
@@ -38,12 +41,20 @@ async def update_me(
 
 @router.get(
     "/",
-    response_model=List[User_Pydantic],
+    response_model=List[UserList_Pydantic],
     tags=["users", "admin"],
     dependencies=[Depends(RoleChecker(["admin"]))],
 )
-async def get_all_users():
-    users = await Users.all().prefetch_related("roles", "address")
+async def get_all_users(
+    response: Response,
+    search: Optional[str] = None,
+    roles: Optional[List[str]] = Query(default=None),
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=200),
+):
+    users, next_cursor = await list_users(search, roles, cursor, limit)
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(next_cursor)
     return users
 
 
@@ -112,6 +123,7 @@ async def add_user_role(userRole: AddUserRole):
     if role is None:
         raise HTTPException(status_code=404, detail="Role niet gevonden")
     await user.roles.add(role)
+    await invalidation_bus.publish("user_roles", user.id)
     await user.fetch_related("roles", "address")
     return user
 
@@ -130,6 +142,7 @@ async def add_user_role(userRoleToDelete: DeleteUserRole):
     if role is None:
         raise HTTPException(status_code=404, detail="Role niet gevonden")
     await user.roles.remove(role)
+    await invalidation_bus.publish("user_roles", user.id)
     await user.fetch_related("roles", "address")
     return user
 
@@ -1,6 +1,7 @@
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 from starlette.exceptions import HTTPException
+from app.helpers.http_caching import NOT_MODIFIED_RESPONSE, check_validators
 from app.models.pydantic_models.auth import UserResponse
 from app.models.pydantic_models.roles import (
     AddRoleToUserRequest,
@@ -9,6 +10,7 @@ from app.models.pydantic_models.roles import (
     CreateRoleRequest,
 )
 from app.models.tortoise import Users, Roles
+from app.services.reference_data import roles_cache
 from app.services.v2.auth import RoleChecker
 
 
@@ -35,9 +37,12 @@ async def create_role(role_to_create: CreateRoleRequest):
     "/",
     response_model=List[RoleResponse],
     dependencies=[Depends(RoleChecker(["admin"]))],
+    responses=NOT_MODIFIED_RESPONSE,
 )
-async def get_all_roles():
-    return await Roles.all()
+async def get_all_roles(request: Request, response: Response):
+    roles = await roles_cache.get()
+    check_validators(request, response, roles.etag, roles.last_modified)
+    return roles.rows
 
 
 @router.delete(
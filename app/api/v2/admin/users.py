@@ -1,24 +1,43 @@
-from fastapi import APIRouter, Depends
-from typing import List
+from fastapi import APIRouter, Depends, Query, Response
+from typing import List, Optional
 from starlette.exceptions import HTTPException
-from app.models.pydantic_models.users import UserResponse, UpdateUserRequest
+from app.models.pydantic_models.users import (
+    UserResponse,
+    UserListResponse,
+    UpdateUserRequest,
+)
 from app.models.pydantic_models.roles import (
     AddRoleToUserRequest,
     RemoveRoleFromUserRequest,
 )
 from app.models.tortoise import Users, Roles
 from app.services.v2.auth import RoleChecker
+from app.services.invalidation import invalidation_bus
+from app.services.user_listing import NEXT_CURSOR_HEADER, list_users
 
 router = APIRouter()
 
 
 @router.get(
     "/",
-    response_model=List[UserResponse],
+    response_model=List[UserListResponse],
     dependencies=[Depends(RoleChecker(["admin"]))],
 )
-async def get_all_users():
-    users = await Users.all().prefetch_related("roles", "address")
+async def get_all_users(
+    response: Response,
+    search: Optional[str] = None,
+    roles: Optional[List[str]] = Query(default=None),
+    cursor: Optional[int] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=200),
+):
+    """
+    A page of users, without their address. When there are more users the
+    X-Next-Cursor header has the cursor of the next page. Without `limit` and
+    `cursor` the list has all users.
+    """
+    users, next_cursor = await list_users(search, roles, cursor, limit)
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = str(next_cursor)
     return users
 
 
@@ -77,6 +96,7 @@ async def add_role_to_user(userRole: AddRoleToUserRequest):
     if role is None:
         raise HTTPException(status_code=404, detail="Role niet gevonden")
     await user.roles.add(role)
+    await invalidation_bus.publish("user_roles", user.id)
     await user.fetch_related("roles", "address")
     return user
 
@@ -94,5 +114,6 @@ async def remove_role_from_user(userRoleToDelete: RemoveRoleFromUserRequest):
     if role is None:
         raise HTTPException(status_code=404, detail="Role niet gevonden")
     await user.roles.remove(role)
+    await invalidation_bus.publish("user_roles", user.id)
     await user.fetch_related("roles", "address")
     return user
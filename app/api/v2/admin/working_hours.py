@@ -1,9 +1,10 @@
-from typing import List
+from typing import List, Literal
 import datetime
 
 from app.services.v2.auth import get_current_active_user
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.param_functions import Depends
 from babel.dates import format_date
 from app.helpers.date_functions import (
@@ -11,13 +12,29 @@ from app.helpers.date_functions import (
     get_week_numbers,
     get_week_start_end_dates,
 )
+from app.config import get_settings
+from app.helpers.sse import event_stream_response
+from app.services.db_replica import read_only_connection
+from app.services.events import WORKING_HOURS, event_broker, publish_release
+from app.services.payroll import PayrollRules, payroll
+from app.services.vacation_index import VacationIndex, vacation_conflicts
 from app.services.v2.auth import RoleChecker
+from app.services.working_hours_export import (
+    CSV_MEDIA_TYPE,
+    XLSX_MEDIA_TYPE,
+    csv_export,
+    export_chunks,
+    xlsx_export,
+)
 from app.models.tortoise import Users, WorkingHours
 from app.models.pydantic_models.working_hours import (
     WorkingHoursWeekOverviewResponse,
     ReleaseRequest,
+    PayrollResponse,
+    VacationConflictResponse,
 )
 from starlette import status
+from tortoise.backends.base.client import BaseDBAsyncClient
 
 router = APIRouter()
 
@@ -26,8 +43,14 @@ router = APIRouter()
     "/year_overview/",
     dependencies=[Depends(RoleChecker(["admin"]))],
 )
-async def get_year_overview(year: int, user_id: int):
-    user = await Users.get_or_none(id=user_id).prefetch_related("working_hours")
+async def get_year_overview(
+    year: int, user_id: int, db: BaseDBAsyncClient = Depends(read_only_connection)
+):
+    user = (
+        await Users.get_or_none(id=user_id)
+        .prefetch_related("working_hours")
+        .using_db(db)
+    )
 
     # Initialize a dictionary to store aggregated data
     aggregated_data = {}
@@ -67,18 +90,23 @@ async def get_year_overview(year: int, user_id: int):
     dependencies=[Depends(RoleChecker(["admin"]))],
 )
 async def get_week_overview(
-    from_date: datetime.date, to_date: datetime.date, user_id: int
+    from_date: datetime.date,
+    to_date: datetime.date,
+    user_id: int,
+    db: BaseDBAsyncClient = Depends(read_only_connection),
 ):
     if from_date > to_date:
         raise HTTPException(
             status_code=400, detail="Van datum moet voor tot datum zijn"
         )
     # Retrieve all relevant data in one query (if possible)
-    user = await Users.get_or_none(id=user_id)
-    await user.fetch_related("working_hours")
+    user = await Users.get_or_none(id=user_id).using_db(db)
+    await user.fetch_related("working_hours", using_db=db)
     working_hours = await user.working_hours.filter(
         date__range=[from_date, to_date + datetime.timedelta(days=1)]
-    )
+    ).using_db(db)
+
+    vacations = await VacationIndex.load(from_date, to_date, [user_id], db=db)
 
     # Process the data
     result_list = []
@@ -95,6 +123,9 @@ async def get_week_overview(
         )
 
         week_start, week_end = get_week_start_end_dates(year, week_number)
+        # Nothing to submit for a week off
+        if not week_hours_list and vacations.week_off(user_id, week_start):
+            submitted = True
 
         result_list.append(
             {
@@ -105,6 +136,9 @@ async def get_week_overview(
                 "sum_hours": sum_hours,
                 "sum_milkings": sum_milkings,
                 "submitted": submitted,
+                "vacation_days": vacations.vacation_days(
+                    user_id, week_start, week_end
+                ),
                 "working_hours": week_hours_list,  # Ensure this is serializable or transformed to match the response model
             }
         )
@@ -129,6 +163,7 @@ async def release_working_hours(
         )
     ]
     # For all the dates in date list update the corresponding working hours item in the database and set submitted to False
+    released = []
     for date in date_list:
         working_hours_item = await WorkingHours.get_or_none(
             date=date, user=release_request.user_id
@@ -137,17 +172,118 @@ async def release_working_hours(
             try:
                 await working_hours_item.update_from_dict({"submitted": False}).save()
             except Exception as e:
+                await publish_release(release_request.user_id, released)
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail=(
                         "Er is een onverwachte fout opgetreden, neem contact op met de beheerder"
                     ),
                 )
+            released.append(date)
         else:
+            # The dates before this one are released already
+            await publish_release(release_request.user_id, released)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=(
                     f"Werkuren voor {date.strftime('%d-%m-%Y')} zijn niet gevonden"
                 ),
             )
+    await publish_release(release_request.user_id, released)
     return {"detail": "Werkuren zijn succesvol vrijgegeven"}
+
+
+@router.get(
+    "/events",
+    dependencies=[Depends(RoleChecker(["admin"]))],
+    response_description="text/event-stream met submit, upsert en release events",
+)
+async def working_hours_events():
+    """
+    Live changes of working hours as Server-Sent Events, so an overview can be
+    updated without loading it again. After a "resync" event the overview has to
+    be loaded again, events were missed.
+    """
+    return event_stream_response(
+        event_broker, WORKING_HOURS, get_settings().events_heartbeat_interval
+    )
+
+
+@router.get(
+    "/export",
+    dependencies=[Depends(RoleChecker(["admin"]))],
+    response_class=StreamingResponse,
+    responses={200: {"content": {CSV_MEDIA_TYPE: {}, XLSX_MEDIA_TYPE: {}}}},
+)
+async def export_working_hours(
+    from_date: datetime.date,
+    to_date: datetime.date,
+    format: Literal["csv", "xlsx"] = "csv",
+    db: BaseDBAsyncClient = Depends(read_only_connection),
+):
+    """
+    Working hours of all employees between two dates (inclusive) with the totals
+    per week, for the payroll administration. The rows are streamed from the
+    database, so the range doesn't matter for the memory use.
+    """
+    if to_date < from_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="De einddatum ligt voor de begindatum",
+        )
+    chunks = export_chunks(db, from_date, to_date)
+    if format == "xlsx":
+        body, media_type = xlsx_export(chunks), XLSX_MEDIA_TYPE
+    else:
+        body, media_type = csv_export(chunks), CSV_MEDIA_TYPE
+    filename = f"werkuren_{from_date.isoformat()}_{to_date.isoformat()}.{format}"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.get(
+    "/payroll",
+    dependencies=[Depends(RoleChecker(["admin"]))],
+    response_model=List[PayrollResponse],
+)
+async def get_payroll(
+    from_date: datetime.date,
+    to_date: datetime.date,
+    db: BaseDBAsyncClient = Depends(read_only_connection),
+):
+    """
+    Payroll figures per employee between two dates (inclusive): contract, worked
+    and overtime hours, weekend and public holiday hours with their premium,
+    vacation days and, for melkers, the milkings.
+    """
+    if to_date < from_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="De einddatum ligt voor de begindatum",
+        )
+    return await payroll(db, from_date, to_date, PayrollRules.from_settings())
+
+
+@router.get(
+    "/vacation_conflicts",
+    dependencies=[Depends(RoleChecker(["admin"]))],
+    response_model=List[VacationConflictResponse],
+)
+async def get_vacation_conflicts(
+    from_date: datetime.date,
+    to_date: datetime.date,
+    db: BaseDBAsyncClient = Depends(read_only_connection),
+):
+    """
+    Working hours of all employees that were logged on one of their vacation days
+    between two dates (inclusive), with the vacation.
+    """
+    if to_date < from_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="De einddatum ligt voor de begindatum",
+        )
+    return await vacation_conflicts(db, from_date, to_date)
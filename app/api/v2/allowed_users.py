@@ -1,5 +1,6 @@
 import os
 from typing import List
+from app.helpers.http_caching import NOT_MODIFIED_RESPONSE, ConditionalGet
 from app.models.tortoise import AllowedUsers
 from app.models.tortoise import Users
 from app.services.v2.auth import RoleChecker, get_current_active_user
@@ -10,9 +11,12 @@ from fastapi_mail import MessageType
 from starlette import status
 
 
+from app.models.enums import InvitationStatus
 from app.models.pydantic_models.allowed_users import (
     AllowedUserRequest,
     AllowedUserResponse,
+    BulkAllowedUsersRequest,
+    BulkAllowedUserResponse,
 )
 from app.services.v2.auth import RoleChecker
 from app.services.v2.mail import Mailer
@@ -66,11 +70,64 @@ async def add_allowed_user(
         )
 
 
+# Invite a list of email addresses at once (only the admin can do this)
+@router.post(
+    "/bulk",
+    response_model=List[BulkAllowedUserResponse],
+    dependencies=[Depends(RoleChecker(["admin"]))],
+)
+async def add_allowed_users_bulk(
+    bulk_request: BulkAllowedUsersRequest,
+) -> List[BulkAllowedUserResponse]:
+    emails = list(dict.fromkeys(bulk_request.emails))
+    already_invited = set(
+        await AllowedUsers.filter(email__in=emails).values_list("email", flat=True)
+    )
+    already_registered = set(
+        await Users.filter(email__in=emails).values_list("email", flat=True)
+    )
+    new_emails = [
+        email
+        for email in emails
+        if email not in already_invited and email not in already_registered
+    ]
+    statuses = {}
+    if new_emails:
+        await AllowedUsers.bulk_create([AllowedUsers(email=email) for email in new_emails])
+        sent = await Mailer.send_invitation_messages(
+            [
+                EmailSchema(
+                    recipient_addresses=[email],
+                    body={
+                        "base_url": os.getenv("BASE_URL_FRONTEND"),
+                        "sender": "Gebroeders Vroege",
+                    },
+                )
+                for email in new_emails
+            ]
+        )
+        statuses = {
+            email: InvitationStatus.SENT if is_sent else InvitationStatus.QUEUED
+            for email, is_sent in zip(new_emails, sent)
+        }
+    for email in already_invited:
+        statuses[email] = InvitationStatus.ALREADY_INVITED
+    for email in already_registered:
+        statuses[email] = InvitationStatus.ALREADY_REGISTERED
+    return [
+        BulkAllowedUserResponse(email=email, status=statuses[email]) for email in emails
+    ]
+
+
 # Read all allowed users (Only the admin can do this)
 @router.get(
     "/",
     response_model=List[AllowedUserResponse],
-    dependencies=[Depends(RoleChecker(["admin"]))],
+    dependencies=[
+        Depends(RoleChecker(["admin"])),
+        Depends(ConditionalGet(AllowedUsers)),
+    ],
+    responses=NOT_MODIFIED_RESPONSE,
 )
 async def get_allowed_users():
     return await AllowedUsers.all()
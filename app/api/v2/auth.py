@@ -1,7 +1,7 @@
 import os
 import time
 
-from app.config import Settings, get_fastapi_mail_config, get_settings
+from app.config import get_fastapi_mail_config
 from app.models.pydantic import (
     EmailSchema,
     ResetPassword,
@@ -12,8 +12,13 @@ from app.models.pydantic_models.auth import RegisterUserRequest, UserResponse
 from app.models.pydantic_models.general_responses import HTTPError, SuccessResponse
 
 from app.models.tortoise import AllowedUsers, Roles, Users
-from app.services.v2.auth import Auth
+from app.services.rate_limit import login_rate_limit
+from app.services.refresh_sessions import RefreshTokenReused, refresh_sessions
+from app.services.token_keys import get_key_ring
+from app.services.token_revocation import revocation_list
+from app.services.v2.auth import Auth, optional_oauth2_scheme
 from app.services.v2.mail import Mailer
+from app.services.invalidation import invalidation_bus
 from fastapi import (
     APIRouter,
     Depends,
@@ -69,6 +74,7 @@ async def register(
         # Add user roles
         role = await Roles.get(name="werknemer")
         await user.roles.add(role)
+        await invalidation_bus.publish("user_roles", user.id)
 
         # Send welcome message to the user
         email_schema = EmailSchema(
@@ -103,18 +109,12 @@ async def register(
         500: {"model": HTTPError, "description": "Internal Server Error"},
     },
 )
-async def activate_account(
-    token: TokenSchema, settings: Settings = Depends(get_settings)
-):
+async def activate_account(token: TokenSchema):
     token = token.token
     invalid_token_error = HTTPException(status_code=400, detail="Ongeldige token")
     # Check if token expiration date is reached
     try:
-        payload = jwt.decode(
-            token,
-            settings.secret_key.get_secret_value(),
-            algorithms=settings.token_algorithm,
-        )
+        payload = get_key_ring().decode(token)
     except jwt.JWTError as e:
         raise HTTPException(status_code=400, detail=str(e))
     if payload["scope"] != "registration":
@@ -189,7 +189,11 @@ async def resent_activation_code(
 @router.post(
     "/login",
     status_code=200,
-    responses={401: {"model": HTTPError, "description": "Niet geautoriseerd"}},
+    responses={
+        401: {"model": HTTPError, "description": "Niet geautoriseerd"},
+        429: {"model": HTTPError, "description": "Te veel inlogpogingen"},
+    },
+    dependencies=[Depends(login_rate_limit)],
 )
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
@@ -209,6 +213,7 @@ async def login(
         )
     access_token = Auth.get_access_token(email=user.email)
     refresh_token = Auth.get_refresh_token(email=user.email)
+    await refresh_sessions.start(user.id, refresh_token)
     response = JSONResponse(
         {
             "access_token": f"{access_token['token']}",
@@ -224,30 +229,35 @@ async def login(
 
 
 @router.get("/efresh")
-async def refresh(request: Request, settings: Settings = Depends(get_settings)):
+async def refresh(request: Request):
     # get refresh token from cookie header
     refresh_token = request.cookies.get("refresh_token")
     if refresh_token is None:
         return Response(status_code=403)
     # Check if token expiration date is reached
     try:
-        payload = jwt.decode(
-            refresh_token,
-            settings.secret_key.get_secret_value(),
-            algorithms=settings.token_algorithm,
-        )
+        payload = get_key_ring().decode(refresh_token)
     except jwt.JWTError:
         raise HTTPException(status_code=403, detail="Refresh token is verlopen")
     # Check if scope of the token is valid
     if payload["scope"] != "refresh":
-        raise Response(status_code=400)
-    user = await Users.get_or_none(email=payload["sub"])
-    # Check if token belongs to user and not already been used
-    if not user:
-        raise Response(status_code=400)
-    access_token = Auth.get_access_token(email=user.email)
-    refresh_token = Auth.get_refresh_token(email=user.email)
-    return JSONResponse(
+        raise HTTPException(status_code=400, detail="Ongeldige token")
+    if revocation_list.is_revoked(payload.get("jti")):
+        raise HTTPException(status_code=403, detail="Refresh token is ingetrokken")
+    # Exchange the token for a new one, it can't be used a second time
+    refresh_token = Auth.get_refresh_token(email=payload["sub"])
+    try:
+        session = await refresh_sessions.rotate(payload["jti"], refresh_token)
+    except RefreshTokenReused:
+        raise HTTPException(
+            status_code=403, detail="Refresh token is al gebruikt, log opnieuw in"
+        )
+    if session is None:
+        raise HTTPException(status_code=403, detail="Refresh token is ingetrokken")
+    if not session.is_active:
+        raise HTTPException(status_code=403, detail="Gebruiker inactief")
+    access_token = Auth.get_access_token(email=session.email)
+    response = JSONResponse(
         {
             "access_token": access_token["token"],
             "refresh_token": refresh_token["token"],
@@ -255,6 +265,14 @@ async def refresh(request: Request, settings: Settings = Depends(get_settings)):
         },
         status_code=200,
     )
+    # The cookie has to follow the rotation, the old token can't be used again
+    response.set_cookie(
+        key="refresh_token",
+        value=refresh_token["token"],
+        httponly=True,
+        samesite=None,
+    )
+    return response
 
 
 @router.get("/forgot_password/{email}")
@@ -305,17 +323,11 @@ async def forgot_password(
 
 
 @router.post("/reset_password")
-async def reset_password(
-    reset_info: ResetPassword, settings: Settings = Depends(get_settings)
-):
+async def reset_password(reset_info: ResetPassword):
     invalid_token_error = HTTPException(status_code=400, detail="Deze link is ongeldig")
     # Check if token expiration date is reached
     try:
-        payload = jwt.decode(
-            reset_info.token,
-            settings.secret_key.get_secret_value(),
-            algorithms=settings.token_algorithm,
-        )
+        payload = get_key_ring().decode(reset_info.token)
     except jwt.JWTError:
         raise HTTPException(status_code=403, detail="Deze link is verlopen")
     # Check if scope of the token is valid
@@ -336,7 +348,11 @@ async def reset_password(
 
 
 @router.post("/logout")
-async def logout():
+async def logout(request: Request, token: str = Depends(optional_oauth2_scheme)):
+    # Revoke both tokens, so a copy of them can't be used anymore either
+    await revocation_list.revoke_token(token)
+    await revocation_list.revoke_token(request.cookies.get("refresh_token"))
+    await refresh_sessions.end(request.cookies.get("refresh_token"))
     response = JSONResponse({"detail": "Uitgelogd"}, status_code=200)
     response.delete_cookie(key="refresh_token")
     return response
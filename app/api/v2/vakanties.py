@@ -1,5 +1,5 @@
 from datetime import date
-from typing import List
+from typing import List, Optional
 
 from starlette import status
 
@@ -14,10 +14,17 @@ from app.models.pydantic_models.vakanties import (
     VakantieResponse,
     ResourceResponse,
     VakantiesForCalendarResponse,
+    VakantieWithResourceResponse,
 )
 from app.models.tortoise import Vakanties, Users
+from app.helpers.http_caching import (
+    NOT_MODIFIED_RESPONSE,
+    check_not_modified,
+    etag_matches,
+)
 from app.services.v2.auth import RoleChecker, get_current_active_user
-from fastapi import APIRouter, HTTPException
+from app.services.resources import resource_cache
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 from fastapi.param_functions import Depends
 from fastapi.responses import JSONResponse
 
@@ -25,32 +32,21 @@ from fastapi.responses import JSONResponse
 router = APIRouter()
 
 
-@router.get("/resources", response_model=List[ResourceResponse])
-async def get_all_resources():
-    users = await Users.all().prefetch_related("roles")
-    # Create a list to store the ResourceResponse instances
-    resource_responses = []
-
-    # Loop over users and check if they have the 'werknemer' role before creating ResourceResponse instances
-    for user in users:
-        has_werknemer_role = False
-        for role in user.roles:
-            if role.name == "werknemer":
-                has_werknemer_role = True
-                break
-
-        if has_werknemer_role:
-            if any(role.name == "part-time" for role in user.roles):
-                groupId = 2
-            else:
-                groupId = 1
-            resource_response = ResourceResponse(
-                id=user.id,
-                title=user.first_name + " " + user.last_name,
-                groupId=groupId,
-            )
-            resource_responses.append(resource_response)
-    return resource_responses
+@router.get(
+    "/resources",
+    dependencies=[Depends(RoleChecker(["admin", "werknemer"]))],
+    response_model=List[ResourceResponse],
+    responses=NOT_MODIFIED_RESPONSE,
+)
+async def get_all_resources(request: Request, response: Response):
+    resources, etag = await resource_cache.get()
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers
+        )
+    response.headers.update(cache_headers)
+    return resources
 
 
 @router.post(
@@ -207,45 +203,76 @@ async def get_vakanties_for_logged_in_user(
     response_model=List[VakantiesForCalendarResponse],
 )
 async def get_all_vakanties():
-    vakanties_in_db = await Vakanties.all().prefetch_related("user__roles")
-    # Create a list to store the VakantieResponse instances
-    vakantie_responses = []
-    # Loop over vakanties_in_db and create VakantieResponse instances
-    for vakantie in vakanties_in_db:
-        vakantie_response = VakantiesForCalendarResponse(
-            id=vakantie.id,
-            start=vakantie.start_date,
-            end=vakantie.end_date,
-            resourceId=vakantie.user.id,
-        )
+    # Alleen de kolommen ophalen die de kalender nodig heeft
+    vakanties_in_db = await Vakanties.all().values(
+        "id", "start_date", "end_date", "user_id"
+    )
+    return [
+        {
+            "id": vakantie["id"],
+            "start": vakantie["start_date"],
+            "end": vakantie["end_date"],
+            "resourceId": vakantie["user_id"],
+        }
+        for vakantie in vakanties_in_db
+    ]
 
-        vakantie_responses.append(vakantie_response)
 
-    return vakantie_responses
+@router.get(
+    "/calendar",
+    dependencies=[Depends(RoleChecker(["admin", "werknemer"]))],
+    response_model=List[VakantiesForCalendarResponse],
+    responses=NOT_MODIFIED_RESPONSE,
+)
+async def get_vakanties_for_calendar(
+    request: Request, response: Response, start: date, end: date
+):
+    """
+    Vakanties die overlappen met het zichtbare venster van de kalender (end is exclusief).
+    Geeft een zwakke ETag en Last-Modified mee, zodat clients een 304 kunnen krijgen.
+    """
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Start datum moet voor eind datum liggen",
+        )
+    vakanties_in_window = Vakanties.filter(start_date__lt=end, end_date__gte=start)
+    await check_not_modified(request, response, vakanties_in_window)
+    vakanties_in_db = await vakanties_in_window.values(
+        "id", "start_date", "end_date", "user_id"
+    )
+    return [
+        {
+            "id": vakantie["id"],
+            "start": vakantie["start_date"],
+            "end": vakantie["end_date"],
+            "resourceId": vakantie["user_id"],
+        }
+        for vakantie in vakanties_in_db
+    ]
 
 
 @router.get(
     "/all_between_dates",
     dependencies=[Depends(RoleChecker(["admin", "werknemer", "monteur"]))],
-    response_model=List[VakantieResponse],
+    response_model=List[VakantieWithResourceResponse],
 )
-async def get_all_vakanties_between_dates(start_date: date, end_date: date):
-    vakanties_in_db = await Vakanties.filter(
+async def get_all_vakanties_between_dates(
+    start_date: date,
+    end_date: date,
+    user_ids: Optional[List[int]] = Query(default=None),
+):
+    vakanties_in_range = Vakanties.filter(
         start_date__lte=end_date, end_date__gte=start_date
     )
-    # Create a list to store the VakantieResponse instances
-    vakantie_responses = []
-
-    # Loop over vakanties_in_db and create VakantieResponse instances
-    for vakantie in vakanties_in_db:
-        vakantie_response = VakantieResponse(
-            id=vakantie.id,
-            start_date=vakantie.start_date,
-            end_date=vakantie.end_date,
-            resource_id=vakantie.user.id,
-        )
-        vakantie_responses.append(vakantie_response)
-    return vakantie_responses
+    # Optioneel alleen de vakanties van een selectie van medewerkers
+    if user_ids:
+        vakanties_in_range = vakanties_in_range.filter(user_id__in=user_ids)
+    # Projectie query, er worden geen model instanties aangemaakt
+    vakanties_in_db = await vakanties_in_range.order_by("start_date").values(
+        "id", "start_date", "end_date", resource_id="user_id"
+    )
+    return vakanties_in_db
 
 
 @router.delete("/{vakantie_id}", dependencies=[Depends(RoleChecker(["werknemer"]))])
@@ -2,6 +2,8 @@ from typing import List
 
 from app.services.v2.auth import get_current_active_user
 from app.models.tortoise import WorkingHours
+from app.services.events import publish_working_hours
+from app.services.vacation_index import VacationIndex
 from app.models.pydantic_models.working_hours import (
     WorkingHoursResponse,
     WorkingHoursRequest,
@@ -105,6 +107,8 @@ async def get_week_overview(
         date__range=[from_date, to_date + datetime.timedelta(days=1)]
     )
 
+    vacations = await VacationIndex.load(from_date, to_date, [current_active_user.id])
+
     # Process the data
     result_list = []
     for year, week_number in get_week_numbers(from_date, to_date):
@@ -120,6 +124,11 @@ async def get_week_overview(
         )
 
         week_start, week_end = get_week_start_end_dates(year, week_number)
+        # Nothing to submit for a week off
+        if not week_hours_list and vacations.week_off(
+            current_active_user.id, week_start
+        ):
+            submitted = True
 
         result_list.append(
             {
@@ -130,6 +139,9 @@ async def get_week_overview(
                 "sum_hours": sum_hours,
                 "sum_milkings": sum_milkings,
                 "submitted": submitted,
+                "vacation_days": vacations.vacation_days(
+                    current_active_user.id, week_start, week_end
+                ),
                 "working_hours": week_hours_list,  # Ensure this is serializable or transformed to match the response model
             }
         )
@@ -163,6 +175,7 @@ async def update_working_hours_item(
                     " beheerder"
                 ),
             )
+        await publish_working_hours(working_hours_item)
         return working_hours_item
     else:
         try:
@@ -177,4 +190,5 @@ async def update_working_hours_item(
                     " beheerder"
                 ),
             )
+        await publish_working_hours(working_hours_item)
         return working_hours_item
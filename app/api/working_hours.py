@@ -12,6 +12,8 @@ from app.models.pydantic import (
     WeekData,
 )
 from app.models.tortoise import Users, WorkingHours
+from app.services.events import publish_release, publish_working_hours
+from app.services.vacation_index import VacationIndex
 from app.services.v1.auth import RoleChecker, get_current_active_user
 from fastapi import APIRouter, HTTPException
 from fastapi.param_functions import Depends
@@ -59,6 +61,7 @@ async def update_working_hours_item(
                     " beheerder"
                 ),
             )
+        await publish_working_hours(working_hours_item)
         return working_hours_item
     else:
         try:
@@ -74,6 +77,7 @@ async def update_working_hours_item(
                     " beheerder"
                 ),
             )
+        await publish_working_hours(working_hours_item)
         return working_hours_item
 
 
@@ -144,6 +148,7 @@ async def delete_working_hours_item(id: int):
         )
     else:
         await working_hours_item.delete()
+        await publish_working_hours(working_hours_item, kind="delete")
         # Create a success respons
         return JSONResponse({"detail": "Uren succesvol verwijderd"}, status_code=200)
 
@@ -175,6 +180,7 @@ async def get_week_overview(
             detail="De gebruiker waarvoor de uren zijn ingediend is niet bekend",
         )
     await user.fetch_related("roles", "working_hours", "address")
+    vacations = await VacationIndex.load(from_date, to_date, [user.id])
     # loop over weeks and collect data
     result_list = []
     for item in week_numbers_from_date_range:
@@ -201,6 +207,9 @@ async def get_week_overview(
                 submitted = False if i.submitted == False else True
                 if submitted == False:
                     break
+            # nothing to submit for a week off
+            if working_hours == [] and vacations.week_off(user.id, week_start):
+                submitted = True
         result_list.append(
             {
                 "year": year,
@@ -210,6 +219,7 @@ async def get_week_overview(
                 "sum_hours": sum_hours,
                 "sum_milkings": sum_milkings,
                 "submitted": submitted,
+                "vacation_days": vacations.vacation_days(user.id, week_start, week_end),
                 "working_hours": working_hours,
             }
         )
@@ -231,6 +241,7 @@ async def get_week_overview(
         (x.isocalendar()[0], x.isocalendar()[1]) for x in daterange(from_date, to_date)
     )
 
+    vacations = await VacationIndex.load(from_date, to_date, [user.id])
     result_list = []
     for year, week_number in sorted(week_numbers_from_date_range, reverse=True):
         week_start = Week(year, week_number).monday()
@@ -243,6 +254,9 @@ async def get_week_overview(
         sum_milkings = sum([i.milkings for i in working_hours])
 
         submitted = all(i.submitted for i in working_hours) if working_hours else False
+        # nothing to submit for a week off
+        if not working_hours and vacations.week_off(user.id, week_start):
+            submitted = True
 
         result_list.append(
             {
@@ -253,6 +267,7 @@ async def get_week_overview(
                 "sum_hours": sum_hours,
                 "sum_milkings": sum_milkings,
                 "submitted": submitted,
+                "vacation_days": vacations.vacation_days(user.id, week_start, week_end),
                 "working_hours": working_hours,
             }
         )
@@ -389,6 +404,9 @@ async def get_week_overview_admin(from_date: datetime.date, to_date: datetime.da
         for role in user.roles:
             if role.name == "werknemer":
                 werknemers.append(user)
+    vacations = await VacationIndex.load(
+        from_date, to_date, [werknemer.id for werknemer in werknemers]
+    )
     # loop over weeks and collect data
     result_list = []
     for item in week_numbers_from_date_range:
@@ -426,6 +444,14 @@ async def get_week_overview_admin(from_date: datetime.date, to_date: datetime.da
                     )
                     if werknemer_info["submitted"] == False:
                         break
+                # nothing to submit for a week off
+                if working_hours == [] and vacations.week_off(
+                    werknemer.id, week_start
+                ):
+                    werknemer_info["submitted"] = True
+                werknemer_info["vacation_days"] = vacations.vacation_days(
+                    werknemer.id, week_start, week_end
+                )
                 employee_hours.append(werknemer_info)
 
             week_results.append(werknemer_info)
@@ -459,3 +485,4 @@ async def get_weeks_not_submitted(
     for item in working_hours:
         item.submitted = False
         await item.save()
+    await publish_release(user_id, [item.date for item in working_hours])
@@ -2,6 +2,8 @@ import logging
 import os
 from functools import lru_cache
 from pathlib import Path
+from typing import Optional
+
 from pydantic import AnyUrl, SecretStr
 from pydantic_settings import BaseSettings
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
@@ -19,7 +21,78 @@ class Settings(BaseSettings):
     registration_token_lifetime: int = 10080
     login_token_lifetime: int = 1440
     refresh_token_lifetime: int = 43800
+    # Seconds after a refresh in which the old refresh token is still exchanged, for
+    # clients that refresh concurrently (two tabs, retries after a 401); later reuse
+    # revokes the whole family
+    refresh_token_reuse_grace: int = 10
     reset_password_token_lifetime: int = 10080
+    # Asymmetric signing: a directory with a PEM key per key id (<kid>.pem), RSA or EC.
+    # TOKEN_KEY_ID signs (default the last private key by name), the others only
+    # verify. Without a directory tokens are signed with SECRET_KEY.
+    token_keys_dir: Optional[Path] = None
+    token_key_id: Optional[str] = None
+    # Keep accepting tokens signed with SECRET_KEY after switching to key files
+    token_accept_secret: bool = True
+    # Cost of new password hashes, existing hashes are upgraded on the next login
+    bcrypt_rounds: int = 12
+    # Login attempts per client IP and per email address, per window of seconds
+    login_rate_limit_window: int = 300
+    login_rate_limit_per_ip: int = 30
+    login_rate_limit_per_email: int = 10
+    # Reverse proxies (IPs or CIDRs, comma separated) whose X-Forwarded-For is
+    # believed; the client is the rightmost address in it that isn't one of them
+    trusted_proxies: str = "127.0.0.1"
+    # Seconds between loading revocations of other workers and removing expired ones
+    token_revocation_sync_interval: int = 10
+    token_revocation_prune_interval: int = 3600
+    # Each sync loads the revocations created since the previous one minus this many
+    # seconds, for transactions that commit later than they were created and clocks
+    # that differ between workers
+    token_revocation_sync_overlap: int = 60
+    # Database connection pool, per worker
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    # Connections for all workers together, divided over WEB_CONCURRENCY workers
+    db_max_connections: Optional[int] = None
+    web_concurrency: int = 1
+    db_max_queries: int = 50000
+    db_max_inactive_connection_lifetime: float = 300.0
+    db_statement_timeout_ms: int = 30000
+    db_command_timeout: float = 60.0
+    db_pool_acquire_timeout: float = 2.0
+    # Optional read replica for reporting routes
+    database_replica_url: Optional[str] = None
+    db_replica_max_lag_seconds: float = 10.0
+    db_replica_check_interval: float = 5.0
+    # Responses from this size are compressed, from the offload size in a thread
+    compression_minimum_size: int = 1024
+    compression_offload_size: int = 262144
+    # Queries that take longer are logged with their SQL and route
+    slow_query_threshold_ms: int = 200
+    # Outgoing mail
+    mail_pool_size: int = 2
+    mail_session_max_idle: int = 60
+    mail_max_attempts: int = 6
+    mail_retry_backoff: int = 30
+    mail_poll_interval: int = 10
+    # Days sent and failed mails stay in the outbox, without their body
+    mail_outbox_retention_days: int = 7
+    # Live events: "memory" or "postgres" (default when the database is postgres),
+    # the events a client may lag behind and the seconds between keep-alives
+    events_backend: Optional[str] = None
+    events_queue_size: int = 100
+    events_heartbeat_interval: int = 15
+    # Seconds roles, machines and bouwplan stay cached without a change, and the
+    # number of bouwplan years that are kept
+    reference_cache_ttl: int = 3600
+    reference_cache_max_size: int = 16
+    # Payroll: contract hours per week (Monday to Friday), for users with the
+    # part-time role and the others, and the premiums on weekend and public holiday
+    # hours as a fraction of the hourly wage
+    payroll_full_time_hours_per_week: float = 40.0
+    payroll_part_time_hours_per_week: float = 24.0
+    payroll_weekend_premium: float = 0.5
+    payroll_holiday_premium: float = 1.0
 
 
 @lru_cache()
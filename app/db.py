@@ -3,10 +3,15 @@ import os
 
 from fastapi import FastAPI
 from tortoise import Tortoise, run_async  # new
+from tortoise.backends.base.config_generator import expand_db_url
 from tortoise.contrib.fastapi import register_tortoise
 
 from tortoise import Tortoise
 
+from app.config import get_settings
+from app.middleware.query_stats import instrument_connection
+from app.services.db_pool import instrument_pool
+
 
 log = logging.getLogger("uvicorn")  # new
 
@@ -22,19 +27,66 @@ TORTOISE_ORM = {
 }
 
 
+def pool_max_size() -> int:
+    settings = get_settings()
+    if settings.db_max_connections is None:
+        return settings.db_pool_max_size
+    # Every gunicorn worker has its own pool, share the connections between them
+    per_worker = settings.db_max_connections // max(settings.web_concurrency, 1)
+    return max(settings.db_pool_min_size, min(settings.db_pool_max_size, per_worker))
+
+
+def _connection_config(db_url: str, read_only: bool = False) -> dict:
+    settings = get_settings()
+    connection = expand_db_url(db_url)
+    if connection["engine"] == "tortoise.backends.asyncpg":
+        server_settings = {"statement_timeout": str(settings.db_statement_timeout_ms)}
+        if read_only:
+            server_settings["default_transaction_read_only"] = "on"
+        connection["credentials"].update(
+            minsize=settings.db_pool_min_size,
+            maxsize=pool_max_size(),
+            max_queries=settings.db_max_queries,
+            max_inactive_connection_lifetime=settings.db_max_inactive_connection_lifetime,
+            command_timeout=settings.db_command_timeout,
+            server_settings=server_settings,
+        )
+    return connection
+
+
+def get_db_config(db_url: str) -> dict:
+    """
+    Tortoise config for the app, with the pool settings when the database is postgres.
+
+    When DATABASE_REPLICA_URL is set a read-only "replica" connection is added, see
+    app.services.db_replica.
+    """
+    connections = {"default": _connection_config(db_url)}
+    replica_url = get_settings().database_replica_url
+    if replica_url:
+        connections["replica"] = _connection_config(replica_url, read_only=True)
+    return {
+        "connections": connections,
+        "apps": {
+            "models": {
+                "models": ["app.models.tortoise"],
+                "default_connection": "default",
+            },
+        },
+    }
+
+
 def init_db(app: FastAPI) -> None:
     #  initialise our model relationships
     register_tortoise(
         app,
-        db_url=os.environ.get("DATABASE_URL"),
-        modules={
-            "models": [
-                "app.models.tortoise",
-            ]
-        },
+        config=get_db_config(os.environ.get("DATABASE_URL")),
         generate_schemas=False,
         add_exception_handlers=True,
     )
+    # Runs after the tortoise startup handler, the connection exists by then
+    app.add_event_handler("startup", instrument_connection)
+    app.add_event_handler("startup", instrument_pool)
 
 
 # new
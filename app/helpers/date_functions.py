@@ -1,4 +1,8 @@
 import datetime
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Mapping
+
 from babel.dates import format_date
 
 
@@ -30,3 +34,46 @@ def get_week_start_end_dates(year, week_number):
     week_start = datetime.date.fromisocalendar(year, week_number, 1)  # Monday
     week_end = datetime.date.fromisocalendar(year, week_number, 7)  # Sunday
     return week_start, week_end
+
+
+def easter_sunday(year: int) -> datetime.date:
+    # Anonymous Gregorian algorithm (Meeus/Jones/Butcher)
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(year, month, day + 1)
+
+
+@lru_cache(maxsize=64)
+def public_holidays(year: int) -> Mapping[datetime.date, str]:
+    """
+    Dutch public holidays of a year, date -> name. Bevrijdingsdag only counts in
+    lustrum years, like in most collective agreements.
+
+    Cached per year and read-only, as every caller gets the same mapping.
+    """
+    easter = easter_sunday(year)
+    kings_day = datetime.date(year, 4, 27)
+    if kings_day.weekday() == 6:
+        kings_day = datetime.date(year, 4, 26)
+    holidays = {
+        datetime.date(year, 1, 1): "Nieuwjaarsdag",
+        easter: "Eerste paasdag",
+        easter + datetime.timedelta(days=1): "Tweede paasdag",
+        kings_day: "Koningsdag",
+        easter + datetime.timedelta(days=39): "Hemelvaartsdag",
+        easter + datetime.timedelta(days=49): "Eerste pinksterdag",
+        easter + datetime.timedelta(days=50): "Tweede pinksterdag",
+        datetime.date(year, 12, 25): "Eerste kerstdag",
+        datetime.date(year, 12, 26): "Tweede kerstdag",
+    }
+    if year % 5 == 0:
+        holidays[datetime.date(year, 5, 5)] = "Bevrijdingsdag"
+    return MappingProxyType(holidays)
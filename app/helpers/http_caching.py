@@ -0,0 +1,140 @@
+import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Callable, Optional, Tuple, Type, Union
+
+from fastapi import HTTPException, Request, Response, status
+from tortoise.functions import Count, Max
+from tortoise.models import Model
+from tortoise.queryset import QuerySet
+
+NOT_MODIFIED_RESPONSE = {304: {"description": "Niet gewijzigd sinds de vorige opvraging"}}
+
+
+async def collection_validators(
+    queryset: QuerySet,
+) -> Tuple[str, Optional[datetime.datetime]]:
+    """
+    Computes a weak ETag and Last-Modified for a collection in a single aggregate query.
+
+    Parameters
+    ----------
+    queryset : QuerySet
+        (filtered) queryset of a model that has a last_modified_at column
+
+    Returns
+    -------
+    Tuple[str, Optional[datetime.datetime]]
+        weak ETag from max(last_modified_at) and the row count, e.g.
+        W/"12-1700000000.123456", and max(last_modified_at) (None when empty)
+
+    """
+    result = (
+        await queryset.annotate(
+            _last_modified=Max("last_modified_at"), _count=Count("id")
+        )
+        .first()
+        .values("_last_modified", "_count")
+    )
+    last_modified: Optional[datetime.datetime] = result["_last_modified"] if result else None
+    count: int = result["_count"] if result else 0
+    timestamp = last_modified.timestamp() if last_modified is not None else 0
+    return f'W/"{count}-{timestamp:.6f}"', last_modified
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Checks the If-None-Match header of the request against the given ETag (weak comparison).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque_tag = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque_tag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def not_modified_since(request: Request, last_modified: Optional[datetime.datetime]) -> bool:
+    """
+    Checks the If-Modified-Since header of the request, with one second precision.
+    """
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=datetime.timezone.utc)
+    return _as_utc(last_modified).replace(microsecond=0) <= since
+
+
+async def check_not_modified(
+    request: Request, response: Response, queryset: QuerySet
+) -> None:
+    """
+    Answers a conditional GET for a collection before any row is loaded.
+
+    Raises a 304 when the client has the current version, otherwise sets the ETag
+    and Last-Modified headers on the response. If-None-Match wins over
+    If-Modified-Since: only the ETag notices rows that were deleted, because the row
+    count is part of it.
+    """
+    etag, last_modified = await collection_validators(queryset)
+    check_validators(request, response, etag, last_modified)
+
+
+def check_validators(
+    request: Request,
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime.datetime],
+) -> None:
+    """
+    Same as `check_not_modified`, for validators that were computed before, e.g.
+    kept in a cache together with the rows.
+    """
+    cache_headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if last_modified is not None:
+        cache_headers["Last-Modified"] = format_datetime(
+            _as_utc(last_modified).replace(microsecond=0), usegmt=True
+        )
+    if "if-none-match" in request.headers:
+        not_modified = etag_matches(request, etag)
+    else:
+        not_modified = not_modified_since(request, last_modified)
+    if not_modified:
+        raise HTTPException(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers
+        )
+    response.headers.update(cache_headers)
+
+
+class ConditionalGet:
+    """
+    Dependency that answers conditional GETs for a whole table or a fixed queryset.
+
+        @router.get("/", dependencies=[Depends(RoleChecker(["admin"])), Depends(ConditionalGet(Roles))])
+
+    Put it after the role check, so unauthorized clients don't learn about changes.
+    """
+
+    def __init__(self, collection: Union[Type[Model], Callable[[], QuerySet]]):
+        self.collection = collection
+
+    async def __call__(self, request: Request, response: Response) -> None:
+        if isinstance(self.collection, type) and issubclass(self.collection, Model):
+            queryset = self.collection.all()
+        else:
+            queryset = self.collection()
+        await check_not_modified(request, response, queryset)
+
+
+def _as_utc(moment: datetime.datetime) -> datetime.datetime:
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.astimezone(datetime.timezone.utc)
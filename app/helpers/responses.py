@@ -0,0 +1,69 @@
+from typing import Iterable, List, Type
+
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+from tortoise.queryset import QuerySet
+
+# Same output as pydantic for UTC datetimes ("...Z") and non-string dict keys
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+class AppJSONResponse(ORJSONResponse):
+    """
+    Default response class of the v1 and v2 apps, orjson instead of the stdlib encoder.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def flat_fields(schema: Type[BaseModel]) -> List[str]:
+    """
+    Names of the fields of a schema, to select exactly those columns with values().
+
+    Parameters
+    ----------
+    schema : Type[BaseModel]
+        response schema without nested models
+
+    Returns
+    -------
+    List[str]
+        field names in the order of the schema
+
+    """
+    return list(schema.model_fields)
+
+
+async def values_response(queryset: QuerySet, schema: Type[BaseModel]) -> Response:
+    """
+    Serializes the rows of a queryset straight to JSON, without model instances.
+
+    Only for flat schemas: the values() rows are dumped as they come from the
+    database, so the schema is not validated. Keep `response_model` on the route
+    for the OpenAPI docs.
+
+    Parameters
+    ----------
+    queryset : QuerySet
+        (filtered and ordered) queryset
+    schema : Type[BaseModel]
+        flat response schema, its fields are the selected columns
+
+    Returns
+    -------
+    Response
+        JSON array with one object per row
+
+    """
+    rows = await queryset.values(*flat_fields(schema))
+    return rows_response(rows)
+
+
+def rows_response(rows: Iterable[dict], status_code: int = 200) -> Response:
+    return Response(
+        orjson.dumps(list(rows), option=ORJSON_OPTIONS),
+        status_code=status_code,
+        media_type="application/json",
+    )
@@ -0,0 +1,59 @@
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+from app.services.events import EventBroker
+
+# Browsers reconnect after this many milliseconds when the stream breaks
+RETRY_MS = 5000
+
+
+def format_event(
+    data: dict, event: Optional[str] = None, id: Optional[int] = None
+) -> str:
+    """
+    A message in the text/event-stream format, the data as a single line of JSON.
+    """
+    lines = []
+    if id is not None:
+        lines.append(f"id: {id}")
+    if event is not None:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(
+    broker: EventBroker, channel: str, heartbeat_interval: float
+) -> AsyncIterator[str]:
+    """
+    The events of a channel as Server-Sent Events, the event name is the type of the
+    event. A comment is sent when nothing happened for `heartbeat_interval` seconds,
+    so proxies keep the connection open and a closed connection is noticed.
+    """
+    async with broker.subscribe(channel) as subscription:
+        yield f"retry: {RETRY_MS}\n\n"
+        event_id = 0
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.get(), timeout=heartbeat_interval
+                )
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            event_id += 1
+            yield format_event(event, event=event.get("type"), id=event_id)
+
+
+def event_stream_response(
+    broker: EventBroker, channel: str, heartbeat_interval: float
+) -> StreamingResponse:
+    return StreamingResponse(
+        event_stream(broker, channel, heartbeat_interval),
+        media_type="text/event-stream",
+        # No caching and no buffering by nginx, every event is sent right away
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,7 @@
 import logging
 import os
 
+import anyio
 from fastapi import FastAPI
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
@@ -8,6 +9,8 @@ from starlette.middleware.cors import CORSMiddleware
 from app.api import (
     allowed_users,
     auth,
+    health,
+    jwks,
     roles,
     user_roles,
     users,
@@ -33,10 +36,35 @@ from app.api.v2.admin import (
     address as admin_address,
 )
 from app.db import init_db
+from app.helpers.responses import AppJSONResponse
+from app.config import get_settings
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import PrometheusMiddleware, metrics_endpoint
+from app.middleware.query_stats import QueryStatsMiddleware
+from app.services.events import event_broker
+from app.services.invalidation import invalidation_bus
+from app.services.mail_outbox import outbox
+from app.services.passwords import password_hasher
+from app.services.token_revocation import revocation_list
+from app.services.user_listing import NEXT_CURSOR_HEADER
 
 log = logging.getLogger("uvicorn")
 
 
+def sub_app_middleware(app_name: str) -> list:
+    settings = get_settings()
+    return [
+        # Outermost, so the response size metric counts the compressed bytes
+        Middleware(PrometheusMiddleware, app_name=app_name),
+        Middleware(
+            CompressionMiddleware,
+            minimum_size=settings.compression_minimum_size,
+            offload_size=settings.compression_offload_size,
+        ),
+        Middleware(QueryStatsMiddleware),
+    ]
+
+
 def create_application() -> FastAPI:
     origin_regex = os.getenv("ORIGIN_REGEX", ".*")
     middleware = [
@@ -46,13 +74,19 @@ def create_application() -> FastAPI:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=[NEXT_CURSOR_HEADER],
         )
     ]
 
     application = FastAPI(middleware=middleware, root_path="/api")
+    application.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+    application.include_router(health.router, prefix="/health", tags=["health"])
+    application.include_router(jwks.router, prefix="/.well-known", tags=["jwks"])
 
     # Api voor de nuxt frontend
-    app_v1 = FastAPI()
+    app_v1 = FastAPI(
+        middleware=sub_app_middleware("v1"), default_response_class=AppJSONResponse
+    )
     app_v1.include_router(auth.router, prefix="/auth", tags=["auth"])
     app_v1.include_router(users.router, prefix="/users", tags=["users"])
     app_v1.include_router(
@@ -79,7 +113,9 @@ def create_application() -> FastAPI:
     application.mount("/v1", app_v1)
 
     # Api voor de quasar frontend
-    app_v2 = FastAPI()
+    app_v2 = FastAPI(
+        middleware=sub_app_middleware("v2"), default_response_class=AppJSONResponse
+    )
 
     app_v2.include_router(v2_auth.router, prefix="/auth", tags=["auth"])
     app_v2.include_router(
@@ -119,8 +155,19 @@ app = create_application()
 async def startup_event():
     log.info("Starting up...")
     init_db(app)
+    # Registered after the tortoise startup handler, so the database is ready
+    app.add_event_handler("startup", outbox.start)
+    app.add_event_handler("startup", revocation_list.start)
+    app.add_event_handler("startup", event_broker.start)
+    app.add_event_handler("startup", invalidation_bus.start)
+    # Made now, so the first login for an unknown email isn't slower than later ones
+    await anyio.to_thread.run_sync(password_hasher.dummy_hash)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     log.info("Shutting down...")
+    await outbox.stop()
+    await password_hasher.wait()
+    await revocation_list.stop()
+    await event_broker.stop()
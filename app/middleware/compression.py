@@ -0,0 +1,175 @@
+import zlib
+from typing import Iterable, Optional
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+COMPRESSIBLE_CONTENT_TYPES = (
+    "application/json",
+    "text/csv",
+    "text/html",
+    "text/plain",
+)
+GZIP_LEVEL = 6
+# Quality 4 gives most of brotli's gain over gzip at about the same CPU cost
+BROTLI_QUALITY = 4
+
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Picks "br" or "gzip" from an Accept-Encoding header, brotli when the client
+    accepts both. Encodings with q=0 are refused.
+    """
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        params = params.replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    return compressor.compress(body) + compressor.flush()
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress, self.finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(
+                GZIP_LEVEL, zlib.DEFLATED, zlib.MAX_WBITS | 16
+            )
+            self.compress, self.finish = compressor.compress, compressor.flush
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with brotli or gzip, depending on Accept-Encoding.
+
+    Only bodies of at least `minimum_size` bytes with an allowed content type are
+    compressed. Bodies from `offload_size` bytes are compressed in a worker thread,
+    so a large export does not block the event loop for other requests. Streaming
+    responses are compressed chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        offload_size: int = 256 * 1024,
+        content_types: Iterable[str] = COMPRESSIBLE_CONTENT_TYPES,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.content_types = tuple(content_types)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self, encoding)(scope, receive, send)
+
+    def should_compress(self, headers: Headers) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip()
+        return content_type in self.content_types
+
+
+class _CompressedResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.start_message: Optional[Message] = None
+        self.compress = False
+        self.streaming: Optional[_StreamCompressor] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.middleware.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body part tells whether it is worth it
+            self.start_message = message
+            self.compress = self.middleware.should_compress(
+                Headers(raw=message["headers"])
+            )
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+        if not self.compress:
+            await self._send_start()
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.streaming is not None:
+            chunk = self.streaming.compress(body)
+            if not more_body:
+                chunk += self.streaming.finish()
+            await self.send({**message, "body": chunk})
+            return
+
+        if more_body:
+            self.streaming = _StreamCompressor(self.encoding)
+            headers = self._compressed_headers()
+            del headers["content-length"]
+            await self._send_start()
+            await self.send({**message, "body": self.streaming.compress(body)})
+            return
+
+        if len(body) < self.middleware.minimum_size:
+            MutableHeaders(raw=self.start_message["headers"]).add_vary_header(
+                "Accept-Encoding"
+            )
+            await self._send_start()
+            await self.send(message)
+            return
+        if len(body) >= self.middleware.offload_size:
+            compressed = await anyio.to_thread.run_sync(compress, body, self.encoding)
+        else:
+            compressed = compress(body, self.encoding)
+        headers = self._compressed_headers()
+        headers["content-length"] = str(len(compressed))
+        await self._send_start()
+        await self.send({**message, "body": compressed})
+
+    def _compressed_headers(self) -> MutableHeaders:
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["content-encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        return headers
+
+    async def _send_start(self) -> None:
+        if self.start_message is not None:
+            await self.send(self.start_message)
+            self.start_message = None
@@ -0,0 +1,154 @@
+import os
+import time
+from typing import Dict, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "Number of handled requests",
+    ["app", "method", "route", "status"],
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request",
+    ["app", "method", "route"],
+)
+REQUEST_SIZE = Histogram(
+    "http_request_size_bytes",
+    "Size of the request body",
+    ["app", "method", "route"],
+    buckets=SIZE_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of the response body",
+    ["app", "method", "route"],
+    buckets=SIZE_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Number of requests that are being handled",
+    ["app", "method"],
+    multiprocess_mode="livesum",
+)
+EXCEPTIONS = Counter(
+    "http_exceptions_total",
+    "Number of requests that ended in an unhandled exception",
+    ["app", "method", "route"],
+)
+
+
+class PrometheusMiddleware:
+    """
+    Records latency, request/response size and in-flight requests per route template.
+
+    Plain ASGI middleware so the overhead stays small: the route template is read from
+    the scope after routing and the labelled metric children are cached.
+    """
+
+    def __init__(self, app: ASGIApp, app_name: str):
+        self.app = app
+        self.app_name = app_name
+        self._in_progress: Dict[str, Gauge] = {}
+        self._route_metrics: Dict[Tuple[str, str], tuple] = {}
+        self._counters: Dict[Tuple[str, str, int], Counter] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        in_progress = self._in_progress.get(method)
+        if in_progress is None:
+            in_progress = REQUESTS_IN_PROGRESS.labels(self.app_name, method)
+            self._in_progress[method] = in_progress
+
+        status_code = 500
+        response_size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            EXCEPTIONS.labels(self.app_name, method, self._route(scope)).inc()
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            in_progress.dec()
+            route = self._route(scope)
+            latency, request_size, response_size_histogram = self._metrics_for(
+                method, route
+            )
+            latency.observe(duration)
+            request_size.observe(_content_length(scope))
+            response_size_histogram.observe(response_size)
+            self._counter_for(method, route, status_code).inc()
+
+    @staticmethod
+    def _route(scope: Scope) -> str:
+        route = scope.get("route")
+        return route.path if route is not None else "__unmatched__"
+
+    def _metrics_for(self, method: str, route: str) -> tuple:
+        metrics = self._route_metrics.get((method, route))
+        if metrics is None:
+            labels = (self.app_name, method, route)
+            metrics = (
+                REQUEST_LATENCY.labels(*labels),
+                REQUEST_SIZE.labels(*labels),
+                RESPONSE_SIZE.labels(*labels),
+            )
+            self._route_metrics[(method, route)] = metrics
+        return metrics
+
+    def _counter_for(self, method: str, route: str, status_code: int) -> Counter:
+        counter = self._counters.get((method, route, status_code))
+        if counter is None:
+            counter = REQUESTS.labels(self.app_name, method, route, str(status_code))
+            self._counters[(method, route, status_code)] = counter
+        return counter
+
+
+def _content_length(scope: Scope) -> int:
+    for name, value in scope["headers"]:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+    return 0
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    # With several gunicorn workers every worker writes its own files in this directory
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,142 @@
+import functools
+import logging
+import sys
+import time
+from contextvars import ContextVar
+from typing import List, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from tortoise import Tortoise
+
+from app.config import get_settings
+
+log = logging.getLogger("uvicorn")
+
+INSTRUMENTED_METHODS = (
+    "execute_insert",
+    "execute_many",
+    "execute_query",
+    "execute_query_dict",
+    "execute_script",
+)
+
+
+class QueryStats:
+    """
+    Number of queries and time spent in the database for one request.
+
+    Stats can be nested: every query is also counted in the parent, so a test can
+    collect the queries of several requests at once.
+    """
+
+    def __init__(
+        self,
+        scope: Optional[Scope] = None,
+        parent: Optional["QueryStats"] = None,
+        record_queries: bool = False,
+    ):
+        self.scope = scope
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.queries: Optional[List[str]] = [] if record_queries else None
+
+    @property
+    def route(self) -> str:
+        stats = self
+        while stats is not None:
+            if stats.scope is not None and stats.scope.get("route") is not None:
+                return stats.scope["route"].path
+            stats = stats.parent
+        return "-"
+
+    def record(self, query: str, duration: float) -> None:
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.duration += duration
+            if stats.queries is not None:
+                stats.queries.append(query)
+            stats = stats.parent
+
+
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def _instrument(method):
+    @functools.wraps(method)
+    async def _wrapper(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(self, query, *args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+            stats = query_stats.get()
+            if stats is not None:
+                stats.record(query, duration)
+            if duration * 1000 >= get_settings().slow_query_threshold_ms:
+                log.warning(
+                    f"Trage query ({duration * 1000:.1f} ms) vanuit "
+                    f"{stats.route if stats is not None else '-'}: {query}"
+                )
+
+    _wrapper.__instrumented__ = True
+    return _wrapper
+
+
+def instrument_connection(connection_name: str = "default") -> None:
+    """
+    Wraps the execute methods of the client class behind a Tortoise connection.
+
+    The class is patched instead of the instance, so queries that run inside a
+    transaction (a TransactionWrapper subclass of the client) are counted too.
+    """
+    client_class = type(Tortoise.get_connection(connection_name))
+    classes = [client_class]
+    transaction_wrapper = getattr(
+        sys.modules[client_class.__module__], "TransactionWrapper", None
+    )
+    if transaction_wrapper is not None:
+        classes.append(transaction_wrapper)
+
+    for cls in classes:
+        for name in INSTRUMENTED_METHODS:
+            # Only wrap the implementations, inherited methods are wrapped in the parent
+            method = cls.__dict__.get(name)
+            if method is None or getattr(method, "__instrumented__", False):
+                continue
+            setattr(cls, name, _instrument(method))
+
+
+class QueryStatsMiddleware:
+    """
+    Counts the queries of a request and reports them in a `Server-Timing` header.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope=scope, parent=query_stats.get())
+        token = query_stats.set(stats)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (
+                        b"server-timing",
+                        f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"'.encode(),
+                    )
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            query_stats.reset(token)
@@ -4,4 +4,11 @@ from enum import  Enum
 class MaintenanceIssueStatus(Enum):
     NEW = 0
     OPEN = 1
-    CLOSED = 2
\ No newline at end of file
+    CLOSED = 2
+
+
+class InvitationStatus(str, Enum):
+    SENT = "verstuurd"
+    QUEUED = "in_wachtrij"
+    ALREADY_INVITED = "al_uitgenodigd"
+    ALREADY_REGISTERED = "al_geregistreerd"
@@ -77,6 +77,23 @@ User_Pydantic = pydantic_model_creator(
         "device_login_statusses",
         "reported_maintenance_issues",
         "vakanties",
+        "refresh_sessions",
+    ),
+)
+
+# The admin user list, without the address
+UserList_Pydantic = pydantic_model_creator(
+    Users,
+    name="UserListItem",
+    exclude=(
+        "hashed_password",
+        "confirmation",
+        "working_hours",
+        "device_login_statusses",
+        "reported_maintenance_issues",
+        "vakanties",
+        "refresh_sessions",
+        "address",
     ),
 )
 
@@ -169,6 +186,7 @@ class WeekResult(pydantic.BaseModel):
     sum_milkings: float
     submitted: bool
     working_hours: List[WorkingHoursResponseSchema]
+    vacation_days: List[datetime.date] = []
 
 
 class WeeksNotSubmittedAllUsersResponseSchema(pydantic.BaseModel):
@@ -188,6 +206,7 @@ class WeekData(pydantic.BaseModel):
     sum_hours: float
     sum_milkings: float
     submitted: bool
+    vacation_days: List[datetime.date] = []
 
 
 class WeeksNotSubmittedSingleUsersResponseSchema(pydantic.BaseModel):
@@ -1,8 +1,11 @@
 import datetime
+from typing import List
 
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, Field, validator
 from datetime import date
 
+from app.models.enums import InvitationStatus
+
 
 class AllowedUserRequest(BaseModel):
     email: EmailStr
@@ -17,3 +20,20 @@ class AllowedUserResponse(BaseModel):
     created_at: datetime.datetime
     last_modified_at: datetime.datetime
     email: EmailStr
+
+
+class BulkAllowedUsersRequest(BaseModel):
+    emails: List[EmailStr] = Field(min_length=1, max_length=500)
+
+    @validator("emails", pre=True, always=True)
+    def transform_emails_to_lowercase(cls, value):
+        if isinstance(value, list):
+            return [
+                email.lower() if isinstance(email, str) else email for email in value
+            ]
+        return value
+
+
+class BulkAllowedUserResponse(BaseModel):
+    email: EmailStr
+    status: InvitationStatus
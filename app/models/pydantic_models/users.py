@@ -24,6 +24,17 @@ class UserResponse(BaseModel):
     address: Optional[AddressResponse]
 
 
+class UserListResponse(BaseModel):
+    id: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    email: EmailStr
+    telephone_number: Optional[str]
+    date_of_birth: Optional[datetime.date]
+    is_active: bool
+    roles: list[RoleInUserResponse]
+
+
 class UpdateUserRequest(BaseModel):
     first_name: Optional[str]
     last_name: Optional[str]
@@ -21,6 +21,10 @@ class VakantieResponse(BaseModel):
     end_date: datetime.date
 
 
+class VakantieWithResourceResponse(VakantieResponse):
+    resource_id: int
+
+
 class VakantiesForCalendarResponse(BaseModel):
     id: int
     start: datetime.date
@@ -30,9 +30,42 @@ class WorkingHoursWeekOverviewResponse(BaseModel):
     sum_hours: float
     sum_milkings: float
     submitted: bool
+    vacation_days: List[datetime.date] = []
 
 
 class ReleaseRequest(BaseModel):
     from_date: datetime.date
     to_date: datetime.date
     user_id: int
+
+
+class PayrollResponse(BaseModel):
+    user_id: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    email: str
+    melker: bool
+    part_time: bool
+    contract_hours: float
+    worked_hours: float
+    overtime_hours: float
+    weekend_hours: float
+    holiday_hours: float
+    premium_hours: float
+    days_worked: int
+    vacation_days: int
+    milkings: int
+
+
+class VacationConflictResponse(BaseModel):
+    id: int
+    user_id: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    email: str
+    date: datetime.date
+    hours: Optional[float]
+    milkings: Optional[int]
+    submitted: Optional[bool]
+    vacation_start: datetime.date
+    vacation_end: datetime.date
@@ -212,9 +212,12 @@ class LoginStatusDevices(models.Model):
     id = fields.IntField(pk=True)
     created_at = fields.DatetimeField(auto_now_add=True)
     last_modified_at = fields.DatetimeField(auto_now=True)
-    device_id = fields.CharField(null=True, max_length=500)
+    # Looked up on every launch of the app
+    device_id = fields.CharField(null=True, max_length=500, index=True)
     logged_in = fields.BooleanField(null=False, default=False)
     last_provided_access_token = fields.CharField(null=True, max_length=500)
+    # Refresh session family of the device, ended on logout
+    refresh_family_id = fields.CharField(null=True, max_length=32)
     # Relations
     user = fields.ForeignKeyField("models.Users", related_name="device_login_statusses")
 
@@ -233,3 +236,59 @@ class Vakanties(models.Model):
 
     class Meta:
         table = "vakanties"
+
+
+class MailOutbox(models.Model):
+    id = fields.IntField(pk=True)
+    created_at = fields.DatetimeField(auto_now_add=True)
+    last_modified_at = fields.DatetimeField(auto_now=True)
+    subject = fields.CharField(null=False, max_length=255)
+    template_name = fields.CharField(null=False, max_length=255)
+    recipients = fields.JSONField(null=False)
+    body = fields.JSONField(null=False)
+    # pending -> sending -> sent, or failed after the last attempt
+    status = fields.CharField(null=False, max_length=20, default="pending", index=True)
+    attempts = fields.IntField(null=False, default=0)
+    next_attempt_at = fields.DatetimeField(null=False, index=True)
+    last_error = fields.TextField(null=True)
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+    class Meta:
+        table = "mail_outbox"
+
+
+class RevokedTokens(models.Model):
+    id = fields.IntField(pk=True)
+    # The workers load the revocations by creation time
+    created_at = fields.DatetimeField(auto_now_add=True, index=True)
+    jti = fields.CharField(null=False, max_length=32, unique=True)
+    # Same as the exp claim, after that the token is rejected anyway and the row can go
+    expires_at = fields.DatetimeField(null=False, index=True)
+
+    def __str__(self):
+        return self.jti
+
+    class Meta:
+        table = "revoked_tokens"
+
+
+class RefreshSessions(models.Model):
+    # The jti of the refresh token, every refresh replaces the row by a new one
+    jti = fields.CharField(pk=True, max_length=32)
+    # All tokens that descend from one login share the family id
+    family_id = fields.CharField(null=False, max_length=32, index=True)
+    user = fields.ForeignKeyField("models.Users", related_name="refresh_sessions")
+    created_at = fields.DatetimeField(auto_now_add=True)
+    expires_at = fields.DatetimeField(null=False, index=True)
+    rotated_at = fields.DatetimeField(null=True)
+    # The one extra exchange within the reuse grace was made
+    grace_used = fields.BooleanField(default=False)
+    revoked = fields.BooleanField(default=False)
+
+    def __str__(self):
+        return self.jti
+
+    class Meta:
+        table = "refresh_sessions"
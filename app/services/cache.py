@@ -0,0 +1,170 @@
+import asyncio
+import time
+import weakref
+from collections import OrderedDict
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Hashable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from prometheus_client import Counter, Gauge
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Number of cache lookups, per cache and result (hit or miss)",
+    ["cache", "result"],
+)
+CACHE_LOADS = Counter(
+    "cache_loads_total",
+    "Number of times a cache loaded a value, per cache and outcome",
+    ["cache", "outcome"],
+)
+CACHE_EVICTIONS = Counter(
+    "cache_evictions_total",
+    "Number of values removed from a cache, per cache and reason",
+    ["cache", "reason"],
+)
+CACHE_SIZE = Gauge(
+    "cache_size",
+    "Number of values in a cache",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+
+V = TypeVar("V")
+
+_caches: "weakref.WeakSet[ReadThroughCache]" = weakref.WeakSet()
+
+
+class ReadThroughCache(Generic[V]):
+    """
+    Async read-through cache of values that are loaded by key.
+
+    - a value is kept for `ttl` seconds, as a safety net for changes that weren't
+      invalidated (None keeps it until it is invalidated)
+    - beyond `max_size` keys the least recently used one is evicted
+    - concurrent misses for a key share one load; a failed load isn't cached, all
+      waiting callers get its exception
+    - `invalidate` drops keys; a load that was running at that moment isn't stored,
+      callers that come after the invalidation start a new load
+
+    Values are shared between callers and must not be modified.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        loader: Callable[[Hashable], Awaitable[V]],
+        ttl: Optional[float] = None,
+        max_size: int = 128,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.loader = loader
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        # key -> (value, expires at)
+        self._values: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Task] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+        _caches.add(self)
+
+    async def get(self, key: Hashable = None) -> V:
+        entry = self._values.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > self.clock():
+                self._values.move_to_end(key)
+                self._count("hits")
+                CACHE_REQUESTS.labels(self.name, "hit").inc()
+                return value
+            self._remove(key, "expirations", "expired")
+        self._count("misses")
+        CACHE_REQUESTS.labels(self.name, "miss").inc()
+
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key))
+            self._loading[key] = task
+        # A caller that gives up doesn't cancel the load for the others
+        return await asyncio.shield(task)
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """
+        Drops the given keys, or everything without keys.
+        """
+        for key in keys or list(self._values):
+            if key in self._values:
+                self._remove(key, "invalidations", "invalidated")
+        for key in keys or list(self._loading):
+            self._loading.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            "name": self.name,
+            "size": len(self._values),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            **self._stats,
+            "hit_ratio": self._stats["hits"] / lookups if lookups else None,
+        }
+
+    async def _load(self, key: Hashable) -> V:
+        task = asyncio.current_task()
+        try:
+            value = await self.loader(key)
+        except BaseException:
+            self._count("load_errors")
+            CACHE_LOADS.labels(self.name, "error").inc()
+            raise
+        else:
+            self._count("loads")
+            CACHE_LOADS.labels(self.name, "ok").inc()
+            # Not stored when the key was invalidated during the load
+            if self._loading.get(key) is task:
+                self._store(key, value)
+            return value
+        finally:
+            if self._loading.get(key) is task:
+                del self._loading[key]
+
+    def _store(self, key: Hashable, value: V) -> None:
+        expires_at = float("inf") if self.ttl is None else self.clock() + self.ttl
+        self._values[key] = (value, expires_at)
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_size:
+            self._remove(next(iter(self._values)), "evictions", "size")
+        CACHE_SIZE.labels(self.name).set(len(self._values))
+
+    def _remove(self, key: Hashable, stat: str, reason: str) -> None:
+        del self._values[key]
+        self._count(stat)
+        CACHE_EVICTIONS.labels(self.name, reason).inc()
+        CACHE_SIZE.labels(self.name).set(len(self._values))
+
+    def _count(self, stat: str) -> None:
+        self._stats[stat] += 1
+
+
+def cache_stats() -> List[dict]:
+    """
+    Stats of all caches of this worker, by name.
+    """
+    return sorted((cache.stats() for cache in _caches), key=lambda s: s["name"])
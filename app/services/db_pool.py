@@ -0,0 +1,102 @@
+import asyncio
+import time
+from typing import Optional
+
+from prometheus_client import Gauge, Histogram
+from tortoise import Tortoise
+
+from app.config import get_settings
+
+POOL_SIZE = Gauge(
+    "db_pool_size",
+    "Number of open connections in the database pool",
+    multiprocess_mode="livesum",
+)
+POOL_MAX_SIZE = Gauge(
+    "db_pool_max_size",
+    "Maximum number of connections in the database pool",
+    multiprocess_mode="livesum",
+)
+POOL_IN_USE = Gauge(
+    "db_pool_in_use",
+    "Number of connections that are checked out of the database pool",
+    multiprocess_mode="livesum",
+)
+POOL_ACQUIRE_WAIT = Histogram(
+    "db_pool_acquire_seconds",
+    "Time spent waiting for a connection from the database pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5),
+)
+
+
+def _get_pool(connection_name: str = "default"):
+    return getattr(Tortoise.get_connection(connection_name), "_pool", None)
+
+
+class InstrumentedPool:
+    """
+    Wraps an asyncpg pool to measure the wait for a connection and the connections
+    in use. asyncpg's Pool has slots, so its methods can't be patched in place.
+    """
+
+    def __init__(self, pool):
+        self._pool = pool
+        POOL_MAX_SIZE.set(pool.get_max_size())
+        POOL_SIZE.set(pool.get_size())
+
+    def __getattr__(self, name: str):
+        return getattr(self._pool, name)
+
+    async def acquire(self, *, timeout: Optional[float] = None):
+        start = time.perf_counter()
+        connection = await self._pool.acquire(timeout=timeout)
+        POOL_ACQUIRE_WAIT.observe(time.perf_counter() - start)
+        POOL_IN_USE.inc()
+        POOL_SIZE.set(self._pool.get_size())
+        return connection
+
+    async def release(self, connection, *, timeout: Optional[float] = None) -> None:
+        try:
+            await self._pool.release(connection, timeout=timeout)
+        finally:
+            POOL_IN_USE.dec()
+            POOL_SIZE.set(self._pool.get_size())
+
+
+def instrument_pool(connection_name: str = "default") -> None:
+    """
+    Exports occupancy and wait time of the asyncpg pool behind a Tortoise connection.
+
+    The pool is created again when the client reconnects, so `create_pool` is wrapped
+    as well. Backends without a pool (sqlite) are left alone.
+    """
+    client = Tortoise.get_connection(connection_name)
+    if not hasattr(client, "create_pool"):
+        return
+    if client._pool is not None and not isinstance(client._pool, InstrumentedPool):
+        client._pool = InstrumentedPool(client._pool)
+    create_pool = client.create_pool
+
+    async def _create_pool(**kwargs):
+        return InstrumentedPool(await create_pool(**kwargs))
+
+    client.create_pool = _create_pool
+
+
+async def check_pool(connection_name: str = "default") -> dict:
+    """
+    Runs a query over the pool, raises when no connection is available in time.
+    """
+    timeout = get_settings().db_pool_acquire_timeout
+    client = Tortoise.get_connection(connection_name)
+    start = time.perf_counter()
+    await asyncio.wait_for(client.execute_query("SELECT 1"), timeout)
+    status = {"database": "ok", "query_ms": round((time.perf_counter() - start) * 1000, 1)}
+    pool = _get_pool(connection_name)
+    if pool is not None:
+        status.update(
+            pool_size=pool.get_size(),
+            pool_idle=pool.get_idle_size(),
+            pool_max_size=pool.get_max_size(),
+        )
+    return status
@@ -0,0 +1,86 @@
+import asyncio
+import logging
+import time
+
+from tortoise import connections
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from app.config import get_settings
+
+log = logging.getLogger("uvicorn")
+
+# A replica that replayed everything it received is up to date, even when the
+# primary has not written anything for a while.
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END AS lag
+"""
+
+
+class ReplicaRouter:
+    """
+    Chooses the connection for read-only queries.
+
+    The replica is used when it is configured and its replication lag is below
+    DB_REPLICA_MAX_LAG_SECONDS, otherwise the primary. The lag is checked at most
+    once per DB_REPLICA_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self, connection_name: str = "replica", primary_name: str = "default"):
+        self.connection_name = connection_name
+        self.primary_name = primary_name
+        self._lock = asyncio.Lock()
+        self._checked_at = float("-inf")
+        self._usable = False
+
+    def configured(self) -> bool:
+        return self.connection_name in connections.db_config
+
+    async def connection(self) -> BaseDBAsyncClient:
+        if self.configured() and await self._replica_usable():
+            return connections.get(self.connection_name)
+        return connections.get(self.primary_name)
+
+    async def replica_lag(self) -> float:
+        rows = await connections.get(self.connection_name).execute_query_dict(
+            REPLICA_LAG_QUERY
+        )
+        return float(rows[0]["lag"])
+
+    def reset(self) -> None:
+        self._checked_at = float("-inf")
+
+    async def _replica_usable(self) -> bool:
+        settings = get_settings()
+        if time.monotonic() - self._checked_at < settings.db_replica_check_interval:
+            return self._usable
+        async with self._lock:
+            # Another request may have checked while we were waiting
+            if time.monotonic() - self._checked_at < settings.db_replica_check_interval:
+                return self._usable
+            try:
+                lag = await self.replica_lag()
+            except Exception as e:
+                log.warning(f"Replica niet bereikbaar, lezen van de primary: {e!r}")
+                self._usable = False
+            else:
+                self._usable = lag <= settings.db_replica_max_lag_seconds
+                if not self._usable:
+                    log.warning(
+                        f"Replica loopt {lag:.1f} seconden achter, lezen van de primary"
+                    )
+            self._checked_at = time.monotonic()
+        return self._usable
+
+
+replica_router = ReplicaRouter()
+
+
+async def read_only_connection() -> BaseDBAsyncClient:
+    """
+    Dependency for routes that only read, use it with `.using_db(db)`.
+    """
+    return await replica_router.connection()
@@ -0,0 +1,313 @@
+import asyncio
+import json
+import logging
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+import asyncpg
+from tortoise import Tortoise
+
+from app.config import get_settings
+
+log = logging.getLogger("uvicorn")
+
+WORKING_HOURS = "working_hours"
+
+# Postgres refuses NOTIFY payloads from 8000 bytes
+MAX_PAYLOAD_SIZE = 7999
+
+
+class Subscription:
+    """
+    Events of one channel for one client, in a bounded queue.
+
+    Publishing never waits for a client. When a client doesn't keep up and its
+    queue is full, the queued events are dropped and replaced by a single "resync"
+    event: the client reloads what it shows instead of working through a backlog.
+    """
+
+    def __init__(self, channel: str, maxsize: int):
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class EventBackend(ABC):
+    """
+    Carries published events to the brokers of all workers.
+
+    `deliver(channel, payload)` of the broker is called for every event on a channel
+    that is listened to, also for the events this worker published itself. A backend
+    implements `publish`; `start`, `stop` and `listen` do nothing unless it needs
+    them.
+    """
+
+    def __init__(self):
+        self.deliver: Callable[[str, str], None] = lambda channel, payload: None
+        self.on_reconnect: Callable[[], None] = lambda: None
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def listen(self, channel: str) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, channel: str, payload: str) -> None:
+        ...
+
+
+class MemoryBackend(EventBackend):
+    """
+    Delivers events within this process only, enough for a single worker.
+    """
+
+    async def publish(self, channel: str, payload: str) -> None:
+        self.deliver(channel, payload)
+
+
+class PostgresBackend(EventBackend):
+    """
+    Events over Postgres NOTIFY, so they reach every worker.
+
+    Events are published with pg_notify on the pool of the app, inside a transaction
+    they are sent on commit. Each worker LISTENs on a dedicated connection outside
+    the pool; when that connection is lost it reconnects and `on_reconnect` is called,
+    as events may have been missed in the meantime.
+    """
+
+    def __init__(self, connect_kwargs: dict, reconnect_delay: float = 1.0):
+        super().__init__()
+        self.connect_kwargs = connect_kwargs
+        self.reconnect_delay = reconnect_delay
+        self._channels: Set[str] = set()
+        self._connection: Optional[asyncpg.Connection] = None
+        self._reconnecting: Optional[asyncio.Task] = None
+        self._stopped = False
+
+    @classmethod
+    def from_connection(cls, connection_name: str = "default") -> "PostgresBackend":
+        client = Tortoise.get_connection(connection_name)
+        return cls(
+            {
+                "host": client.host,
+                "port": client.port,
+                "user": client.user,
+                "password": client.password,
+                "database": client.database,
+            }
+        )
+
+    async def start(self) -> None:
+        self._stopped = False
+        await self._connect()
+
+    async def stop(self) -> None:
+        self._stopped = True
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+            self._reconnecting = None
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+    async def listen(self, channel: str) -> None:
+        if channel in self._channels:
+            return
+        self._channels.add(channel)
+        if self._connection is not None:
+            await self._connection.add_listener(channel, self._notification)
+
+    async def publish(self, channel: str, payload: str) -> None:
+        await Tortoise.get_connection("default").execute_query(
+            "SELECT pg_notify($1, $2)", [channel, payload]
+        )
+
+    async def _connect(self) -> None:
+        connection = await asyncpg.connect(**self.connect_kwargs)
+        for channel in self._channels:
+            await connection.add_listener(channel, self._notification)
+        connection.add_termination_listener(self._terminated)
+        self._connection = connection
+
+    def _notification(self, connection, pid, channel: str, payload: str) -> None:
+        self.deliver(channel, payload)
+
+    def _terminated(self, connection) -> None:
+        if self._stopped or connection is not self._connection:
+            return
+        self._connection = None
+        self._reconnecting = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = self.reconnect_delay
+        while not self._stopped:
+            await asyncio.sleep(delay)
+            try:
+                await self._connect()
+            except Exception as e:
+                log.warning(f"Geen verbinding voor events, opnieuw over {delay}s: {e}")
+                delay = min(delay * 2, 30.0)
+                continue
+            self._reconnecting = None
+            self.on_reconnect()
+            return
+
+
+class EventBroker:
+    """
+    Publish/subscribe of small JSON events on named channels.
+
+    Routes publish after a write. Clients subscribe with a bounded queue, see
+    `Subscription`; services add a listener, a quick function that is called with
+    every event in the event loop. The backend decides which workers receive the
+    events: memory for a single process, Postgres when workers share a database (the
+    default on Postgres, EVENTS_BACKEND overrides). Until `start` the broker works in
+    memory.
+    """
+
+    def __init__(self, backend: Optional[EventBackend] = None, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscriptions: Dict[str, Set[Subscription]] = {}
+        self._listeners: Dict[str, List[Callable[[dict], None]]] = {}
+        self.backend = backend or MemoryBackend()
+        self._attach(self.backend)
+
+    async def start(self, backend: Optional[EventBackend] = None) -> None:
+        if backend is None:
+            backend = self._backend_from_settings()
+        await self.backend.stop()
+        self.backend = backend
+        self._attach(backend)
+        for channel in {*self._subscriptions, *self._listeners}:
+            await backend.listen(channel)
+        await backend.start()
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator[Subscription]:
+        await self.backend.listen(channel)
+        subscription = Subscription(channel, self.queue_size)
+        self._subscriptions.setdefault(channel, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            self._subscriptions[channel].discard(subscription)
+
+    async def add_listener(
+        self, channel: str, listener: Callable[[dict], None]
+    ) -> None:
+        await self.backend.listen(channel)
+        self._listeners.setdefault(channel, []).append(listener)
+
+    async def publish(self, channel: str, event: dict) -> None:
+        """
+        Publishes an event; failing to do so is logged, the write it reports on
+        already happened.
+        """
+        payload = json.dumps(event, default=str)
+        if len(payload.encode()) > MAX_PAYLOAD_SIZE:
+            log.error(f"Event op {channel} is te groot: {payload[:200]}")
+            return
+        try:
+            await self.backend.publish(channel, payload)
+        except Exception as e:
+            log.exception(f"Fout bij het versturen van een event op {channel}: {e}")
+
+    def _attach(self, backend: EventBackend) -> None:
+        backend.deliver = self._deliver
+        backend.on_reconnect = self._resync
+
+    def _backend_from_settings(self) -> EventBackend:
+        name = get_settings().events_backend
+        if name is None:
+            client = Tortoise.get_connection("default")
+            postgres = client.capabilities.dialect == "postgres"
+            name = "postgres" if postgres else "memory"
+        if name == "postgres":
+            return PostgresBackend.from_connection()
+        return MemoryBackend()
+
+    def _deliver(self, channel: str, payload: str) -> None:
+        subscriptions = self._subscriptions.get(channel, ())
+        listeners = self._listeners.get(channel, ())
+        if not subscriptions and not listeners:
+            return
+        event = json.loads(payload)
+        for subscription in subscriptions:
+            subscription.put(event)
+        for listener in listeners:
+            self._call(listener, event)
+
+    def _resync(self) -> None:
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.put({"type": "resync"})
+        for listeners in self._listeners.values():
+            for listener in listeners:
+                self._call(listener, {"type": "resync"})
+
+    @staticmethod
+    def _call(listener: Callable[[dict], None], event: dict) -> None:
+        try:
+            listener(event)
+        except Exception as e:
+            log.exception(f"Fout bij het verwerken van een event: {e}")
+
+
+async def publish_working_hours(item, kind: Optional[str] = None) -> None:
+    """
+    Event for a WorkingHours row; by default "submit" when it is submitted and
+    "upsert" when not.
+    """
+    if kind is None:
+        kind = "submit" if item.submitted else "upsert"
+    await event_broker.publish(
+        WORKING_HOURS,
+        {
+            "type": kind,
+            "id": item.id,
+            "user_id": item.user_id,
+            "date": item.date,
+            "hours": item.hours,
+            "milkings": item.milkings,
+            "submitted": item.submitted,
+        },
+    )
+
+
+async def publish_release(user_id: int, dates) -> None:
+    """
+    Event for the working hours of a user that were released again for editing.
+    """
+    if dates:
+        await event_broker.publish(
+            WORKING_HOURS,
+            {
+                "type": "release",
+                "user_id": user_id,
+                "from_date": min(dates),
+                "to_date": max(dates),
+            },
+        )
+
+
+event_broker = EventBroker(queue_size=get_settings().events_queue_size)
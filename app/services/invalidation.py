@@ -0,0 +1,80 @@
+import uuid
+from typing import Callable, Dict, List, Optional, Type
+
+from tortoise.models import Model
+from tortoise.signals import post_delete, post_save
+
+from app.models.tortoise import Machines, Roles, Users
+from app.services.events import EventBroker, event_broker
+
+CACHE_INVALIDATION = "cache_invalidation"
+
+Evict = Callable[[Optional[str]], None]
+
+
+class InvalidationBus:
+    """
+    Tells the in-process caches of all workers that an entity changed.
+
+    A cache registers a function with `on(entity, evict)`; it is called with the key
+    (the primary key as a string) of the changed row, or None when anything of the
+    entity may have changed. Saving or deleting a watched model publishes the change
+    by itself. Changes that don't go through `save` or `delete` (queryset updates,
+    many-to-many relations) are published with `publish`.
+
+    The caches of this worker are evicted right away, before the write returns, the
+    other workers follow when the event reaches them. When the connection for the
+    events was lost, events may have been missed and all caches are evicted.
+    """
+
+    def __init__(self, broker: EventBroker, channel: str = CACHE_INVALIDATION):
+        self.broker = broker
+        self.channel = channel
+        # Own events come back over Postgres, they were already handled
+        self.origin = uuid.uuid4().hex
+        self._evictors: Dict[str, List[Evict]] = {}
+
+    def on(self, entity: str, evict: Evict) -> None:
+        self._evictors.setdefault(entity, []).append(evict)
+
+    def off(self, entity: str, evict: Evict) -> None:
+        self._evictors[entity].remove(evict)
+
+    def watch(self, model: Type[Model], entity: Optional[str] = None) -> None:
+        """
+        Publishes every save and delete of a model, by default as its table name.
+        """
+        entity = entity or model._meta.db_table
+
+        async def changed(sender, instance, *args) -> None:
+            await self.publish(entity, instance.pk)
+
+        post_save(model)(changed)
+        post_delete(model)(changed)
+
+    async def start(self) -> None:
+        await self.broker.add_listener(self.channel, self._receive)
+
+    async def publish(self, entity: str, key=None) -> None:
+        key = None if key is None else str(key)
+        self._evict(entity, key)
+        await self.broker.publish(
+            self.channel, {"entity": entity, "key": key, "origin": self.origin}
+        )
+
+    def _receive(self, event: dict) -> None:
+        if event.get("type") == "resync":
+            for entity in self._evictors:
+                self._evict(entity, None)
+        elif event.get("origin") != self.origin:
+            self._evict(event["entity"], event.get("key"))
+
+    def _evict(self, entity: str, key: Optional[str]) -> None:
+        for evict in self._evictors.get(entity, ()):
+            evict(key)
+
+
+invalidation_bus = InvalidationBus(event_broker)
+# Bouwplannen are replaced per year by the upload, which publishes once for the year
+for model in (Users, Roles, Machines):
+    invalidation_bus.watch(model)
@@ -0,0 +1,368 @@
+import asyncio
+import datetime
+import logging
+import time
+from contextlib import asynccontextmanager
+from email.message import Message
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formatdate, make_msgid
+from typing import Dict, List, Optional, Tuple
+
+import aiosmtplib
+from fastapi_mail import ConnectionConfig
+from fastapi_mail.fastmail import email_dispatched
+from jinja2 import Environment, Template
+from tortoise import timezone
+from tortoise.expressions import F
+from tortoise.transactions import in_transaction
+
+from app.config import get_fastapi_mail_config, get_settings
+from app.models.pydantic import EmailSchema
+from app.models.tortoise import MailOutbox
+
+log = logging.getLogger("uvicorn")
+
+
+class SMTPPool:
+    """
+    Small pool of reusable SMTP sessions, so the TCP connection, TLS handshake and
+    login are done once per session instead of once per mail.
+    """
+
+    def __init__(self, config: ConnectionConfig, size: int = 2, max_idle: int = 60):
+        self.config = config
+        self.max_idle = max_idle
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle: List[Tuple[aiosmtplib.SMTP, float]] = []
+
+    @asynccontextmanager
+    async def session(self):
+        async with self._semaphore:
+            smtp = await self._checkout()
+            try:
+                yield smtp
+            except Exception:
+                await self._discard(smtp)
+                raise
+            self._idle.append((smtp, time.monotonic()))
+
+    async def close(self) -> None:
+        while self._idle:
+            smtp, _ = self._idle.pop()
+            await self._discard(smtp)
+
+    async def _checkout(self) -> aiosmtplib.SMTP:
+        while self._idle:
+            smtp, released_at = self._idle.pop()
+            if smtp.is_connected and time.monotonic() - released_at < self.max_idle:
+                return smtp
+            await self._discard(smtp)
+        return await self._connect()
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.config.MAIL_SERVER,
+            port=self.config.MAIL_PORT,
+            timeout=self.config.TIMEOUT,
+            use_tls=self.config.MAIL_SSL_TLS,
+            start_tls=self.config.MAIL_STARTTLS,
+            validate_certs=self.config.VALIDATE_CERTS,
+        )
+        await smtp.connect()
+        if self.config.USE_CREDENTIALS:
+            await smtp.login(self.config.MAIL_USERNAME, self.config.MAIL_PASSWORD)
+        return smtp
+
+    @staticmethod
+    async def _discard(smtp: aiosmtplib.SMTP) -> None:
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+
+class Outbox:
+    """
+    DB-backed queue for outgoing mail.
+
+    `enqueue` only stores the mail, a background worker delivers it over the SMTP pool
+    and retries failed deliveries with exponential backoff. Because the queue lives in
+    the database, mail that was not sent yet survives a restart. With SUPPRESS_SEND the
+    mail is rendered and recorded right away, just like fastapi-mail does in tests.
+
+    The body holds the template variables, links with tokens included, so it is
+    cleared as soon as a mail is sent or has failed for good. Those rows are deleted
+    after MAIL_OUTBOX_RETENTION_DAYS.
+
+    Templates are compiled once and kept for the lifetime of the process.
+    """
+
+    def __init__(self, config: ConnectionConfig):
+        settings = get_settings()
+        self.config = config
+        self.pool = SMTPPool(
+            config, size=settings.mail_pool_size, max_idle=settings.mail_session_max_idle
+        )
+        self.max_attempts = settings.mail_max_attempts
+        self.retry_backoff = settings.mail_retry_backoff
+        self.poll_interval = settings.mail_poll_interval
+        self.retention = datetime.timedelta(days=settings.mail_outbox_retention_days)
+        self.batch_size = 20
+        self.prune_interval = 3600
+        self._last_prune = 0.0
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._template_env: Optional[Environment] = None
+        self._templates: Dict[str, Template] = {}
+
+    async def enqueue(
+        self, subject: str, template_name: str, email: EmailSchema
+    ) -> MailOutbox:
+        mail = await MailOutbox.create(
+            subject=subject,
+            template_name=template_name,
+            recipients=email.recipient_addresses,
+            body=email.body,
+            next_attempt_at=timezone.now(),
+        )
+        if self.config.SUPPRESS_SEND:
+            mail.attempts = 1
+            await self.deliver(mail)
+        else:
+            self._wakeup.set()
+        return mail
+
+    async def send_batch(
+        self, subject: str, template_name: str, emails: List[EmailSchema]
+    ) -> List[bool]:
+        """
+        Sends a batch of mails right away over a single SMTP session.
+
+        Returns per mail whether it was sent. Mails that could not be sent are queued in
+        the outbox and retried by the worker.
+        """
+        template = self.get_template(template_name)
+        messages = [
+            self._build_message(
+                subject, email.recipient_addresses, template.render(**email.body)
+            )
+            for email in emails
+        ]
+        results: List[bool] = []
+        if self.config.SUPPRESS_SEND:
+            for message in messages:
+                email_dispatched.send(message)
+            return [True] * len(messages)
+        try:
+            async with self.pool.session() as smtp:
+                for message in messages:
+                    try:
+                        await smtp.send_message(message)
+                    except aiosmtplib.SMTPResponseException as e:
+                        log.warning(f"Mail aan {message['To']} geweigerd: {e}")
+                        results.append(False)
+                        continue
+                    email_dispatched.send(message)
+                    results.append(True)
+        except Exception as e:
+            log.warning(f"Versturen van de batch onderbroken: {e}")
+        results.extend([False] * (len(messages) - len(results)))
+
+        failed = [email for email, sent in zip(emails, results) if not sent]
+        if failed:
+            retry_at = timezone.now() + datetime.timedelta(seconds=self.retry_backoff)
+            await MailOutbox.bulk_create(
+                [
+                    MailOutbox(
+                        subject=subject,
+                        template_name=template_name,
+                        recipients=email.recipient_addresses,
+                        body=email.body,
+                        attempts=1,
+                        next_attempt_at=retry_at,
+                    )
+                    for email in failed
+                ]
+            )
+        return results
+
+    def precompile_templates(self) -> None:
+        environment = self._environment()
+        self._templates = {
+            name: environment.get_template(name)
+            for name in environment.list_templates(extensions=["html"])
+        }
+
+    def get_template(self, template_name: str) -> Template:
+        template = self._templates.get(template_name)
+        if template is None:
+            template = self._environment().get_template(template_name)
+            self._templates[template_name] = template
+        return template
+
+    def _environment(self) -> Environment:
+        if self._template_env is None:
+            self._template_env = self.config.template_engine()
+            # Templates only change with a deploy, never check the files again
+            self._template_env.auto_reload = False
+        return self._template_env
+
+    async def start(self) -> None:
+        self.precompile_templates()
+        # Mails that were being sent when a worker stopped are picked up again
+        stale_before = timezone.now() - datetime.timedelta(minutes=10)
+        await MailOutbox.filter(
+            status="sending", last_modified_at__lt=stale_before
+        ).update(status="pending")
+        await self.prune()
+        self._last_prune = time.monotonic()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self.pool.close()
+
+    async def process_due(self) -> int:
+        """
+        Delivers one batch of due mails, returns the number of mails that were sent.
+        """
+        mails = await self._claim_due()
+        sent = 0
+        for mail in mails:
+            sent += await self.deliver(mail)
+        return sent
+
+    async def deliver(self, mail: MailOutbox) -> bool:
+        try:
+            message = await self.render(mail)
+            if not self.config.SUPPRESS_SEND:
+                await self._send(message)
+            email_dispatched.send(message)
+        except Exception as e:
+            await self._reschedule(mail, e)
+            return False
+        mail.status = "sent"
+        mail.body = {}
+        mail.last_error = None
+        await mail.save(
+            update_fields=["status", "body", "last_error", "last_modified_at"]
+        )
+        return True
+
+    async def prune(self) -> int:
+        """
+        Deletes sent and failed mails older than the retention, returns the number of
+        deleted mails.
+        """
+        return await MailOutbox.filter(
+            status__in=["sent", "failed"],
+            last_modified_at__lt=timezone.now() - self.retention,
+        ).delete()
+
+    async def render(self, mail: MailOutbox) -> Message:
+        html = self.get_template(mail.template_name).render(**mail.body)
+        return self._build_message(mail.subject, mail.recipients, html)
+
+    def _build_message(
+        self, subject: str, recipients: List[str], html: str
+    ) -> Message:
+        message = MIMEMultipart("mixed")
+        message.set_charset("utf-8")
+        message.attach(MIMEText(html, _subtype="html", _charset="utf-8"))
+        message["Date"] = formatdate(time.time(), localtime=True)
+        message["Message-ID"] = make_msgid()
+        message["To"] = ", ".join(recipients)
+        message["From"] = self._sender()
+        message["Subject"] = subject
+        return message
+
+    def _sender(self) -> str:
+        if self.config.MAIL_FROM_NAME is not None:
+            return f"{self.config.MAIL_FROM_NAME} <{self.config.MAIL_FROM}>"
+        return self.config.MAIL_FROM
+
+    async def _send(self, message: Message) -> None:
+        try:
+            async with self.pool.session() as smtp:
+                await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # A pooled session can be closed by the server while idle, try a fresh one
+            async with self.pool.session() as smtp:
+                await smtp.send_message(message)
+
+    async def _claim_due(self) -> List[MailOutbox]:
+        async with in_transaction() as connection:
+            mails = (
+                await MailOutbox.filter(
+                    status="pending", next_attempt_at__lte=timezone.now()
+                )
+                .order_by("id")
+                .limit(self.batch_size)
+                .select_for_update(skip_locked=True)
+                .using_db(connection)
+            )
+            if mails:
+                await MailOutbox.filter(id__in=[mail.id for mail in mails]).using_db(
+                    connection
+                ).update(
+                    status="sending",
+                    attempts=F("attempts") + 1,
+                    last_modified_at=timezone.now(),
+                )
+        for mail in mails:
+            mail.status = "sending"
+            mail.attempts += 1
+        return mails
+
+    async def _reschedule(self, mail: MailOutbox, error: Exception) -> None:
+        mail.last_error = str(error)
+        if mail.attempts >= self.max_attempts:
+            mail.status = "failed"
+            mail.body = {}
+            log.error(f"Mail {mail.id} kon niet worden verstuurd: {error}")
+        else:
+            mail.status = "pending"
+            delay = self.retry_backoff * 2 ** (mail.attempts - 1)
+            mail.next_attempt_at = timezone.now() + datetime.timedelta(seconds=delay)
+            log.warning(
+                f"Mail {mail.id} niet verstuurd (poging {mail.attempts}), "
+                f"nieuwe poging over {delay} seconden: {error}"
+            )
+        await mail.save(
+            update_fields=[
+                "status",
+                "body",
+                "last_error",
+                "next_attempt_at",
+                "last_modified_at",
+            ]
+        )
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                while await self.process_due():
+                    pass
+                if time.monotonic() - self._last_prune >= self.prune_interval:
+                    await self.prune()
+                    self._last_prune = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception(f"Fout in de mail outbox: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox = Outbox(get_fastapi_mail_config())
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import secrets
+from typing import Optional, Set
+
+import anyio
+from passlib.context import CryptContext
+
+from app.config import get_settings
+from app.models.tortoise import Users
+
+log = logging.getLogger("uvicorn")
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords with bcrypt at BCRYPT_ROUNDS.
+
+    Hashes with another cost are still accepted and replaced after a successful
+    login, in the background, so changing the cost doesn't slow down logins. Checks
+    run in a worker thread (bcrypt releases the GIL), so a login doesn't block the
+    event loop for other requests.
+    """
+
+    def __init__(self, rounds: int):
+        self.rounds = rounds
+        # Equal min and max: a hash with any other cost needs an update
+        self.context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__default_rounds=rounds,
+            bcrypt__min_rounds=rounds,
+            bcrypt__max_rounds=rounds,
+        )
+        self._dummy_hash: Optional[str] = None
+        self._rehashing: Set[asyncio.Task] = set()
+
+    def hash(self, password: str) -> str:
+        return self.context.hash(password)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return self.context.verify(password, hashed_password)
+
+    def dummy_hash(self) -> str:
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash(secrets.token_urlsafe(16))
+        return self._dummy_hash
+
+    async def check(self, password: str, hashed_password: Optional[str]) -> bool:
+        """
+        Checks a password; without a hash (unknown user) a dummy hash is checked, so
+        the response time doesn't tell whether an account exists.
+        """
+        if hashed_password is None:
+            await anyio.to_thread.run_sync(self.verify, password, self.dummy_hash())
+            return False
+        return await anyio.to_thread.run_sync(self.verify, password, hashed_password)
+
+    def rehash_later(
+        self, user_id: int, password: str, hashed_password: str
+    ) -> Optional[asyncio.Task]:
+        """
+        Replaces the hash of a user in the background when its cost is outdated.
+        """
+        if not self.context.needs_update(hashed_password):
+            return None
+        task = asyncio.create_task(self._rehash(user_id, password, hashed_password))
+        self._rehashing.add(task)
+        task.add_done_callback(self._rehashing.discard)
+        return task
+
+    async def wait(self) -> None:
+        """
+        Waits for the running rehashes, for shutdown and tests.
+        """
+        if self._rehashing:
+            await asyncio.gather(*self._rehashing, return_exceptions=True)
+
+    async def _rehash(self, user_id: int, password: str, hashed_password: str) -> None:
+        try:
+            new_hash = await anyio.to_thread.run_sync(self.hash, password)
+            # Leave the hash alone when the password was changed in the meantime
+            await Users.filter(id=user_id, hashed_password=hashed_password).update(
+                hashed_password=new_hash
+            )
+        except Exception as e:
+            log.exception(f"Fout bij het opnieuw hashen van een wachtwoord: {e}")
+
+
+password_hasher = PasswordHasher(get_settings().bcrypt_rounds)
@@ -0,0 +1,228 @@
+import datetime
+from dataclasses import dataclass
+from typing import List
+
+import anyio
+import numpy as np
+import pandas as pd
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from app.config import get_settings
+from app.helpers.date_functions import public_holidays
+from app.models.tortoise import Users, Vakanties, WorkingHours
+
+PAYROLL_ROLES = ["werknemer", "melker", "part-time"]
+
+
+@dataclass(frozen=True)
+class PayrollRules:
+    """
+    Contract hours per week (spread over Monday to Friday) and the premiums for
+    weekend and public holiday hours, as a fraction of the hourly wage.
+    """
+
+    full_time_hours_per_week: float = 40.0
+    part_time_hours_per_week: float = 24.0
+    weekend_premium: float = 0.5
+    holiday_premium: float = 1.0
+
+    @classmethod
+    def from_settings(cls) -> "PayrollRules":
+        settings = get_settings()
+        return cls(
+            full_time_hours_per_week=settings.payroll_full_time_hours_per_week,
+            part_time_hours_per_week=settings.payroll_part_time_hours_per_week,
+            weekend_premium=settings.payroll_weekend_premium,
+            holiday_premium=settings.payroll_holiday_premium,
+        )
+
+
+def calendar(from_date: datetime.date, to_date: datetime.date) -> pd.DataFrame:
+    """
+    Every day of the range with its ISO week (as year * 100 + week) and whether it
+    is a weekend day, a public holiday or a working day.
+    """
+    dates = pd.date_range(from_date, to_date, freq="D")
+    holidays = {
+        day
+        for year in range(from_date.year, to_date.year + 1)
+        for day in public_holidays(year)
+    }
+    iso = dates.isocalendar()
+    days = pd.DataFrame(
+        {
+            "week": (iso["year"] * 100 + iso["week"]).to_numpy(dtype=np.int64),
+            "holiday": dates.isin(pd.DatetimeIndex(list(holidays))),
+            "weekend": dates.dayofweek >= 5,
+        },
+        index=dates,
+    )
+    days["workday"] = ~days["weekend"] & ~days["holiday"]
+    return days
+
+
+def vacation_days(
+    vacations: pd.DataFrame, from_date: datetime.date, to_date: datetime.date
+) -> pd.DataFrame:
+    """
+    The days of the vacations, clipped to the range, as (user_id, date) without
+    duplicates for overlapping vacations.
+    """
+    start = vacations["start_date"].clip(lower=pd.Timestamp(from_date))
+    end = vacations["end_date"].clip(upper=pd.Timestamp(to_date))
+    lengths = (end - start).dt.days.to_numpy() + 1
+    valid = lengths > 0
+    lengths, start = lengths[valid], start.to_numpy()[valid]
+    users = vacations["user_id"].to_numpy()[valid]
+    # Day offsets 0..length-1 of every vacation, one after the other
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    days = pd.DataFrame(
+        {
+            "user_id": np.repeat(users, lengths),
+            "date": np.repeat(start, lengths) + offsets.astype("timedelta64[D]"),
+        }
+    )
+    return days.drop_duplicates()
+
+
+def compute_payroll(
+    hours: pd.DataFrame,
+    users: pd.DataFrame,
+    vacations: pd.DataFrame,
+    from_date: datetime.date,
+    to_date: datetime.date,
+    rules: PayrollRules = PayrollRules(),
+) -> pd.DataFrame:
+    """
+    Payroll figures per user over a date range, computed on whole columns.
+
+    - hours: user_id, date, hours, milkings; one row per logged day
+    - users: indexed by user_id with melker and part_time flags
+    - vacations: user_id, start_date, end_date
+
+    Contract hours count the working days of the range (no weekend or public
+    holiday) that aren't vacation days. Overtime is worked above the contract per
+    ISO week, so a long day is made up for by a short one in the same week.
+    Weekend hours don't include public holidays that fall in a weekend, those are
+    holiday hours. Milkings are counted for users with the melker role only.
+    """
+    days = calendar(from_date, to_date)
+    user_ids = users.index.to_numpy()
+
+    hours = hours.join(days, on="date", how="inner")
+    by_user = hours.groupby("user_id")
+    worked = by_user["hours"].sum()
+    weekend = hours["hours"].where(hours["weekend"] & ~hours["holiday"], 0.0)
+    holiday = hours["hours"].where(hours["holiday"], 0.0)
+
+    # Working days per week for everyone, less the vacation days of each user
+    workdays_per_week = days.groupby("week")["workday"].sum()
+    grid = pd.MultiIndex.from_product(
+        [user_ids, workdays_per_week.index], names=["user_id", "week"]
+    )
+    vacation = vacation_days(vacations, from_date, to_date).join(
+        days, on="date", how="inner"
+    )
+    vacation = vacation[vacation["workday"]]
+    vacation_per_week = vacation.groupby(["user_id", "week"]).size()
+    contract_days = workdays_per_week.reindex(grid, level="week") - (
+        vacation_per_week.reindex(grid, fill_value=0)
+    )
+    hours_per_day = np.where(
+        users["part_time"], rules.part_time_hours_per_week, rules.full_time_hours_per_week
+    ) / 5
+    contract = contract_days * pd.Series(hours_per_day, index=user_ids).reindex(
+        grid, level="user_id"
+    )
+    worked_per_week = (
+        hours.groupby(["user_id", "week"])["hours"].sum().reindex(grid, fill_value=0)
+    )
+    overtime = (worked_per_week - contract).clip(lower=0)
+
+    result = pd.DataFrame(index=pd.Index(user_ids, name="user_id"))
+    result["contract_hours"] = contract.groupby(level="user_id").sum()
+    result["worked_hours"] = worked
+    result["overtime_hours"] = overtime.groupby(level="user_id").sum()
+    result["weekend_hours"] = weekend.groupby(hours["user_id"]).sum()
+    result["holiday_hours"] = holiday.groupby(hours["user_id"]).sum()
+    result["days_worked"] = (hours["hours"] > 0).groupby(hours["user_id"]).sum()
+    result["vacation_days"] = vacation.groupby("user_id").size()
+    result["milkings"] = by_user["milkings"].sum()
+    # Without hours the sums over the empty frame are object columns
+    result = result.infer_objects(copy=False).fillna(0)
+    result["milkings"] = result["milkings"].where(users["melker"], 0)
+    result["premium_hours"] = (
+        result["weekend_hours"] * rules.weekend_premium
+        + result["holiday_hours"] * rules.holiday_premium
+    )
+    return result.round(2)
+
+
+async def load_payroll_frames(
+    db: BaseDBAsyncClient, from_date: datetime.date, to_date: datetime.date
+):
+    """
+    The columns `compute_payroll` needs, in four queries: the working hours, the
+    payroll roles, the names and the vacations that overlap the range.
+
+    Users with the werknemer role are included also without hours, anyone who
+    logged hours is included as well. Vacations have no approval status, every
+    vacation counts.
+    """
+    hours = pd.DataFrame.from_records(
+        await WorkingHours.filter(date__gte=from_date, date__lte=to_date)
+        .using_db(db)
+        .values_list("user_id", "date", "hours", "milkings"),
+        columns=["user_id", "date", "hours", "milkings"],
+    )
+    hours["date"] = pd.to_datetime(hours["date"])
+    hours["hours"] = hours["hours"].astype(float).fillna(0)
+    hours["milkings"] = hours["milkings"].fillna(0).astype(np.int64)
+
+    roles = pd.DataFrame.from_records(
+        await Users.filter(roles__name__in=PAYROLL_ROLES)
+        .using_db(db)
+        .values_list("id", "roles__name"),
+        columns=["user_id", "role"],
+    )
+    user_ids = set(roles.loc[roles["role"] == "werknemer", "user_id"])
+    user_ids.update(hours["user_id"].unique().tolist())
+    users = pd.DataFrame.from_records(
+        await Users.filter(id__in=list(user_ids))
+        .using_db(db)
+        .values_list("id", "first_name", "last_name", "email"),
+        columns=["user_id", "first_name", "last_name", "email"],
+    ).set_index("user_id")
+    users["melker"] = users.index.isin(roles.loc[roles["role"] == "melker", "user_id"])
+    users["part_time"] = users.index.isin(
+        roles.loc[roles["role"] == "part-time", "user_id"]
+    )
+
+    vacations = pd.DataFrame.from_records(
+        await Vakanties.filter(
+            user_id__in=list(user_ids),
+            start_date__lte=to_date,
+            end_date__gte=from_date,
+        )
+        .using_db(db)
+        .values_list("user_id", "start_date", "end_date"),
+        columns=["user_id", "start_date", "end_date"],
+    )
+    vacations["start_date"] = pd.to_datetime(vacations["start_date"])
+    vacations["end_date"] = pd.to_datetime(vacations["end_date"])
+    return hours, users, vacations
+
+
+async def payroll(
+    db: BaseDBAsyncClient,
+    from_date: datetime.date,
+    to_date: datetime.date,
+    rules: PayrollRules,
+) -> List[dict]:
+    hours, users, vacations = await load_payroll_frames(db, from_date, to_date)
+    result = await anyio.to_thread.run_sync(
+        compute_payroll, hours, users, vacations, from_date, to_date, rules
+    )
+    result = users.join(result).reset_index()
+    result = result.sort_values(["last_name", "first_name", "user_id"])
+    return result.replace({np.nan: None}).to_dict(orient="records")
@@ -0,0 +1,168 @@
+import ipaddress
+import math
+import time
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple, Union
+
+from fastapi import Form, HTTPException, Request
+from starlette import status
+
+from app.config import get_settings
+
+
+class RateLimitBackend(ABC):
+    """
+    Storage of the attempt counters, shared by all workers or per process.
+
+    `hit` counts an attempt for `key` and returns None when it is within `limit` per
+    `window` seconds, otherwise the number of seconds until an attempt is allowed
+    again (a refused attempt isn't counted). A shared backend (Redis, Postgres)
+    implements `hit`.
+    """
+
+    @abstractmethod
+    async def hit(self, key: str, limit: int, window: float) -> Optional[float]:
+        ...
+
+
+class MemoryBackend(RateLimitBackend):
+    """
+    Sliding window counters in a dict, per process.
+
+    Each key holds the count of the current and the previous fixed window; the
+    previous count weighs in for the part of it that still falls within the sliding
+    window. That is two integers per key, however many attempts are made.
+    """
+
+    def __init__(self, max_keys: int = 100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        # key -> (start of the current window, current count, previous count)
+        self._counters: Dict[str, Tuple[float, int, int]] = {}
+
+    async def hit(self, key: str, limit: int, window: float) -> Optional[float]:
+        now = self.clock()
+        start = math.floor(now / window) * window
+        window_start, current, previous = self._counters.get(key, (start, 0, 0))
+        if window_start < start:
+            # Moved to a later window; the old count only matters when it was the
+            # window right before this one
+            previous = current if window_start == start - window else 0
+            current = 0
+        weight = 1 - (now - start) / window
+        if previous * weight + current + 1 > limit:
+            return self._retry_after(now, start, window, limit, current, previous)
+        if key not in self._counters and len(self._counters) >= self.max_keys:
+            self._prune(start, window)
+        self._counters[key] = (start, current + 1, previous)
+        return None
+
+    @staticmethod
+    def _retry_after(now, start, window, limit, current, previous) -> float:
+        # The attempts of the older window fade out until one more attempt fits
+        if current >= limit:
+            start, previous, current = start + window, current, 0
+        if not previous:
+            return start + window - now
+        weight = (limit - current - 1) / previous
+        return max(0.0, start + window * (1 - weight) - now)
+
+    def _prune(self, start: float, window: float) -> None:
+        # Keys without attempts in the last two windows count for nothing anymore
+        self._counters = {
+            key: counter
+            for key, counter in self._counters.items()
+            if counter[0] >= start - window
+        }
+        while len(self._counters) >= self.max_keys:
+            # Still full: drop the oldest half, the attacker loses more than anyone
+            for key in list(self._counters)[: self.max_keys // 2]:
+                del self._counters[key]
+
+
+async def check_login_attempt(
+    backend: RateLimitBackend, ip: str, email: str
+) -> None:
+    """
+    Counts a login attempt per client IP and per email address, raises a 429 when
+    either is over its limit.
+
+    Attempts are counted before the password is checked, so concurrent requests
+    can't get past the limit while earlier ones are still hashing. A user who logs
+    in successfully a few times uses up attempts as well, the limits leave room for
+    that.
+
+    The IP is checked first: a client that is over its limit can't use up the
+    attempts of someone else's email address and lock them out.
+    """
+    settings = get_settings()
+    window = settings.login_rate_limit_window
+    retry_after = await backend.hit(
+        f"login:ip:{ip}", settings.login_rate_limit_per_ip, window
+    )
+    if retry_after is None:
+        retry_after = await backend.hit(
+            f"login:email:{email.lower()}", settings.login_rate_limit_per_email, window
+        )
+    if retry_after is not None:
+        seconds = max(1, math.ceil(retry_after))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=(
+                f"Te veel inlogpogingen, probeer het over {seconds} seconden "
+                "opnieuw"
+            ),
+            headers={"Retry-After": str(seconds)},
+        )
+
+
+login_backend: RateLimitBackend = MemoryBackend()
+
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+@lru_cache
+def _trusted_networks(trusted_proxies: str) -> List[Network]:
+    return [
+        ipaddress.ip_network(proxy.strip(), strict=False)
+        for proxy in trusted_proxies.split(",")
+        if proxy.strip()
+    ]
+
+
+def _is_trusted(host: str, networks: List[Network]) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in networks)
+
+
+def client_address(request: Request) -> str:
+    """
+    The address of the client, as seen by the first proxy it connected to.
+
+    Only a peer in TRUSTED_PROXIES may tell who it forwards for. X-Forwarded-For is
+    read from the right, each trusted proxy appends the address it got the request
+    from; the first address that isn't a trusted proxy is the client. Whatever the
+    client put in the header itself is left of that and never used.
+    """
+    host = request.client.host if request.client is not None else "-"
+    networks = _trusted_networks(get_settings().trusted_proxies)
+    if not _is_trusted(host, networks):
+        return host
+    forwarded = request.headers.get("x-forwarded-for", "")
+    for hop in reversed([hop.strip() for hop in forwarded.split(",") if hop.strip()]):
+        if not _is_trusted(hop, networks):
+            return hop
+    return host
+
+
+async def login_rate_limit(request: Request, username: str = Form(default="")):
+    """
+    Dependency for login routes, answers 429 before the user is loaded or a password
+    is hashed.
+    """
+    await check_login_attempt(login_backend, client_address(request), username)
@@ -0,0 +1,62 @@
+import datetime
+from dataclasses import dataclass
+from typing import List, Optional
+
+from tortoise.models import Model
+from tortoise.queryset import QuerySet
+
+from app.config import get_settings
+from app.helpers.http_caching import collection_validators
+from app.models.tortoise import BouwPlan, Machines, Roles
+from app.services.cache import ReadThroughCache
+from app.services.invalidation import invalidation_bus
+
+
+@dataclass(frozen=True)
+class CachedCollection:
+    """
+    Rows of a collection with the validators for conditional GETs, so a cached
+    collection answers If-None-Match without a query.
+    """
+
+    rows: List[Model]
+    etag: str
+    last_modified: Optional[datetime.datetime]
+
+
+async def load_collection(queryset: QuerySet) -> CachedCollection:
+    etag, last_modified = await collection_validators(queryset)
+    return CachedCollection(await queryset, etag, last_modified)
+
+
+settings = get_settings()
+
+# Reference data changes a few times a year; every save or delete evicts it on all
+# workers, the TTL only limits how long a change outside the app goes unnoticed
+roles_cache: ReadThroughCache[CachedCollection] = ReadThroughCache(
+    "roles",
+    lambda key: load_collection(Roles.all()),
+    ttl=settings.reference_cache_ttl,
+    max_size=1,
+)
+machines_cache: ReadThroughCache[CachedCollection] = ReadThroughCache(
+    "machines",
+    lambda key: load_collection(Machines.all()),
+    ttl=settings.reference_cache_ttl,
+    max_size=1,
+)
+# By year
+bouwplan_cache: ReadThroughCache[CachedCollection] = ReadThroughCache(
+    "bouwplan",
+    lambda year: load_collection(BouwPlan.filter(year=year)),
+    ttl=settings.reference_cache_ttl,
+    max_size=settings.reference_cache_max_size,
+)
+
+invalidation_bus.on("roles", lambda key: roles_cache.invalidate())
+invalidation_bus.on("machines", lambda key: machines_cache.invalidate())
+invalidation_bus.on(
+    "bouwplannen",
+    lambda year: bouwplan_cache.invalidate(*([] if year is None else [int(year)])),
+)
+
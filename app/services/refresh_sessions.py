@@ -0,0 +1,223 @@
+import datetime
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from tortoise import connections, timezone
+
+from app.config import get_settings
+from app.models.tortoise import RefreshSessions, Users
+from app.services.token_revocation import decode_token
+
+# Marks the session as used and registers its successor in one statement, and
+# returns what is needed for the access token, so the user row doesn't have to be
+# loaded separately. Two requests with the same token can't both succeed: only one
+# of them finds rotated_at still empty.
+ROTATE_QUERY = """
+WITH rotated AS (
+    UPDATE refresh_sessions SET rotated_at = $1
+    WHERE jti = $2 AND rotated_at IS NULL AND NOT revoked
+    RETURNING family_id, user_id
+), successor AS (
+    INSERT INTO refresh_sessions
+        (jti, family_id, user_id, created_at, expires_at, rotated_at, grace_used,
+         revoked)
+    SELECT $3, family_id, user_id, $1, $4, NULL, FALSE, FALSE FROM rotated
+)
+SELECT r.family_id, r.user_id, u.email, u.is_active
+FROM rotated AS r JOIN users AS u ON u.id = r.user_id
+"""
+# The rotation of a device's refresh token (see ROTATE_QUERY), only when the token
+# belongs to the family of the device's login and the user is active, and stores the
+# new access token on the device. Returns nothing when any of that doesn't hold.
+ROTATE_DEVICE_QUERY = """
+WITH device AS (
+    SELECT id, user_id, refresh_family_id FROM login_status_device
+    WHERE device_id = $1 AND logged_in
+    LIMIT 1
+), rotated AS (
+    UPDATE refresh_sessions AS s SET rotated_at = $2
+    FROM device AS d JOIN users AS u ON u.id = d.user_id
+    WHERE s.jti = $3 AND s.rotated_at IS NULL AND NOT s.revoked
+        AND s.family_id = d.refresh_family_id AND s.user_id = d.user_id
+        AND u.is_active
+    RETURNING s.family_id, s.user_id, d.id AS device_pk
+), successor AS (
+    INSERT INTO refresh_sessions
+        (jti, family_id, user_id, created_at, expires_at, rotated_at, grace_used,
+         revoked)
+    SELECT $4, family_id, user_id, $2, $5, NULL, FALSE, FALSE FROM rotated
+), device_update AS (
+    UPDATE login_status_device AS d
+    SET last_provided_access_token = $6, last_modified_at = $2
+    FROM rotated AS r WHERE d.id = r.device_pk
+)
+SELECT family_id FROM rotated
+"""
+# SQLite has no data-modifying CTEs and doesn't allow the tables of UPDATE ... FROM
+# in RETURNING, so there the successor is inserted separately.
+SQLITE_ROTATE_QUERY = """
+UPDATE refresh_sessions SET rotated_at = ?
+WHERE jti = ? AND rotated_at IS NULL AND NOT revoked
+RETURNING family_id, user_id,
+    (SELECT u.email FROM users AS u WHERE u.id = refresh_sessions.user_id) AS email,
+    (SELECT u.is_active FROM users AS u WHERE u.id = refresh_sessions.user_id)
+        AS is_active
+"""
+
+
+class RefreshTokenReused(Exception):
+    """
+    A refresh token that was already exchanged is used again.
+    """
+
+
+@dataclass
+class RotatedSession:
+    family_id: str
+    user_id: int
+    email: str
+    is_active: bool
+
+
+class RefreshSessionStore:
+    """
+    Keeps track of issued refresh tokens, so each one can be exchanged only once.
+
+    Every login starts a family of sessions and every refresh replaces the session of
+    the used token by a new one in the same family. When a token that was already
+    exchanged comes back, either the client or an attacker holds a copy, so the whole
+    family is revoked and the user has to log in again.
+    """
+
+    def __init__(self, connection_name: str = "default"):
+        self.connection_name = connection_name
+
+    @staticmethod
+    def _expires_at() -> datetime.datetime:
+        return timezone.now() + datetime.timedelta(
+            minutes=get_settings().refresh_token_lifetime
+        )
+
+    async def start(
+        self, user_id: int, refresh_token: dict, family_id: Optional[str] = None
+    ) -> str:
+        """
+        Registers the refresh token of a login, returns the family id.
+        """
+        family_id = family_id or uuid.uuid4().hex
+        await RefreshSessions.create(
+            jti=refresh_token["jti"],
+            family_id=family_id,
+            user_id=user_id,
+            expires_at=self._expires_at(),
+        )
+        return family_id
+
+    async def rotate(self, jti: str, successor: dict) -> Optional[RotatedSession]:
+        """
+        Exchanges the session of a refresh token for one of its successor.
+
+        Returns None for unknown or revoked tokens and raises RefreshTokenReused, after
+        revoking the family, when the token was used before. Within
+        `refresh_token_reuse_grace` seconds of its rotation a used token is exchanged
+        once more, for clients that refresh concurrently; any further use counts as
+        reuse.
+        """
+        connection = connections.get(self.connection_name)
+        now = timezone.now()
+        if connection.capabilities.dialect == "postgres":
+            rows = await connection.execute_query_dict(
+                ROTATE_QUERY, [now, jti, successor["jti"], self._expires_at()]
+            )
+        else:
+            rows = await connection.execute_query_dict(SQLITE_ROTATE_QUERY, [now, jti])
+            if rows:
+                await self.start(
+                    rows[0]["user_id"], successor, family_id=rows[0]["family_id"]
+                )
+        if rows:
+            row = rows[0]
+            return RotatedSession(
+                family_id=row["family_id"],
+                user_id=row["user_id"],
+                email=row["email"],
+                is_active=bool(row["is_active"]),
+            )
+
+        session = await RefreshSessions.get_or_none(jti=jti).values(
+            "family_id", "user_id", "revoked"
+        )
+        if session is None or session["revoked"]:
+            return None
+        grace = get_settings().refresh_token_reuse_grace
+        # Measured from now, not from the start of this call: the request that won
+        # may have taken its timestamp after this one did. Setting grace_used is the
+        # compare-and-set, of concurrent reuses only one gets the extra exchange.
+        if grace and await RefreshSessions.filter(
+            jti=jti,
+            revoked=False,
+            grace_used=False,
+            rotated_at__gt=timezone.now() - datetime.timedelta(seconds=grace),
+        ).update(grace_used=True):
+            # Refreshed concurrently by the same client, the token gets another
+            # successor in the family
+            await self.start(
+                session["user_id"], successor, family_id=session["family_id"]
+            )
+            user = await Users.get(id=session["user_id"]).values("email", "is_active")
+            return RotatedSession(
+                family_id=session["family_id"],
+                user_id=session["user_id"],
+                email=user["email"],
+                is_active=bool(user["is_active"]),
+            )
+        await self.revoke_family(session["family_id"])
+        raise RefreshTokenReused()
+
+    async def rotate_device(
+        self, device_id: str, jti: str, successor: dict, access_token: str
+    ) -> bool:
+        """
+        The rotation of the refresh token of a logged in device in one query, with
+        the new access token stored on the device, on Postgres.
+
+        Returns False when that didn't happen: the device, the token or the user
+        doesn't qualify, the token was used before (maybe within the grace), or the
+        database isn't Postgres. The caller then goes the long way with `rotate`,
+        which also tells what was wrong.
+        """
+        connection = connections.get(self.connection_name)
+        if connection.capabilities.dialect != "postgres":
+            return False
+        rows = await connection.execute_query_dict(
+            ROTATE_DEVICE_QUERY,
+            [
+                device_id,
+                timezone.now(),
+                jti,
+                successor["jti"],
+                self._expires_at(),
+                access_token,
+            ],
+        )
+        return bool(rows)
+
+    async def revoke_family(self, family_id: str) -> int:
+        return await RefreshSessions.filter(family_id=family_id).update(revoked=True)
+
+    async def end(self, refresh_token: Optional[str]) -> None:
+        """
+        Revokes the family of a refresh token, for logout.
+        """
+        payload = decode_token(refresh_token)
+        if payload is None:
+            return
+        family_ids = await RefreshSessions.filter(jti=payload["jti"]).values_list(
+            "family_id", flat=True
+        )
+        if family_ids:
+            await self.revoke_family(family_ids[0])
+
+
+refresh_sessions = RefreshSessionStore()
@@ -0,0 +1,55 @@
+import hashlib
+import json
+from typing import List, Tuple
+
+from tortoise import Tortoise
+
+from app.config import get_settings
+from app.services.cache import ReadThroughCache
+from app.services.invalidation import invalidation_bus
+
+# Alle gebruikers met de rol werknemer, met een vlag of ze (ook) part-time zijn
+RESOURCES_QUERY = """
+SELECT u.id, u.first_name, u.last_name,
+       MAX(CASE WHEN r.name = 'part-time' THEN 1 ELSE 0 END) AS part_time
+FROM users u
+JOIN user_roles ur ON ur.users_id = u.id
+JOIN roles r ON r.id = ur.roles_id
+GROUP BY u.id, u.first_name, u.last_name
+HAVING MAX(CASE WHEN r.name = 'werknemer' THEN 1 ELSE 0 END) = 1
+ORDER BY u.id
+"""
+
+
+async def load_resources(key=None) -> Tuple[List[dict], str]:
+    """
+    The resource list of the vakanties planner with its ETag, computed with a single
+    join on user_roles.
+    """
+    rows = await Tortoise.get_connection("default").execute_query_dict(
+        RESOURCES_QUERY
+    )
+    resources = [
+        {
+            "id": row["id"],
+            "title": f"{row['first_name'] or ''} {row['last_name'] or ''}".strip(),
+            "groupId": 2 if row["part_time"] else 1,
+        }
+        for row in rows
+    ]
+    digest = hashlib.md5(
+        json.dumps(resources, sort_keys=True).encode(), usedforsecurity=False
+    ).hexdigest()
+    return resources, f'W/"{digest}"'
+
+
+# Kept until users, roles or the roles of a user change, on any worker; the TTL only
+# limits how long a change outside the app goes unnoticed
+resource_cache: ReadThroughCache[Tuple[List[dict], str]] = ReadThroughCache(
+    "resources",
+    load_resources,
+    ttl=get_settings().reference_cache_ttl,
+    max_size=1,
+)
+for entity in ("users", "roles", "user_roles"):
+    invalidation_bus.on(entity, lambda key: resource_cache.invalidate())
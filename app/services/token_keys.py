@@ -0,0 +1,154 @@
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwk, jwt
+from jose.backends.base import Key
+
+from app.config import Settings, get_settings
+
+log = logging.getLogger("uvicorn")
+
+EC_ALGORITHMS = {"secp256r1": "ES256", "secp384r1": "ES384", "secp521r1": "ES512"}
+
+
+def key_algorithm(key) -> str:
+    """
+    Signing algorithm for a cryptography key: RS256 for RSA, ES256/384/512 for EC.
+    """
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "RS256"
+    if isinstance(key, (ec.EllipticCurvePrivateKey, ec.EllipticCurvePublicKey)):
+        algorithm = EC_ALGORITHMS.get(key.curve.name)
+        if algorithm is not None:
+            return algorithm
+    raise ValueError(f"Niet ondersteund sleuteltype: {type(key).__name__}")
+
+
+def load_pem_key(data: bytes):
+    try:
+        return serialization.load_pem_private_key(data, password=None)
+    except ValueError:
+        return serialization.load_pem_public_key(data)
+
+
+class KeyRing:
+    """
+    Signs and verifies the JWTs of this app.
+
+    Without asymmetric keys tokens are signed with SECRET_KEY (TOKEN_ALGORITHM).
+    With keys, the key of `signing_kid` signs and its id is put in the `kid` header;
+    the other keys only verify. Rotating is adding a new key, signing with it and
+    removing the old key once the tokens it signed expired, so nobody is logged out.
+
+    All keys are parsed once, decoding a token only looks up its kid.
+    """
+
+    def __init__(
+        self,
+        secret: Optional[str] = None,
+        secret_algorithm: str = "HS256",
+        keys: Optional[Dict[str, bytes]] = None,
+        signing_kid: Optional[str] = None,
+        accept_secret: bool = True,
+    ):
+        keys = keys or {}
+        if signing_kid is not None and signing_kid not in keys:
+            raise ValueError(f"Geen sleutel met id {signing_kid}")
+        if signing_kid is None and secret is None:
+            raise ValueError("Geen sleutel om tokens mee te ondertekenen")
+
+        self.signing_kid = signing_kid
+        self._algorithms: Dict[str, str] = {}
+        self._verifiers: Dict[str, Key] = {}
+        self._jwks = []
+        self._signer: Optional[Key] = None
+        for kid, pem in keys.items():
+            parsed = load_pem_key(pem)
+            algorithm = key_algorithm(parsed)
+            key = jwk.construct(pem, algorithm)
+            self._algorithms[kid] = algorithm
+            self._verifiers[kid] = key.public_key()
+            self._jwks.append({**key.public_key().to_dict(), "kid": kid, "use": "sig"})
+            if kid == signing_kid:
+                if not hasattr(parsed, "private_bytes"):
+                    raise ValueError(f"Sleutel {kid} is geen private key")
+                self._signer = key
+
+        # Tokens without kid are signed with the shared secret
+        self.secret_algorithm = secret_algorithm
+        self._secret: Optional[Key] = None
+        if secret is not None and (signing_kid is None or accept_secret):
+            self._secret = jwk.construct(secret, secret_algorithm)
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "KeyRing":
+        secret = settings.secret_key.get_secret_value()
+        if settings.token_keys_dir is None:
+            return cls(secret=secret, secret_algorithm=settings.token_algorithm)
+
+        keys = {
+            path.stem: path.read_bytes()
+            for path in sorted(Path(settings.token_keys_dir).glob("*.pem"))
+        }
+        signing_kid = settings.token_key_id
+        if signing_kid is None:
+            # The last private key by name, name the files after their date
+            private = [kid for kid, pem in keys.items() if b"PRIVATE KEY" in pem]
+            signing_kid = private[-1] if private else None
+        log.info(f"Tokens worden ondertekend met sleutel {signing_kid}")
+        return cls(
+            secret=secret,
+            secret_algorithm=settings.token_algorithm,
+            keys=keys,
+            signing_kid=signing_kid,
+            accept_secret=settings.token_accept_secret,
+        )
+
+    def encode(self, claims: dict) -> str:
+        if self._signer is not None:
+            return jwt.encode(
+                claims,
+                self._signer,
+                algorithm=self._algorithms[self.signing_kid],
+                headers={"kid": self.signing_kid},
+            )
+        return jwt.encode(claims, self._secret, algorithm=self.secret_algorithm)
+
+    def decode(self, token: str, verify_exp: bool = True) -> dict:
+        """
+        Verifies a token and returns its claims, raises jwt.JWTError when invalid.
+        """
+        if not token:
+            raise jwt.JWTError("Geen token")
+        # Only look at the header when there is a kid to look up
+        kid = jwt.get_unverified_header(token).get("kid") if self._verifiers else None
+        if kid is None:
+            if self._secret is None:
+                raise jwt.JWTError("Token zonder kid")
+            key, algorithm = self._secret, self.secret_algorithm
+        else:
+            key = self._verifiers.get(kid)
+            if key is None:
+                raise jwt.JWTError(f"Onbekende sleutel: {kid}")
+            algorithm = self._algorithms[kid]
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            options={"verify_exp": verify_exp},
+        )
+
+    def jwks(self) -> dict:
+        """
+        The public keys as a JSON Web Key Set, the shared secret is never included.
+        """
+        return {"keys": self._jwks}
+
+
+@lru_cache()
+def get_key_ring() -> KeyRing:
+    return KeyRing.from_settings(get_settings())
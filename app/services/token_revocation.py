@@ -0,0 +1,140 @@
+import asyncio
+import datetime
+import logging
+import time
+from typing import Dict, Optional
+
+from jose import jwt
+from tortoise import timezone
+
+from app.config import get_settings
+from app.models.tortoise import RefreshSessions, RevokedTokens
+from app.services.token_keys import get_key_ring
+
+log = logging.getLogger("uvicorn")
+
+
+def decode_token(token: Optional[str]) -> Optional[dict]:
+    """
+    Claims of a token issued by this app, also when it expired. None for other tokens.
+    """
+    if not token:
+        return None
+    try:
+        payload = get_key_ring().decode(token, verify_exp=False)
+    except jwt.JWTError:
+        return None
+    if "jti" not in payload or "exp" not in payload:
+        return None
+    return payload
+
+
+class RevocationList:
+    """
+    Denylist of token ids (jti) that may no longer be used.
+
+    The revoked ids of all workers are stored in the revoked_tokens table and kept in
+    memory as a dict of jti -> expiry timestamp, so checking a token on a request is
+    a single dict lookup without database access. A background task loads the
+    revocations of other workers every TOKEN_REVOCATION_SYNC_INTERVAL seconds and
+    removes tokens that expired, in memory and in the table.
+    """
+
+    def __init__(self):
+        self._revoked: Dict[str, float] = {}
+        # Start of the previous sync, None until the first one loads everything
+        self._synced_at: Optional[datetime.datetime] = None
+        self._last_prune = 0.0
+        self._worker: Optional[asyncio.Task] = None
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        return jti in self._revoked
+
+    async def revoke(self, jti: str, expires_at: datetime.datetime) -> None:
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
+        self._revoked[jti] = expires_at.timestamp()
+        await RevokedTokens.get_or_create(jti=jti, defaults={"expires_at": expires_at})
+
+    async def revoke_token(self, token: Optional[str]) -> bool:
+        """
+        Revokes a token issued by this app, returns False when it is not one.
+        """
+        # An expired token needs no revocation, but it doesn't hurt either
+        payload = decode_token(token)
+        if payload is None:
+            return False
+        expires_at = datetime.datetime.fromtimestamp(
+            payload["exp"], tz=datetime.timezone.utc
+        )
+        await self.revoke(payload["jti"], expires_at)
+        return True
+
+    async def sync(self) -> None:
+        """
+        Loads the revocations that were added since the last sync.
+
+        Ids and created_at don't follow the order in which rows are committed, so a
+        sync looks back TOKEN_REVOCATION_SYNC_OVERLAP seconds before the start of
+        the previous one; revocations that are known already are loaded again.
+        """
+        started_at = timezone.now()
+        query = RevokedTokens.all()
+        if self._synced_at is not None:
+            overlap = datetime.timedelta(
+                seconds=get_settings().token_revocation_sync_overlap
+            )
+            query = query.filter(created_at__gte=self._synced_at - overlap)
+        rows = await query.values_list("jti", "expires_at")
+        for jti, expires_at in rows:
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
+            self._revoked[jti] = expires_at.timestamp()
+        self._synced_at = started_at
+
+    async def prune(self) -> int:
+        """
+        Forgets tokens and refresh sessions that expired, returns the number of
+        deleted revocations.
+        """
+        now = time.time()
+        self._revoked = {
+            jti: expires for jti, expires in self._revoked.items() if expires > now
+        }
+        await RefreshSessions.filter(expires_at__lte=timezone.now()).delete()
+        return await RevokedTokens.filter(expires_at__lte=timezone.now()).delete()
+
+    async def start(self) -> None:
+        await self.prune()
+        await self.sync()
+        self._last_prune = time.monotonic()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _run(self) -> None:
+        settings = get_settings()
+        while True:
+            await asyncio.sleep(settings.token_revocation_sync_interval)
+            try:
+                await self.sync()
+                if (
+                    time.monotonic() - self._last_prune
+                    >= settings.token_revocation_prune_interval
+                ):
+                    await self.prune()
+                    self._last_prune = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.exception(f"Fout bij het bijwerken van ingetrokken tokens: {e}")
+
+
+revocation_list = RevocationList()
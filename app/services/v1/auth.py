@@ -5,27 +5,33 @@ from typing import List
 from app.config import Settings
 from app.models.pydantic import User_Pydantic
 from app.models.tortoise import Users
+from app.services.passwords import password_hasher
+from app.services.token_keys import get_key_ring
+from app.services.token_revocation import revocation_list
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
-from passlib.context import CryptContext
 from pydantic import UUID4
 from starlette import status
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
+# For routes that also work without a (valid) token, like logout
+optional_oauth2_scheme = OAuth2PasswordBearer(
+    tokenUrl="/api/v1/auth/login", auto_error=False
+)
 settings = Settings()
 
 
 class Auth:
-    password_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    password_context = password_hasher.context
 
     @classmethod
     def get_password_hash(cls, password: str) -> str:
-        return cls.password_context.hash(password)
+        return password_hasher.hash(password)
 
     @classmethod
     def verify_password(cls, plain_password: str, hashed_password: str) -> bool:
-        return cls.password_context.verify(plain_password, hashed_password)
+        return password_hasher.verify(plain_password, hashed_password)
 
     @staticmethod
     def get_token(data: dict, expires_delta: int) -> str:
@@ -36,11 +42,7 @@ class Auth:
                 "iss": settings.app_name,
             }
         )
-        return jwt.encode(
-            to_encode,
-            settings.secret_key.get_secret_value(),
-            algorithm=settings.token_algorithm,
-        )
+        return get_key_ring().encode(to_encode)
 
     @staticmethod
     def get_confirmation_token(email: str):
@@ -90,12 +92,12 @@ class Auth:
     @staticmethod
     async def authenticate_user(email: str, password: str) -> User_Pydantic:
         user = await Users.get_or_none(email=email.lower())
-        if not user:
-            return False
-        if not Auth.verify_password(
-            plain_password=password, hashed_password=user.hashed_password
+        # An unknown email costs a password check as well
+        if not await password_hasher.check(
+            password, user.hashed_password if user else None
         ):
             return False
+        password_hasher.rehash_later(user.id, password, user.hashed_password)
         return user
 
 
@@ -108,16 +110,14 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token,
-            str(settings.secret_key.get_secret_value()),
-            algorithms=[settings.token_algorithm],
-        )
+        payload = get_key_ring().decode(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
     except jwt.JWTError:
         raise credentials_exception
+    if revocation_list.is_revoked(payload.get("jti")):
+        raise credentials_exception
     user = await Users.get_or_none(email=email)
     if user is None:
         raise credentials_exception
@@ -1,40 +1,40 @@
-from smtplib import SMTP
+from typing import List
 
 from app.config import get_fastapi_mail_config
 from app.models.pydantic import EmailSchema
-from fastapi import Depends
-from fastapi_mail import ConnectionConfig, FastMail, MessageSchema, MessageType
+from app.services.mail_outbox import outbox
+from fastapi_mail import ConnectionConfig, FastMail
 
 fm: ConnectionConfig = FastMail(get_fastapi_mail_config())
 
 
 class Mailer:
+    # The mails are queued in the outbox, the outbox worker sends them
     async def send_invitation_message(email: EmailSchema):
-        message = MessageSchema(
+        await outbox.enqueue(
             subject="Uitnoding voor Gebr. Vroege app",
-            # List of recipients, as many as you can pass
-            recipients=email.model_dump().get("recipient_addresses"),
-            template_body=email.model_dump().get("body"),
-            subtype=MessageType.html
+            template_name="invite_email.html",
+            email=email,
+        )
+
+    async def send_invitation_messages(emails: List[EmailSchema]) -> List[bool]:
+        # Sent right away over one SMTP session, failures end up in the outbox
+        return await outbox.send_batch(
+            subject="Uitnoding voor Gebr. Vroege app",
+            template_name="invite_email.html",
+            emails=emails,
         )
-        await fm.send_message(message, template_name="invite_email.html")
 
     async def send_welcome_message(email: EmailSchema):
-        message = MessageSchema(
+        await outbox.enqueue(
             subject="Welkom!!",
-            # List of recipients, as many as you can pass
-            recipients=email.model_dump().get("recipient_addresses"),
-            template_body=email.model_dump().get("body"),
-            subtype=MessageType.html
+            template_name="account_activation_email.html",
+            email=email,
         )
-        await fm.send_message(message, template_name="account_activation_email.html")
 
     async def send_reset_password_message(email: EmailSchema):
-        message = MessageSchema(
+        await outbox.enqueue(
             subject="Password reset",
-            # List of recipients, as many as you can pass
-            recipients=email.model_dump().get("recipient_addresses"),
-            template_body=email.model_dump().get("body"),
-            subtype=MessageType.html
+            template_name="reset_password_email.html",
+            email=email,
         )
-        await fm.send_message(message, template_name="reset_password_email.html")
@@ -0,0 +1,157 @@
+import bisect
+import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+from app.helpers.date_functions import public_holidays
+from app.models.tortoise import Vakanties, WorkingHours
+
+Interval = Tuple[datetime.date, datetime.date]
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+class VacationIndex:
+    """
+    The vacations of users as sorted intervals per user, to look up whether a day
+    is a vacation day in O(log n).
+
+    Overlapping and adjacent vacations of a user are merged into one interval, so
+    the starts and the ends are both sorted and the only interval that can contain
+    a day is the last one that starts on or before it.
+    """
+
+    def __init__(
+        self, vacations: Iterable[Tuple[int, datetime.date, datetime.date]]
+    ):
+        per_user: Dict[int, List[Interval]] = {}
+        for user_id, start, end in vacations:
+            if start is not None and end is not None and start <= end:
+                per_user.setdefault(user_id, []).append((start, end))
+        self._starts: Dict[int, List[datetime.date]] = {}
+        self._ends: Dict[int, List[datetime.date]] = {}
+        for user_id, intervals in per_user.items():
+            merged: List[Interval] = []
+            for start, end in sorted(intervals):
+                if merged and start <= merged[-1][1] + ONE_DAY:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+                else:
+                    merged.append((start, end))
+            self._starts[user_id] = [start for start, _ in merged]
+            self._ends[user_id] = [end for _, end in merged]
+
+    @classmethod
+    async def load(
+        cls,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        user_ids: Optional[Iterable[int]] = None,
+        db: Optional[BaseDBAsyncClient] = None,
+    ) -> "VacationIndex":
+        """
+        The vacations that overlap the weeks of the range, of the given users or of
+        everyone, in one query.
+        """
+        from_date -= datetime.timedelta(days=from_date.weekday())
+        to_date += datetime.timedelta(days=6 - to_date.weekday())
+        query = Vakanties.filter(start_date__lte=to_date, end_date__gte=from_date)
+        if user_ids is not None:
+            query = query.filter(user_id__in=list(user_ids))
+        return cls(
+            await query.using_db(db).values_list("user_id", "start_date", "end_date")
+        )
+
+    @property
+    def user_ids(self) -> List[int]:
+        return list(self._starts)
+
+    def vacation(self, user_id: int, day: datetime.date) -> Optional[Interval]:
+        """
+        The (merged) vacation of the user that contains the day, if any.
+        """
+        starts = self._starts.get(user_id)
+        if not starts:
+            return None
+        i = bisect.bisect_right(starts, day) - 1
+        if i >= 0 and self._ends[user_id][i] >= day:
+            return starts[i], self._ends[user_id][i]
+        return None
+
+    def is_vacation_day(self, user_id: int, day: datetime.date) -> bool:
+        return self.vacation(user_id, day) is not None
+
+    def vacation_days(
+        self, user_id: int, from_date: datetime.date, to_date: datetime.date
+    ) -> List[datetime.date]:
+        """
+        The vacation days of the user between two dates (inclusive), in order.
+        """
+        starts = self._starts.get(user_id)
+        if not starts:
+            return []
+        ends = self._ends[user_id]
+        days = []
+        # The first vacation that doesn't end before the range
+        i = bisect.bisect_left(ends, from_date)
+        while i < len(starts) and starts[i] <= to_date:
+            day, end = max(starts[i], from_date), min(ends[i], to_date)
+            while day <= end:
+                days.append(day)
+                day += ONE_DAY
+            i += 1
+        return days
+
+    def week_off(self, user_id: int, week_start: datetime.date) -> bool:
+        """
+        Whether the user is on vacation on every working day (Monday to Friday, no
+        public holiday) of the week, so no hours are expected for it.
+        """
+        if user_id not in self._starts:
+            return False
+        workdays = [week_start + datetime.timedelta(days=i) for i in range(5)]
+        return all(
+            self.is_vacation_day(user_id, day)
+            for day in workdays
+            if day not in public_holidays(day.year)
+        )
+
+
+async def vacation_conflicts(
+    db: BaseDBAsyncClient, from_date: datetime.date, to_date: datetime.date
+) -> List[dict]:
+    """
+    Working hours with hours or milkings on a vacation day of the same user, of all
+    users between two dates, by name and date. The vacation is the merged one when
+    vacations overlap or follow each other.
+    """
+    vacations = await VacationIndex.load(from_date, to_date, db=db)
+    if not vacations.user_ids:
+        return []
+    rows = (
+        await WorkingHours.filter(
+            date__gte=from_date,
+            date__lte=to_date,
+            user_id__in=vacations.user_ids,
+        )
+        .using_db(db)
+        .order_by("user__last_name", "user__first_name", "user_id", "date", "id")
+        .values(
+            "id",
+            "user_id",
+            "date",
+            "hours",
+            "milkings",
+            "submitted",
+            first_name="user__first_name",
+            last_name="user__last_name",
+            email="user__email",
+        )
+    )
+    conflicts = []
+    for row in rows:
+        vacation = vacations.vacation(row["user_id"], row["date"])
+        if vacation is not None and (row["hours"] or row["milkings"]):
+            row["vacation_start"], row["vacation_end"] = vacation
+            conflicts.append(row)
+    return conflicts
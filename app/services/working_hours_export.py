@@ -0,0 +1,237 @@
+import csv
+import datetime
+import io
+import tempfile
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+import anyio
+from openpyxl import Workbook
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+# All working hours in a date range with the name of the employee, per employee by
+# date. Placeholders are filled in per database.
+EXPORT_QUERY = """
+SELECT u.id AS user_id, u.first_name, u.last_name, u.email,
+       w.date, w.hours, w.milkings, w.description, w.submitted
+FROM working_hours w
+JOIN users u ON u.id = w.user_id
+WHERE w.date >= {from_date} AND w.date <= {to_date}
+ORDER BY u.last_name, u.first_name, u.id, w.date, w.id
+"""
+
+HEADER = [
+    "Regel",
+    "Medewerker",
+    "Email",
+    "Datum",
+    "Jaar",
+    "Week",
+    "Uren",
+    "Melkingen",
+    "Omschrijving",
+    "Ingediend",
+]
+WEEK_HEADER = ["Medewerker", "Email", "Jaar", "Week", "Dagen", "Uren", "Melkingen"]
+
+CSV_MEDIA_TYPE = "text/csv"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+async def export_chunks(
+    db: BaseDBAsyncClient,
+    from_date: datetime.date,
+    to_date: datetime.date,
+    chunk_size: int = 1000,
+) -> AsyncIterator[List[dict]]:
+    """
+    The rows of EXPORT_QUERY in chunks, without loading the whole range.
+
+    On Postgres a server-side cursor fetches `chunk_size` rows at a time, in a read
+    only transaction on a connection of its own. Other databases (SQLite in the
+    tests) page with LIMIT/OFFSET.
+    """
+    if db.capabilities.dialect == "postgres":
+        query = EXPORT_QUERY.format(from_date="$1", to_date="$2")
+        async with db.acquire_connection() as connection:
+            async with connection.transaction(readonly=True):
+                chunk = []
+                cursor = connection.cursor(
+                    query, from_date, to_date, prefetch=chunk_size
+                )
+                async for record in cursor:
+                    chunk.append(dict(record))
+                    if len(chunk) == chunk_size:
+                        yield chunk
+                        chunk = []
+                if chunk:
+                    yield chunk
+        return
+
+    query = EXPORT_QUERY.format(from_date="?", to_date="?") + " LIMIT ? OFFSET ?"
+    offset = 0
+    while True:
+        chunk = await db.execute_query_dict(
+            query, [from_date, to_date, chunk_size, offset]
+        )
+        if chunk:
+            yield chunk
+        if len(chunk) < chunk_size:
+            return
+        offset += chunk_size
+
+
+def _name(row: dict) -> str:
+    return _text(f"{row['first_name'] or ''} {row['last_name'] or ''}".strip())
+
+
+def _text(value: Optional[str]) -> str:
+    # Text that starts like a formula would be run by Excel (and written as a
+    # formula by openpyxl)
+    if value and value[0] in "=+-@":
+        return "'" + value
+    return value or ""
+
+
+def _date(value) -> datetime.date:
+    # SQLite returns dates as text
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+class WeeklyTotals:
+    """
+    Adds up the rows of an employee per ISO week while they pass by in order, so
+    the totals of a week are known as soon as the next week or employee starts.
+    """
+
+    def __init__(self):
+        self._key: Optional[Tuple[int, int, int]] = None
+        self._row: Optional[dict] = None
+        self._days = 0
+        self._hours = 0.0
+        self._milkings = 0
+
+    def add(self, row: dict, date: datetime.date) -> Optional[list]:
+        """
+        Counts a row, returns the totals of the previous week when this row starts
+        another week.
+        """
+        year, week, _ = date.isocalendar()
+        key = (row["user_id"], year, week)
+        finished = None
+        if key != self._key:
+            finished = self.finish()
+            self._key, self._row = key, row
+        self._days += 1
+        self._hours += row["hours"] or 0
+        self._milkings += row["milkings"] or 0
+        return finished
+
+    def finish(self) -> Optional[list]:
+        if self._key is None:
+            return None
+        _, year, week = self._key
+        totals = [
+            _name(self._row),
+            self._row["email"],
+            year,
+            week,
+            self._days,
+            round(self._hours, 2),
+            self._milkings,
+        ]
+        self._key, self._row = None, None
+        self._days, self._hours, self._milkings = 0, 0.0, 0
+        return totals
+
+
+def day_row(row: dict, date: datetime.date) -> list:
+    year, week, _ = date.isocalendar()
+    return [
+        "dag",
+        _name(row),
+        row["email"],
+        date.isoformat(),
+        year,
+        week,
+        row["hours"],
+        row["milkings"],
+        _text(row["description"]),
+        "ja" if row["submitted"] else "nee",
+    ]
+
+
+def week_row(totals: list) -> list:
+    name, email, year, week, _, hours, milkings = totals
+    return ["weektotaal", name, email, "", year, week, hours, milkings, "", ""]
+
+
+async def csv_export(chunks: AsyncIterator[List[dict]]) -> AsyncIterator[bytes]:
+    """
+    The export as CSV, one encoded piece per chunk of rows. Every week of an
+    employee is followed by a "weektotaal" line.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    totals = WeeklyTotals()
+    async for chunk in chunks:
+        for row in chunk:
+            date = _date(row["date"])
+            finished = totals.add(row, date)
+            if finished is not None:
+                writer.writerow(week_row(finished))
+            writer.writerow(day_row(row, date))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    finished = totals.finish()
+    if finished is not None:
+        writer.writerow(week_row(finished))
+    yield buffer.getvalue().encode()
+
+
+async def xlsx_export(
+    chunks: AsyncIterator[List[dict]], read_size: int = 64 * 1024
+) -> AsyncIterator[bytes]:
+    """
+    The export as a workbook with a sheet of days and a sheet of weekly totals.
+
+    openpyxl writes the sheets in write_only mode, which keeps the rows in temporary
+    files instead of memory. A workbook is a zip that can only be sent once it is
+    complete, so it is saved to a temporary file and sent from there. Appending
+    rows and saving run in a worker thread, the event loop stays free.
+    """
+    workbook = Workbook(write_only=True)
+    days = workbook.create_sheet("Uren")
+    weeks = workbook.create_sheet("Weektotalen")
+    days.append(HEADER[1:])
+    weeks.append(WEEK_HEADER)
+    totals = WeeklyTotals()
+
+    def append(chunk: Iterable[dict]) -> None:
+        for row in chunk:
+            date = _date(row["date"])
+            finished = totals.add(row, date)
+            if finished is not None:
+                weeks.append(finished)
+            days.append(day_row(row, date)[1:])
+
+    def save(file) -> None:
+        finished = totals.finish()
+        if finished is not None:
+            weeks.append(finished)
+        workbook.save(file)
+        file.seek(0)
+
+    async for chunk in chunks:
+        await anyio.to_thread.run_sync(append, chunk)
+    with tempfile.TemporaryFile() as file:
+        await anyio.to_thread.run_sync(save, file)
+        while True:
+            data = await anyio.to_thread.run_sync(file.read, read_size)
+            if not data:
+                return
+            yield data
+
@@ -0,0 +1,79 @@
+"""
+bcrypt cost per number of rounds, and login time for known and unknown accounts.
+
+Picks the highest BCRYPT_ROUNDS whose password check stays within a target time
+per login (default 250 ms, pass another one in ms as argument). Then times
+`Auth.authenticate_user` with a wrong password for an existing and for an unknown
+email at the configured rounds; both should take the same time.
+
+    python -m benchmarks.bench_bcrypt_rounds [target_ms]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from tortoise import Tortoise
+
+from app.config import get_settings
+from app.models.tortoise import Users
+from app.services.passwords import PasswordHasher
+from app.services.v2.auth import Auth
+
+ROUNDS = range(10, 15)
+SAMPLES = 5
+
+
+def verify_ms(rounds: int) -> float:
+    hasher = PasswordHasher(rounds)
+    hashed_password = hasher.hash("geheim")
+    samples = []
+    for _ in range(SAMPLES):
+        start = time.perf_counter()
+        hasher.verify("geheim", hashed_password)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def login_ms(email: str) -> float:
+    samples = []
+    for _ in range(SAMPLES):
+        start = time.perf_counter()
+        assert await Auth.authenticate_user(email=email, password="fout") is False
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+async def main():
+    target_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 250.0
+    best = None
+    for rounds in ROUNDS:
+        duration = verify_ms(rounds)
+        print(f"rounds {rounds}: {duration:7.1f} ms")
+        if duration <= target_ms:
+            best = rounds
+    print(f"BCRYPT_ROUNDS={best} past binnen {target_ms:.0f} ms")
+
+    await Tortoise.init(
+        db_url="sqlite://:memory:", modules={"models": ["app.models.tortoise"]}
+    )
+    await Tortoise.generate_schemas()
+    try:
+        await Users.create(
+            email="bekend@test.com",
+            hashed_password=Auth.get_password_hash("geheim"),
+            is_active=True,
+        )
+        rounds = get_settings().bcrypt_rounds
+        known = await login_ms("bekend@test.com")
+        unknown = await login_ms("onbekend@test.com")
+        print(
+            f"login met fout wachtwoord, {rounds} rounds: bestaand account "
+            f"{known:.1f} ms, onbekend account {unknown:.1f} ms"
+        )
+    finally:
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Bytes saved and CPU cost of response compression per endpoint.
+
+Builds payloads shaped like the biggest list endpoints, serializes them the way the
+v1/v2 apps do (AppJSONResponse) and compresses them with the settings of
+CompressionMiddleware.
+
+    python -m benchmarks.bench_compression
+"""
+import datetime
+import time
+
+from app.helpers.responses import AppJSONResponse
+from app.middleware.compression import compress
+from benchmarks.bench_json_responses import make_rows
+
+RUNS = 5
+
+
+def maintenance_issues(count: int = 2_000) -> list:
+    created = datetime.datetime(2023, 3, 1, 8, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "id": i + 1,
+            "created_at": created + datetime.timedelta(hours=5 * i),
+            "created_by": "monteur@monteur.com",
+            "last_modified_at": created + datetime.timedelta(hours=5 * i + 2),
+            "last_modified_by": "admin@admin.com",
+            "issue_description": f"Hydrauliekslang lekt bij de voorlader ({i})",
+            "status": ["open", "in behandeling", "opgelost"][i % 3],
+            "priority": ["laag", "middel", "hoog"][i % 3],
+            "machine": {
+                "id": i % 60 + 1,
+                "work_number": f"M{i % 60:03}",
+                "work_name": f"Trekker {i % 60}",
+                "brand_name": "Fendt",
+                "type_name": "724 Vario",
+                "year_of_manufacture": 2018,
+            },
+            "user": {
+                "id": 3,
+                "email": "monteur@monteur.com",
+                "first_name": "Henk",
+                "last_name": "Jansen",
+                "roles": [{"id": 3, "name": "monteur", "description": "Monteur"}],
+            },
+        }
+        for i in range(count)
+    ]
+
+
+def week_overviews(weeks: int = 26) -> list:
+    start = datetime.date(2024, 1, 1)
+    result = []
+    for week in range(weeks):
+        monday = start + datetime.timedelta(weeks=week)
+        working_hours = [
+            {
+                "id": week * 7 + day + 1,
+                "date": monday + datetime.timedelta(days=day),
+                "hours": 8.5,
+                "milkings": 2,
+                "description": "Melken, voeren en kalveren verzorgen",
+                "submitted": True,
+            }
+            for day in range(6)
+        ]
+        result.append(
+            {
+                "year": 2024,
+                "week": week + 1,
+                "week_start": monday.isoformat(),
+                "week_end": (monday + datetime.timedelta(days=6)).isoformat(),
+                "sum_hours": 51.0,
+                "sum_milkings": 12,
+                "submitted": True,
+                "working_hours": working_hours,
+            }
+        )
+    return result
+
+
+def best_time(function, *args) -> float:
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    endpoints = {
+        "/v1/tank_transactions/ (10k)": make_rows(),
+        "/v1/machine_maintenance_issues/ (2k)": maintenance_issues(),
+        "/v2/admin/working_hours/week_overview/ (26 wk)": week_overviews(),
+    }
+    print(f"{'endpoint':48} {'raw':>9} {'gzip':>9} {'ms':>6} {'br':>9} {'ms':>6}")
+    for name, content in endpoints.items():
+        body = AppJSONResponse(content).body
+        line = f"{name:48} {len(body):9,}"
+        for encoding in ("gzip", "br"):
+            size = len(compress(body, encoding))
+            seconds = best_time(compress, body, encoding)
+            line += f" {size:9,} {seconds * 1000:6.1f}"
+        print(line)
+        print(
+            f"{'':48} saved gzip {1 - len(compress(body, 'gzip')) / len(body):.0%}, "
+            f"br {1 - len(compress(body, 'br')) / len(body):.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
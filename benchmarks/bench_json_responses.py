@@ -0,0 +1,130 @@
+"""
+Serialization time of the tank transaction list for 10k rows.
+
+Compares three ways to answer GET /tank_transactions/ on an app without database:
+
+- model instances validated by the response_model, stdlib JSON encoder (before)
+- the same, with the orjson default response class of the v1/v2 apps
+- values() rows dumped directly by values_response/rows_response
+
+    python -m benchmarks.bench_json_responses
+"""
+import asyncio
+import datetime
+import json
+import time
+from typing import List
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.helpers.responses import AppJSONResponse, flat_fields, rows_response
+from app.models.pydantic import TankTransactionResponseSchema
+from app.models.tortoise import TankTransactions
+
+ROWS = 10_000
+RUNS = 5
+
+
+def make_rows() -> List[dict]:
+    start = datetime.datetime(2024, 1, 1, 6, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "id": i + 1,
+            "vehicle": f"Trekker {i % 40}",
+            "driver": "Jan de Vries",
+            "transaction_type": "Tanken",
+            "acquisition_mode": "Pas",
+            "transaction_status": "OK",
+            "start_date_time": start + datetime.timedelta(minutes=17 * i),
+            "transaction_number": 100_000 + i,
+            "product": "Diesel",
+            "quantity": 20 + (i % 50) * 1.5,
+            "transaction_duration": "00:02:15",
+            "meter": 1000 + i,
+            "meter_type": "uren",
+        }
+        for i in range(ROWS)
+    ]
+
+
+def build_app(rows: List[dict]) -> FastAPI:
+    fields = flat_fields(TankTransactionResponseSchema)
+    assert set(fields) == set(rows[0])
+    models = [TankTransactions(**row) for row in rows]
+
+    stdlib = FastAPI(default_response_class=JSONResponse)
+    fast = FastAPI(default_response_class=AppJSONResponse)
+    for app in (stdlib, fast):
+
+        @app.get("/", response_model=List[TankTransactionResponseSchema])
+        async def get_models():
+            return models
+
+    @fast.get("/values", response_model=List[TankTransactionResponseSchema])
+    async def get_values():
+        return rows_response(rows)
+
+    return stdlib, fast
+
+
+async def request(app: FastAPI, path: str) -> bytes:
+    body = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body.append(message.get("body", b""))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "server": ("bench", 80),
+        "client": ("127.0.0.1", 1234),
+    }
+    await app(scope, receive, send)
+    return b"".join(body)
+
+
+async def timed(app: FastAPI, path: str) -> float:
+    best = float("inf")
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        await request(app, path)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def main():
+    stdlib, fast = build_app(make_rows())
+    # The three paths produce the same JSON document
+    documents = [
+        json.loads(await request(stdlib, "/")),
+        json.loads(await request(fast, "/")),
+        json.loads(await request(fast, "/values")),
+    ]
+    assert documents[0] == documents[1] == documents[2]
+
+    results = {
+        "response_model + stdlib json": await timed(stdlib, "/"),
+        "response_model + orjson": await timed(fast, "/"),
+        "values() rows + orjson": await timed(fast, "/values"),
+    }
+    baseline = results["response_model + stdlib json"]
+    print(f"rows: {ROWS}, best of {RUNS} runs")
+    for name, seconds in results.items():
+        print(f"{name:30}: {seconds * 1000:8.1f} ms  ({baseline / seconds:4.1f}x)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+Password hashing work during a login attack, with and without the rate limiter.
+
+Runs the v2 login route with an in-memory SQLite database and sends wrong passwords
+for an existing account, 20 requests at a time:
+
+- brute force: all attempts from one IP
+- credential stuffing: every attempt from another IP
+
+and reports the number of bcrypt verifications and the CPU time used. Password
+hashes use 10 rounds instead of 12 to keep the run short.
+
+    python -m benchmarks.bench_login_rate_limit
+"""
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from tortoise import Tortoise
+
+from app.api.v2 import auth
+from app.config import get_settings
+from app.models.tortoise import Users
+from app.services import rate_limit
+from app.services.passwords import PasswordHasher
+from app.services.v2 import auth as auth_service
+
+ATTEMPTS = 200
+CONCURRENCY = 20
+EMAIL = "werknemer@werknemer.com"
+
+
+class CountingVerify:
+    def __init__(self, verify):
+        self.verify = verify
+        self.calls = 0
+
+    def __call__(self, password: str, hashed_password: str) -> bool:
+        self.calls += 1
+        return self.verify(password, hashed_password)
+
+
+async def attack(app: FastAPI, ips) -> dict:
+    rate_limit.login_backend = rate_limit.MemoryBackend()
+    clients = {
+        ip: httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app, client=(ip, 1234)),
+            base_url="http://bench",
+        )
+        for ip in set(ips)
+    }
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    statuses = {}
+
+    async def login(i: int, ip: str):
+        async with semaphore:
+            response = await clients[ip].post(
+                "/auth/login", data={"username": EMAIL, "password": f"raden{i}"}
+            )
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    password_hasher = auth_service.password_hasher
+    counter = CountingVerify(password_hasher.verify)
+    password_hasher.verify = counter
+    cpu, wall = time.process_time(), time.perf_counter()
+    try:
+        await asyncio.gather(*(login(i, ip) for i, ip in enumerate(ips)))
+    finally:
+        del password_hasher.verify
+        for client in clients.values():
+            await client.aclose()
+    return {
+        "bcrypt": counter.calls,
+        "cpu": time.process_time() - cpu,
+        "wall": time.perf_counter() - wall,
+        "statuses": statuses,
+    }
+
+
+async def main():
+    await Tortoise.init(
+        db_url="sqlite://:memory:", modules={"models": ["app.models.tortoise"]}
+    )
+    await Tortoise.generate_schemas()
+    auth_service.password_hasher = PasswordHasher(rounds=10)
+    hashed_password = auth_service.password_hasher.hash("x")
+    await Users.create(email=EMAIL, hashed_password=hashed_password, is_active=True)
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/auth")
+
+    settings = get_settings()
+    limits = settings.login_rate_limit_per_ip, settings.login_rate_limit_per_email
+    scenarios = {
+        "brute force": ["10.0.0.1"] * ATTEMPTS,
+        "credential stuffing": [f"10.0.{i // 250}.{i % 250}" for i in range(ATTEMPTS)],
+    }
+    try:
+        print(f"{ATTEMPTS} wrong passwords, {CONCURRENCY} concurrent")
+        for name, ips in scenarios.items():
+            for limited in (False, True):
+                if limited:
+                    per_ip, per_email = limits
+                else:
+                    per_ip = per_email = ATTEMPTS + 1
+                settings.login_rate_limit_per_ip = per_ip
+                settings.login_rate_limit_per_email = per_email
+                result = await attack(app, ips)
+                print(
+                    f"{name:20} {'limited' if limited else 'unlimited':9} "
+                    f"bcrypt {result['bcrypt']:4}  cpu {result['cpu']:6.2f}s  "
+                    f"wall {result['wall']:6.2f}s  {result['statuses']}"
+                )
+    finally:
+        settings.login_rate_limit_per_ip, settings.login_rate_limit_per_email = limits
+        await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
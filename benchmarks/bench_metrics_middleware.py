@@ -0,0 +1,79 @@
+"""
+Overhead of the Prometheus middleware per request.
+
+Calls a small FastAPI app directly through ASGI (no network, no HTTP client), once
+without and once with `PrometheusMiddleware`, and reports the difference.
+
+    python -m benchmarks.bench_metrics_middleware
+"""
+import asyncio
+import time
+
+from fastapi import FastAPI
+from starlette.middleware import Middleware
+
+from app.middleware.metrics import PrometheusMiddleware
+
+REQUESTS = 20_000
+
+
+def build_app(with_metrics: bool) -> FastAPI:
+    middleware = (
+        [Middleware(PrometheusMiddleware, app_name="bench")] if with_metrics else []
+    )
+    app = FastAPI(middleware=middleware)
+
+    @app.get("/machines/{machine_id}")
+    async def get_machine(machine_id: int):
+        return {"id": machine_id, "work_name": "Trekker"}
+
+    return app
+
+
+async def run(app: FastAPI) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": f"/machines/{i}",
+            "raw_path": f"/machines/{i}".encode(),
+            "root_path": "",
+            "query_string": b"",
+            "headers": [(b"host", b"bench")],
+            "server": ("bench", 80),
+            "client": ("127.0.0.1", 1234),
+        }
+        await app(scope, receive, send)
+    return (time.perf_counter() - start) / REQUESTS
+
+
+async def main():
+    plain, instrumented = build_app(False), build_app(True)
+    # warm up both apps (middleware stack, metric children)
+    await run(plain)
+    await run(instrumented)
+    # alternate the runs so drift in CPU speed hits both sides equally
+    baseline, with_metrics = float("inf"), float("inf")
+    for _ in range(5):
+        baseline = min(baseline, await run(plain))
+        with_metrics = min(with_metrics, await run(instrumented))
+    overhead = with_metrics - baseline
+    print(f"requests per run      : {REQUESTS}")
+    print(f"without middleware    : {baseline * 1e6:8.1f} us/request")
+    print(f"with middleware       : {with_metrics * 1e6:8.1f} us/request")
+    print(f"overhead              : {overhead * 1e6:8.1f} us/request "
+          f"({overhead / baseline * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
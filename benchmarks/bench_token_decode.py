@@ -0,0 +1,82 @@
+"""
+Token decode throughput per algorithm, with and without the parsed keys of KeyRing.
+
+"key per call" passes the secret or PEM data to `jwt.decode` on every call, as the
+auth services did before, so python-jose parses the key for every request.
+
+    python -m benchmarks.bench_token_decode
+"""
+import datetime
+import tempfile
+import time
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwt
+
+from app.config import Settings
+from app.services.token_keys import KeyRing
+
+DECODES = 2_000
+
+
+def private_pem(key) -> bytes:
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def public_pem(key) -> bytes:
+    return key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+
+
+def throughput(decode, token: str) -> float:
+    best = float("inf")
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(DECODES):
+            decode(token)
+        best = min(best, time.perf_counter() - start)
+    return DECODES / best
+
+
+def main():
+    claims = {
+        "sub": "werknemer@werknemer.com",
+        "scope": "login",
+        "jti": "a" * 32,
+        "exp": datetime.datetime.now(datetime.timezone.utc)
+        + datetime.timedelta(hours=1),
+    }
+    secret = "erruggeheim"
+    cases = [("HS256", KeyRing(secret=secret), secret)]
+    with tempfile.TemporaryDirectory() as keys_dir:
+        for algorithm, key in (
+            ("RS256", rsa.generate_private_key(public_exponent=65537, key_size=2048)),
+            ("ES256", ec.generate_private_key(ec.SECP256R1())),
+        ):
+            path = Path(keys_dir) / algorithm
+            path.mkdir()
+            (path / f"{algorithm.lower()}.pem").write_bytes(private_pem(key))
+            key_ring = KeyRing.from_settings(
+                Settings(token_keys_dir=path, token_accept_secret=False)
+            )
+            cases.append((algorithm, key_ring, public_pem(key).decode()))
+
+    print(f"{'':6} {'key per call':>14} {'KeyRing':>14}")
+    for algorithm, key_ring, key in cases:
+        token = key_ring.encode(claims)
+        per_call = throughput(
+            lambda token: jwt.decode(token, key, algorithms=[algorithm]), token
+        )
+        cached = throughput(key_ring.decode, token)
+        print(f"{algorithm:6} {per_call:12.0f}/s {cached:12.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+import os
+from pathlib import Path
+
+from tortoise import Tortoise, run_async
+
+# Indexes the models can't describe (expressions, operator classes)
+SQL_INDEXES = Path(__file__).resolve().parent.parent / "sql_indexes"
+
+
+async def create_indexes():
+    await Tortoise.init(
+        db_url=os.environ.get("DATABASE_URL"),
+        modules={"models": ["app.models.tortoise"]},
+    )
+    connection = Tortoise.get_connection("default")
+    if connection.capabilities.dialect == "postgres":
+        for sql_file in sorted(SQL_INDEXES.glob("*.sql")):
+            await connection.execute_script(sql_file.read_text())
+    await Tortoise.close_connections()
+
+
+if __name__ == "__main__":
+    run_async(create_indexes())
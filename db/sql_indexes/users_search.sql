@@ -0,0 +1,9 @@
+-- Case-insensitive prefix search on the admin user list (Postgres).
+-- The ORM filters with UPPER(column) LIKE 'PREFIX%', text_pattern_ops lets that
+-- LIKE use the index whatever the collation of the database is.
+CREATE INDEX IF NOT EXISTS users_upper_first_name_idx
+    ON users (upper(first_name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS users_upper_last_name_idx
+    ON users (upper(last_name) text_pattern_ops);
+CREATE INDEX IF NOT EXISTS users_upper_email_idx
+    ON users (upper(email) text_pattern_ops);
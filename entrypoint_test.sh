@@ -14,6 +14,9 @@ aerich init-db
 aerich migrate
 aerich upgrade
 
+# indexes that aerich can't create from the models
+python ./db/python_scripts/setup_indexes.py
+
 # insert testdata in the database
 python ./db/python_scripts/setup_roles.py
 
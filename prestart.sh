@@ -0,0 +1,6 @@
+#!/bin/bash
+
+# Run by the start script of the uvicorn-gunicorn image before the workers start
+
+# indexes that aerich can't create from the models
+python ./db/python_scripts/setup_indexes.py
@@ -110,3 +110,85 @@ async def test_add_allowed_users_insufficient_privilege(
     )
     assert response.status_code == 403
     assert response.json()["detail"] == "Operation not permitted"
+
+
+@pytest.mark.apitest
+async def test_add_allowed_users_bulk(
+    test_client: TestClient, admin_token: str, invite_new_user_fixture
+):
+    await invite_new_user_fixture("test_gebruiker_bulk_al@test.com")
+    fm.config.SUPPRESS_SEND = 1
+    with fm.record_messages() as outbox:
+        payload = json.dumps(
+            {
+                "emails": [
+                    "Test_Gebruiker_Bulk1@test.com",
+                    "test_gebruiker_bulk2@test.com",
+                    "test_gebruiker_bulk1@test.com",
+                    "test_gebruiker_bulk_al@test.com",
+                    "werknemer@werknemer.com",
+                ]
+            }
+        )
+        response = await test_client.post(
+            "/allowed_users/bulk",
+            headers={
+                "Authorization": f"Bearer {admin_token}",
+                "Content-Type": "application/json",
+            },
+            content=payload,
+        )
+        assert response.status_code == 200
+        assert response.json() == [
+            {"email": "test_gebruiker_bulk1@test.com", "status": "verstuurd"},
+            {"email": "test_gebruiker_bulk2@test.com", "status": "verstuurd"},
+            {"email": "test_gebruiker_bulk_al@test.com", "status": "al_uitgenodigd"},
+            {"email": "werknemer@werknemer.com", "status": "al_geregistreerd"},
+        ]
+        assert sorted(message["To"] for message in outbox) == [
+            "test_gebruiker_bulk1@test.com",
+            "test_gebruiker_bulk2@test.com",
+        ]
+        assert outbox[0]["Subject"] == "Uitnoding voor Gebr. Vroege app"
+
+
+@pytest.mark.apitest
+async def test_get_allowed_users_conditional(
+    test_client: TestClient, admin_token: str, invite_new_user_fixture
+):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await test_client.get("/allowed_users/", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+
+    response = await test_client.get(
+        "/allowed_users/", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = await test_client.get(
+        "/allowed_users/", headers={**headers, "If-Modified-Since": last_modified}
+    )
+    assert response.status_code == 304
+
+    # A new invitation changes the ETag
+    await invite_new_user_fixture("test_gebruiker_conditional@test.com")
+    response = await test_client.get(
+        "/allowed_users/", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.apitest
+async def test_get_allowed_users_conditional_requires_admin(
+    test_client: TestClient, werknemer_token: str
+):
+    response = await test_client.get(
+        "/allowed_users/",
+        headers={"Authorization": f"Bearer {werknemer_token}", "If-None-Match": "*"},
+    )
+    assert response.status_code != 304
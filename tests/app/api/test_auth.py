@@ -4,6 +4,7 @@ import uuid
 import pytest
 from fastapi.testclient import TestClient
 
+from app.config import get_settings
 from app.models.pydantic_models.auth import RegisterUserRequest
 from app.services.v2.mail import fm
 
@@ -251,3 +252,193 @@ async def test_login_user_inactive(test_client: TestClient, add_user: RegisterUs
     response = await test_client.post("/auth/login", headers=headers, data=data)
     assert response.status_code == 401
     assert response.json()["detail"] == 'Gebruiker inactief'
+
+
+# Logout
+async def test_logout_revokes_tokens(test_client: TestClient):
+    response = await test_client.post(
+        "/auth/login",
+        data={"username": "werknemer@werknemer.com", "password": "werknemer"},
+    )
+    access_token = response.json()["access_token"]
+    refresh_token = response.cookies["refresh_token"]
+    headers = {"Authorization": f"Bearer {access_token}"}
+    assert (await test_client.get("/vakanties/all", headers=headers)).status_code == 200
+
+    response = await test_client.post(
+        "/auth/logout", headers=headers, cookies={"refresh_token": refresh_token}
+    )
+    assert response.status_code == 200
+
+    # Both tokens are still within their lifetime, but can't be used anymore
+    response = await test_client.get("/vakanties/all", headers=headers)
+    assert response.status_code == 401
+    response = await test_client.get(
+        "/auth/efresh", cookies={"refresh_token": refresh_token}
+    )
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Refresh token is ingetrokken"
+
+
+# Refresh
+async def test_refresh_rotates_token_and_detects_reuse(
+    test_client: TestClient, monkeypatch
+):
+    monkeypatch.setattr(get_settings(), "refresh_token_reuse_grace", 0)
+    response = await test_client.post(
+        "/auth/login",
+        data={"username": "werknemer@werknemer.com", "password": "werknemer"},
+    )
+    first_token = response.cookies["refresh_token"]
+
+    response = await test_client.get(
+        "/auth/efresh", cookies={"refresh_token": first_token}
+    )
+    assert response.status_code == 200
+    second_token = response.json()["refresh_token"]
+    assert second_token != first_token
+
+    # The first token was exchanged already, someone else may hold a copy
+    response = await test_client.get(
+        "/auth/efresh", cookies={"refresh_token": first_token}
+    )
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Refresh token is al gebruikt, log opnieuw in"
+    # So the token that was handed out in exchange is revoked too
+    response = await test_client.get(
+        "/auth/efresh", cookies={"refresh_token": second_token}
+    )
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Refresh token is ingetrokken"
+
+
+@pytest.mark.parametrize(
+    "login_url, refresh_url",
+    [
+        ("/auth/login", "/auth/efresh"),
+        ("http://test/api/v1/auth/new-login", "http://test/api/v1/auth/new-refresh"),
+    ],
+)
+async def test_refresh_with_the_cookie_jar(
+    test_client: TestClient, monkeypatch, login_url: str, refresh_url: str
+):
+    # Like a browser: the client only sends back the cookie it was given
+    monkeypatch.setattr(get_settings(), "refresh_token_reuse_grace", 0)
+    test_client.cookies.clear()
+    try:
+        response = await test_client.post(
+            login_url,
+            data={"username": "werknemer@werknemer.com", "password": "werknemer"},
+        )
+        assert response.status_code == 200
+        tokens = [test_client.cookies["refresh_token"]]
+        for _ in range(3):
+            response = await test_client.get(refresh_url)
+            assert response.status_code == 200
+            tokens.append(test_client.cookies["refresh_token"])
+            assert tokens[-1] == response.json()["refresh_token"]
+        assert len(set(tokens)) == 4
+    finally:
+        test_client.cookies.clear()
+
+
+async def test_concurrent_refreshes_within_the_grace_window(test_client: TestClient):
+    response = await test_client.post(
+        "/auth/login",
+        data={"username": "werknemer@werknemer.com", "password": "werknemer"},
+    )
+    token = response.cookies["refresh_token"]
+    test_client.cookies.clear()
+
+    # Two tabs refresh with the same cookie, both get a token that keeps working
+    responses = [
+        await test_client.get("/auth/efresh", cookies={"refresh_token": token})
+        for _ in range(2)
+    ]
+    assert [response.status_code for response in responses] == [200, 200]
+    for response in responses:
+        response = await test_client.get(
+            "/auth/efresh",
+            cookies={"refresh_token": response.json()["refresh_token"]},
+        )
+        assert response.status_code == 200
+
+    # A third use of the same token is a replay, the family is revoked
+    response = await test_client.get("/auth/efresh", cookies={"refresh_token": token})
+    assert response.status_code == 403
+    assert response.json()["detail"] == "Refresh token is al gebruikt, log opnieuw in"
+    test_client.cookies.clear()
+
+
+async def test_refresh_token_without_session_is_rejected(test_client: TestClient):
+    refresh_token = Auth.get_refresh_token("werknemer@werknemer.com")
+    response = await test_client.get(
+        "/auth/efresh", cookies={"refresh_token": refresh_token["token"]}
+    )
+    assert response.status_code == 403
+
+
+# Rate limiting
+async def test_login_attempts_are_limited_per_email(
+    test_client: TestClient, max_queries
+):
+    data = {"username": "werknemer@werknemer.com", "password": "fout"}
+    for _ in range(9):
+        response = await test_client.post("/auth/login", data=data)
+        assert response.status_code == 401
+    response = await test_client.post(
+        "/auth/login", data={**data, "password": "werknemer"}
+    )
+    assert response.status_code == 200
+
+    # Refused before the user is loaded, so without any query or password hash
+    async with max_queries(0):
+        response = await test_client.post(
+            "http://test/api/v1/auth/new-login",
+            data={**data, "password": "werknemer"},
+        )
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) > 0
+    # Other accounts can still log in
+    response = await test_client.post(
+        "/auth/login", data={"username": "admin@admin.com", "password": "admin"}
+    )
+    assert response.status_code == 200
+
+
+async def test_login_attempts_are_limited_per_ip(
+    test_client: TestClient, monkeypatch
+):
+    monkeypatch.setattr(get_settings(), "login_rate_limit_per_ip", 3)
+    for i in range(3):
+        response = await test_client.post(
+            "http://test/api/v1/auth/login",
+            data={"username": f"onbekend{i}@test.com", "password": "fout"},
+        )
+        assert response.status_code == 401
+    response = await test_client.post(
+        "/auth/login", data={"username": "admin@admin.com", "password": "admin"}
+    )
+    assert response.status_code == 429
+    assert response.json()["detail"].startswith("Te veel inlogpogingen")
+
+
+async def test_spoofed_forwarded_for_does_not_reset_the_ip_limit(
+    test_client: TestClient, monkeypatch
+):
+    # The test client connects as 127.0.0.1, not a trusted proxy here
+    monkeypatch.setattr(get_settings(), "trusted_proxies", "172.16.0.0/12")
+    monkeypatch.setattr(get_settings(), "login_rate_limit_per_ip", 3)
+    for i in range(3):
+        response = await test_client.post(
+            "/auth/login",
+            data={"username": f"onbekend{i}@test.com", "password": "fout"},
+            headers={"X-Forwarded-For": f"198.51.100.{i}"},
+        )
+        assert response.status_code == 401
+    response = await test_client.post(
+        "/auth/login",
+        data={"username": "admin@admin.com", "password": "admin"},
+        headers={"X-Forwarded-For": "198.51.100.99"},
+    )
+    assert response.status_code == 429
@@ -0,0 +1,126 @@
+import json
+import os
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.api.ionic import get_device_id_status, login_ionic, logout_ionic
+from app.models.pydantic import LogoutRequest
+from app.models.tortoise import LoginStatusDevices, RefreshSessions, Users
+from app.services.v1.auth import get_current_user
+
+pytestmark = pytest.mark.anyio
+
+
+async def login(device_id: str, email="werknemer@werknemer.com", password="werknemer"):
+    response = await login_ionic(username=email, password=password, device_id=device_id)
+    assert response.status_code == 200
+    return json.loads(response.body)
+
+
+async def test_device_id_status_rotates_the_refresh_token(
+    test_client: TestClient, max_queries
+):
+    tokens = await login("telefoon-1")
+    device = await LoginStatusDevices.get(device_id="telefoon-1")
+
+    # Step by step on SQLite: the device, the token's family, the rotation and
+    # storing the new access token
+    async with max_queries(5):
+        response = await get_device_id_status("telefoon-1", tokens["refresh_token"])
+    assert response.status_code == 200
+    new_tokens = json.loads(response.body)
+    user = await get_current_user(token=new_tokens["access_token"])
+    assert user.email == "werknemer@werknemer.com"
+    # Still the family of the login, and the old refresh token is used up
+    sessions = await RefreshSessions.filter(family_id=device.refresh_family_id)
+    assert len(sessions) == 2
+    await device.refresh_from_db()
+    assert device.last_provided_access_token == new_tokens["access_token"]
+
+    response = await get_device_id_status("telefoon-1", new_tokens["refresh_token"])
+    assert response.status_code == 200
+
+
+@pytest.mark.skipif(
+    not os.getenv("DATABASE_TEST_URL", "").startswith("postgres"),
+    reason="the single query rotation needs postgres",
+)
+async def test_device_id_status_is_a_single_query(
+    test_client: TestClient, max_queries
+):
+    tokens = await login("telefoon-7")
+
+    async with max_queries(1):
+        response = await get_device_id_status("telefoon-7", tokens["refresh_token"])
+    assert response.status_code == 200
+    new_tokens = json.loads(response.body)
+    device = await LoginStatusDevices.get(device_id="telefoon-7")
+    assert device.last_provided_access_token == new_tokens["access_token"]
+    assert await RefreshSessions.filter(
+        family_id=device.refresh_family_id, revoked=False
+    ).count() == 2
+
+
+async def test_device_id_status_needs_the_refresh_token_of_the_device(
+    test_client: TestClient,
+):
+    await login("telefoon-4")
+    other_device = await login("telefoon-5")
+    for refresh_token in (None, "geen token", other_device["refresh_token"]):
+        with pytest.raises(HTTPException) as e:
+            await get_device_id_status("telefoon-4", refresh_token)
+        assert e.value.status_code == 401
+    # The token of the other device wasn't used up by the attempt
+    response = await get_device_id_status("telefoon-5", other_device["refresh_token"])
+    assert response.status_code == 200
+
+
+async def test_device_id_status_of_unknown_or_logged_out_device(
+    test_client: TestClient,
+):
+    with pytest.raises(HTTPException) as e:
+        await get_device_id_status("onbekend", None)
+    assert e.value.status_code == 404
+
+    await LoginStatusDevices.create(
+        device_id="telefoon-2",
+        logged_in=False,
+        user=await Users.get(email="werknemer@werknemer.com"),
+    )
+    with pytest.raises(HTTPException) as e:
+        await get_device_id_status("telefoon-2", None)
+    assert e.value.status_code == 401
+
+
+async def test_login_takes_over_device(test_client: TestClient):
+    first_owner = await login("telefoon-3", "admin@admin.com", "admin")
+    tokens = await login("telefoon-3")
+
+    response = await get_device_id_status("telefoon-3", tokens["refresh_token"])
+    access_token = json.loads(response.body)["access_token"]
+    user = await get_current_user(token=access_token)
+    assert user.email == "werknemer@werknemer.com"
+    # The login of the previous owner on the device has ended
+    with pytest.raises(HTTPException):
+        await get_device_id_status("telefoon-3", first_owner["refresh_token"])
+
+
+async def test_logout_ends_the_tokens_issued_to_the_device(test_client: TestClient):
+    tokens = await login("telefoon-6")
+    response = await get_device_id_status("telefoon-6", tokens["refresh_token"])
+    reissued = json.loads(response.body)
+    family_id = (await LoginStatusDevices.get(device_id="telefoon-6")).refresh_family_id
+
+    user = await get_current_user(token=tokens["access_token"])
+    response = await logout_ionic(
+        LogoutRequest(device_id="telefoon-6"), user, tokens["access_token"]
+    )
+    assert response.status_code == 200
+
+    for access_token in (tokens["access_token"], reissued["access_token"]):
+        with pytest.raises(HTTPException) as e:
+            await get_current_user(token=access_token)
+        assert e.value.status_code == 401
+    assert not await RefreshSessions.filter(family_id=family_id, revoked=False).exists()
@@ -0,0 +1,62 @@
+import pytest
+from fastapi.testclient import TestClient
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_roles_are_cached_until_a_role_changes(
+    test_client: TestClient, admin_token: str, max_queries
+):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await test_client.get("/admin/roles/", headers=headers)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    async with max_queries(10) as stats:
+        response = await test_client.get(
+            "/admin/roles/", headers={**headers, "If-None-Match": etag}
+        )
+    assert response.status_code == 304
+    # Only the user of the token and its relations are loaded
+    assert not [
+        query
+        for query in stats.queries
+        if 'FROM "roles"' in query and "user_roles" not in query
+    ]
+
+    response = await test_client.post(
+        "/admin/roles/",
+        headers=headers,
+        json={"name": "cache", "description": "Nieuwe rol"},
+    )
+    assert response.status_code == 200
+    role_id = response.json()["id"]
+    response = await test_client.get(
+        "/admin/roles/", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert "cache" in [role["name"] for role in response.json()]
+
+    response = await test_client.delete(f"/admin/roles/{role_id}", headers=headers)
+    assert response.status_code == 200
+    response = await test_client.get("/admin/roles/", headers=headers)
+    assert "cache" not in [role["name"] for role in response.json()]
+
+
+async def test_cache_stats(
+    test_client: TestClient, admin_token: str, werknemer_token: str
+):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    await test_client.get("/admin/roles/", headers=headers)
+    # Only for admins
+    response = await test_client.get("http://test/api/health/caches")
+    assert response.status_code == 401
+    response = await test_client.get(
+        "http://test/api/health/caches",
+        headers={"Authorization": f"Bearer {werknemer_token}"},
+    )
+    assert response.status_code == 403
+    response = await test_client.get("http://test/api/health/caches", headers=headers)
+    assert response.status_code == 200
+    roles = next(cache for cache in response.json() if cache["name"] == "roles")
+    assert roles["hits"] + roles["misses"] >= 1
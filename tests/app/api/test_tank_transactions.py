@@ -0,0 +1,43 @@
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models.pydantic import TankTransactionResponseSchema
+from app.models.tortoise import TankTransactions
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_get_tank_transactions_matches_schema(
+    test_client: TestClient, admin_token: str
+):
+    created = [
+        await TankTransactions.create(
+            vehicle="Trekker",
+            driver="Jan",
+            start_date_time=datetime.datetime(2031, 5, day, 7, 30, 15, 250000),
+            transaction_number=day,
+            product="Diesel",
+            quantity=40.5 + day,
+            meter=1200 + day,
+        )
+        for day in (1, 2)
+    ]
+    await TankTransactions.create(vehicle="Klein materiaal", quantity=1.0)
+
+    response = await test_client.get(
+        "http://test/api/v1/tank_transactions/",
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    rows = [row for row in response.json() if row["vehicle"] == "Trekker"]
+    # Same JSON as serializing through the response schema
+    assert rows == [
+        TankTransactionResponseSchema.model_validate(transaction).model_dump(
+            mode="json"
+        )
+        for transaction in reversed(created)
+    ]
+    assert all(row["vehicle"] != "Klein materiaal" for row in response.json())
@@ -0,0 +1,123 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models.tortoise import Addresses, Roles, Users
+
+pytestmark = pytest.mark.anyio
+
+
+async def list_users(test_client: TestClient, token: str, url="/admin/users/", **params):
+    response = await test_client.get(
+        url, params=params, headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    return response
+
+
+async def test_admin_user_list_pages_with_a_cursor(
+    test_client: TestClient, admin_token: str, max_queries
+):
+    all_ids = sorted(await Users.all().values_list("id", flat=True))
+    ids, cursor = [], None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        # The role check takes five, the page and its roles two
+        async with max_queries(7):
+            response = await list_users(test_client, admin_token, **params)
+        page = response.json()
+        assert len(page) <= 2
+        assert all("address" not in user for user in page)
+        ids += [user["id"] for user in page]
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert ids == all_ids
+
+
+async def test_admin_user_list_filters_on_roles(
+    test_client: TestClient, admin_token: str
+):
+    response = await list_users(test_client, admin_token, roles=["melker"])
+    assert [user["email"] for user in response.json()] == ["melker@melker.com"]
+    assert {role["name"] for role in response.json()[0]["roles"]} == {
+        "werknemer",
+        "melker",
+    }
+
+    # A user with both roles is listed once
+    response = await list_users(
+        test_client, admin_token, roles=["monteur", "werknemer"]
+    )
+    emails = [user["email"] for user in response.json()]
+    assert emails.count("monteur@monteur.com") == 1
+    assert "admin@admin.com" not in emails
+
+
+async def test_admin_user_list_searches_on_name_and_email(
+    test_client: TestClient, admin_token: str
+):
+    user = await Users.create(
+        first_name="Jannie",
+        last_name="de Boer",
+        email="seizoen@zomer.com",
+        hashed_password="-",
+        is_active=True,
+    )
+    await user.roles.add(await Roles.get(name="werknemer"))
+    await Addresses.create(
+        street="Dorpsstraat",
+        number="1",
+        postal_code="1234AB",
+        city="Zwaag",
+        country="Nederland",
+        user=user,
+    )
+
+    for search in ("JAN", "jannie de", "Seiz", "jan seiz"):
+        response = await list_users(test_client, admin_token, search=search)
+        assert [item["email"] for item in response.json()] == ["seizoen@zomer.com"]
+    # Only the start of a name or email matches
+    response = await list_users(test_client, admin_token, search="nnie")
+    assert response.json() == []
+
+    # The v1 list works the same, the detail endpoints still have the address
+    response = await list_users(
+        test_client,
+        admin_token,
+        url="http://test/api/v1/users/",
+        search="jan",
+        roles=["werknemer"],
+    )
+    assert [item["email"] for item in response.json()] == ["seizoen@zomer.com"]
+    assert "address" not in response.json()[0]
+    response = await test_client.get(
+        f"/admin/users/{user.id}", headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.json()["address"]["street"] == "Dorpsstraat"
+
+
+async def test_admin_user_list_limit_is_bounded(
+    test_client: TestClient, admin_token: str
+):
+    response = await test_client.get(
+        "/admin/users/",
+        params={"limit": 1000},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 422
+
+
+async def test_admin_user_list_without_paging_has_all_users(
+    test_client: TestClient, admin_token: str, monkeypatch
+):
+    monkeypatch.setattr("app.services.user_listing.DEFAULT_PAGE_SIZE", 1)
+    all_ids = sorted(await Users.all().values_list("id", flat=True))
+    for url in ("/admin/users/", "http://test/api/v1/users/"):
+        # Clients from before the pages get every user
+        response = await list_users(test_client, admin_token, url)
+        assert [user["id"] for user in response.json()] == all_ids
+        assert "X-Next-Cursor" not in response.headers
+        # A cursor alone pages by the default size
+        response = await list_users(test_client, admin_token, url, cursor=0)
+        assert [user["id"] for user in response.json()] == all_ids[:1]
+        assert response.headers["X-Next-Cursor"] == str(all_ids[0])
@@ -0,0 +1,279 @@
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models.tortoise import Roles, Users, Vakanties
+from app.services.resources import resource_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_get_all_vakanties_between_dates_projection(
+    test_client: TestClient, admin_token: str, max_queries
+):
+    werknemer = await Users.get(email="werknemer@werknemer.com")
+    monteur = await Users.get(email="monteur@monteur.com")
+    await Vakanties.create(
+        start_date=datetime.date(2030, 1, 6),
+        end_date=datetime.date(2030, 1, 10),
+        user=werknemer,
+    )
+    await Vakanties.create(
+        start_date=datetime.date(2030, 2, 3),
+        end_date=datetime.date(2030, 2, 7),
+        user=monteur,
+    )
+    # Loading the current user with its relations and the role check take five
+    async with max_queries(6) as stats:
+        response = await test_client.get(
+            "/vakanties/all_between_dates",
+            headers={"Authorization": f"Bearer {admin_token}"},
+            params={"start_date": "2030-01-01", "end_date": "2030-03-31"},
+        )
+    assert response.status_code == 200
+    assert [item["resource_id"] for item in response.json()] == [
+        werknemer.id,
+        monteur.id,
+    ]
+    # Exactly one query on the vakanties table, no lazy relation loading per row
+    vakantie_queries = [query for query in stats.queries if "vakanties" in query]
+    assert len(vakantie_queries) == 1
+
+
+async def test_get_all_vakanties_between_dates_for_selected_users(
+    test_client: TestClient, admin_token: str
+):
+    monteur = await Users.get(email="monteur@monteur.com")
+    response = await test_client.get(
+        "/vakanties/all_between_dates",
+        headers={"Authorization": f"Bearer {admin_token}"},
+        params={
+            "start_date": "2030-01-01",
+            "end_date": "2030-03-31",
+            "user_ids": [monteur.id],
+        },
+    )
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert response.json()[0]["resource_id"] == monteur.id
+    assert response.json()[0]["start_date"] == "2030-02-03"
+
+
+# Resources
+async def get_resources(test_client: TestClient, token: str, **headers):
+    return await test_client.get(
+        "/vakanties/resources",
+        headers={"Authorization": f"Bearer {token}", **headers},
+    )
+
+
+async def test_resources_are_cached_with_an_etag(
+    test_client: TestClient, admin_token: str, max_queries
+):
+    resource_cache.invalidate()
+    werknemer = await Users.get(email="werknemer@werknemer.com")
+    # Loading the current user with its relations and the role check take five,
+    # the resources are a single join
+    async with max_queries(6):
+        response = await get_resources(test_client, admin_token)
+    assert response.status_code == 200
+    resources = {resource["id"]: resource for resource in response.json()}
+    assert resources[werknemer.id]["groupId"] == 1
+    # Users without the werknemer role aren't planned
+    admin = await Users.get(email="admin@admin.com")
+    assert admin.id not in resources
+    etag = response.headers["etag"]
+
+    async with max_queries(5):
+        response = await get_resources(
+            test_client, admin_token, **{"If-None-Match": etag}
+        )
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+    response = await get_resources(
+        test_client, admin_token, **{"If-None-Match": 'W/"iets anders"'}
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "add_url, remove_url",
+    [
+        (
+            "http://test/api/v1/users/add-role/",
+            "http://test/api/v1/users/delete-role/",
+        ),
+        (
+            "/admin/users/add_role_to_user/",
+            "/admin/users/remove_role_from_user/",
+        ),
+    ],
+)
+async def test_role_changes_evict_the_resources(
+    test_client: TestClient, admin_token: str, add_url: str, remove_url: str
+):
+    admin = await Users.get(email="admin@admin.com")
+    werknemer_role = await Roles.get(name="werknemer")
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    body = {"user_id": admin.id, "role_id": werknemer_role.id}
+
+    response = await get_resources(test_client, admin_token)
+    assert admin.id not in [resource["id"] for resource in response.json()]
+
+    response = await test_client.post(add_url, headers=headers, json=body)
+    assert response.status_code == 200
+    response = await get_resources(test_client, admin_token)
+    assert admin.id in [resource["id"] for resource in response.json()]
+
+    response = await test_client.request(
+        "DELETE", remove_url, headers=headers, json=body
+    )
+    assert response.status_code == 200
+    response = await get_resources(test_client, admin_token)
+    assert admin.id not in [resource["id"] for resource in response.json()]
+
+
+async def test_name_changes_evict_the_resources(
+    test_client: TestClient, admin_token: str
+):
+    werknemer = await Users.get(email="werknemer@werknemer.com")
+    await get_resources(test_client, admin_token)
+    response = await test_client.put(
+        f"/admin/users/{werknemer.id}",
+        headers={"Authorization": f"Bearer {admin_token}"},
+        json={
+            "first_name": "Gerrit",
+            "last_name": "Vroege",
+            "email": werknemer.email,
+            "telephone_number": werknemer.telephone_number,
+            "date_of_birth": None,
+        },
+    )
+    assert response.status_code == 200
+    try:
+        response = await get_resources(test_client, admin_token)
+        titles = {resource["id"]: resource["title"] for resource in response.json()}
+        assert titles[werknemer.id] == "Gerrit Vroege"
+    finally:
+        await Users.filter(id=werknemer.id).update(
+            first_name=werknemer.first_name,
+            last_name=werknemer.last_name,
+            date_of_birth=werknemer.date_of_birth,
+        )
+        resource_cache.invalidate()
+
+
+# Calendar
+async def get_calendar(test_client: TestClient, token: str, start, end, **headers):
+    return await test_client.get(
+        "/vakanties/calendar",
+        headers={"Authorization": f"Bearer {token}", **headers},
+        params={"start": start, "end": end},
+    )
+
+
+async def test_calendar_returns_vakanties_that_overlap_the_window(
+    test_client: TestClient, werknemer_token: str
+):
+    werknemer = await Users.get(email="werknemer@werknemer.com")
+    d = datetime.date
+    vakanties = {
+        name: await Vakanties.create(start_date=start, end_date=end, user=werknemer)
+        for name, start, end in [
+            ("starts before the window", d(2040, 4, 25), d(2040, 5, 3)),
+            ("ends on the first day", d(2040, 4, 20), d(2040, 5, 2)),
+            ("ends before the window", d(2040, 4, 20), d(2040, 5, 1)),
+            ("within the window", d(2040, 5, 5), d(2040, 5, 6)),
+            ("starts on the last day", d(2040, 5, 9), d(2040, 5, 12)),
+            ("starts on the end", d(2040, 5, 10), d(2040, 5, 12)),
+        ]
+    }
+    try:
+        response = await get_calendar(
+            test_client, werknemer_token, "2040-05-02", "2040-05-10"
+        )
+        assert response.status_code == 200
+        ids = {vakantie["id"] for vakantie in response.json()}
+        assert ids == {
+            vakanties[name].id
+            for name in (
+                "starts before the window",
+                "ends on the first day",
+                "within the window",
+                "starts on the last day",
+            )
+        }
+        first = next(
+            vakantie
+            for vakantie in response.json()
+            if vakantie["id"] == vakanties["starts before the window"].id
+        )
+        assert first == {
+            "id": first["id"],
+            "start": "2040-04-25",
+            "end": "2040-05-03",
+            "resourceId": werknemer.id,
+        }
+    finally:
+        await Vakanties.filter(id__in=[v.id for v in vakanties.values()]).delete()
+
+
+@pytest.mark.parametrize(
+    "start, end", [("2040-05-10", "2040-05-10"), ("2040-05-11", "2040-05-10")]
+)
+async def test_calendar_needs_start_before_end(
+    test_client: TestClient, werknemer_token: str, start: str, end: str
+):
+    response = await get_calendar(test_client, werknemer_token, start, end)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Start datum moet voor eind datum liggen"
+
+
+async def test_calendar_answers_conditional_requests(
+    test_client: TestClient, werknemer_token: str
+):
+    werknemer = await Users.get(email="werknemer@werknemer.com")
+    await Vakanties.create(
+        start_date=datetime.date(2041, 3, 4),
+        end_date=datetime.date(2041, 3, 8),
+        user=werknemer,
+    )
+    window = ("2041-03-01", "2041-04-01")
+    try:
+        response = await get_calendar(test_client, werknemer_token, *window)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+        last_modified = response.headers["last-modified"]
+
+        response = await get_calendar(
+            test_client, werknemer_token, *window, **{"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+        response = await get_calendar(
+            test_client,
+            werknemer_token,
+            *window,
+            **{"If-Modified-Since": last_modified},
+        )
+        assert response.status_code == 304
+
+        # A new vakantie in the window changes the ETag
+        await Vakanties.create(
+            start_date=datetime.date(2041, 3, 22),
+            end_date=datetime.date(2041, 3, 23),
+            user=werknemer,
+        )
+        response = await get_calendar(
+            test_client, werknemer_token, *window, **{"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+    finally:
+        await Vakanties.filter(
+            start_date__gte=datetime.date(2041, 3, 1),
+            start_date__lt=datetime.date(2041, 4, 1),
+        ).delete()
@@ -0,0 +1,92 @@
+import asyncio
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.helpers.sse import event_stream
+from app.services.events import WORKING_HOURS, EventBroker, event_broker
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_events_are_for_admins_only(
+    test_client: TestClient, werknemer_token: str
+):
+    response = await test_client.get(
+        "/admin/working_hours/events",
+        headers={"Authorization": f"Bearer {werknemer_token}"},
+    )
+    assert response.status_code == 403
+
+
+async def test_submit_and_release_are_published(
+    test_client: TestClient, werknemer_token: str, admin_token: str
+):
+    date = datetime.date(2023, 3, 6)
+    async with event_broker.subscribe(WORKING_HOURS) as subscription:
+        response = await test_client.put(
+            "/working_hours/",
+            headers={"Authorization": f"Bearer {werknemer_token}"},
+            json={
+                "date": date.isoformat(),
+                "hours": 8,
+                "description": "melken",
+                "submitted": False,
+            },
+        )
+        assert response.status_code == 200
+        upsert = await subscription.get()
+        assert upsert["type"] == "upsert"
+        assert upsert["date"] == date.isoformat()
+        assert upsert["hours"] == 8
+        user_id = upsert["user_id"]
+
+        response = await test_client.put(
+            "/working_hours/",
+            headers={"Authorization": f"Bearer {werknemer_token}"},
+            json={
+                "date": date.isoformat(),
+                "hours": 8,
+                "description": "melken",
+                "submitted": True,
+            },
+        )
+        assert response.status_code == 200
+        submit = await subscription.get()
+        assert submit["type"] == "submit"
+        assert submit["submitted"] is True
+
+        response = await test_client.put(
+            "/admin/working_hours/release",
+            headers={"Authorization": f"Bearer {admin_token}"},
+            json={
+                "user_id": user_id,
+                "from_date": date.isoformat(),
+                "to_date": date.isoformat(),
+            },
+        )
+        assert response.status_code == 200
+        assert await subscription.get() == {
+            "type": "release",
+            "user_id": user_id,
+            "from_date": date.isoformat(),
+            "to_date": date.isoformat(),
+        }
+
+
+async def test_event_stream_sends_events_and_heartbeats():
+    broker = EventBroker()
+    stream = event_stream(broker, WORKING_HOURS, heartbeat_interval=0.05)
+    try:
+        assert await stream.__anext__() == "retry: 5000\n\n"
+        # Subscribed once the stream started
+        next_message = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        await broker.publish(WORKING_HOURS, {"type": "submit", "id": 1})
+        assert await next_message == (
+            'id: 1\nevent: submit\ndata: {"type": "submit", "id": 1}\n\n'
+        )
+        assert await stream.__anext__() == ": ping\n\n"
+    finally:
+        await stream.aclose()
@@ -0,0 +1,111 @@
+import csv
+import datetime
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+from tortoise import Tortoise
+
+from app.models.tortoise import Users, WorkingHours
+from app.services.working_hours_export import export_chunks
+
+pytestmark = pytest.mark.anyio
+
+FROM_DATE, TO_DATE = datetime.date(2022, 5, 1), datetime.date(2022, 5, 15)
+
+
+@pytest.fixture(scope="module")
+async def export_hours(test_client):
+    user = await Users.get(email="werknemer@werknemer.com")
+    for day, hours, description in [
+        (2, 8, "melken"),
+        (3, 4.5, "=1+1"),
+        (9, 6, "trekker"),
+        # Outside the range
+        (16, 2, "later"),
+    ]:
+        await WorkingHours.create(
+            date=datetime.date(2022, 5, day),
+            hours=hours,
+            milkings=1,
+            description=description,
+            submitted=True,
+            created_by=user.email,
+            user=user,
+        )
+    return user
+
+
+async def test_csv_export_has_days_and_weekly_totals(
+    test_client: TestClient, admin_token: str, export_hours
+):
+    response = await test_client.get(
+        "/admin/working_hours/export",
+        params={"from_date": FROM_DATE, "to_date": TO_DATE},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert "werkuren_2022-05-01_2022-05-15.csv" in (
+        response.headers["content-disposition"]
+    )
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][0] == "Regel"
+    lines = [(row[0], row[3], row[5], row[6], row[8]) for row in rows[1:]]
+    assert lines == [
+        ("dag", "2022-05-02", "18", "8.0", "melken"),
+        ("dag", "2022-05-03", "18", "4.5", "'=1+1"),
+        ("weektotaal", "", "18", "12.5", ""),
+        ("dag", "2022-05-09", "19", "6.0", "trekker"),
+        ("weektotaal", "", "19", "6.0", ""),
+    ]
+
+
+async def test_xlsx_export_has_a_sheet_of_weekly_totals(
+    test_client: TestClient, admin_token: str, export_hours
+):
+    response = await test_client.get(
+        "/admin/working_hours/export",
+        params={"from_date": FROM_DATE, "to_date": TO_DATE, "format": "xlsx"},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+    workbook = load_workbook(io.BytesIO(response.content), read_only=True)
+    assert workbook.sheetnames == ["Uren", "Weektotalen"]
+    days = list(workbook["Uren"].values)
+    assert len(days) == 4
+    assert days[2][7] == "'=1+1"
+    weeks = list(workbook["Weektotalen"].values)
+    assert [week[2:] for week in weeks[1:]] == [
+        (2022, 18, 2, 12.5, 2),
+        (2022, 19, 1, 6, 1),
+    ]
+
+
+async def test_export_is_for_admins_with_a_valid_range(
+    test_client: TestClient, admin_token: str, werknemer_token: str
+):
+    params = {"from_date": FROM_DATE, "to_date": TO_DATE}
+    response = await test_client.get(
+        "/admin/working_hours/export",
+        params=params,
+        headers={"Authorization": f"Bearer {werknemer_token}"},
+    )
+    assert response.status_code == 403
+    response = await test_client.get(
+        "/admin/working_hours/export",
+        params={"from_date": TO_DATE, "to_date": FROM_DATE},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 400
+
+
+async def test_rows_are_fetched_in_chunks(test_client: TestClient, export_hours):
+    chunks = [
+        chunk
+        async for chunk in export_chunks(
+            Tortoise.get_connection("default"), FROM_DATE, TO_DATE, chunk_size=2
+        )
+    ]
+    assert [len(chunk) for chunk in chunks] == [2, 1]
@@ -0,0 +1,91 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import Response, StreamingResponse
+from httpx import AsyncClient
+from starlette.middleware import Middleware
+
+from app.middleware.compression import CompressionMiddleware, accepted_encoding
+
+brotli = pytest.importorskip("brotli")
+
+pytestmark = pytest.mark.anyio
+
+ROWS = [{"id": i, "vehicle": "Trekker", "quantity": 40.5} for i in range(200)]
+
+
+def _app(**options) -> FastAPI:
+    app = FastAPI(middleware=[Middleware(CompressionMiddleware, **options)])
+
+    @app.get("/rows")
+    async def rows():
+        return ROWS
+
+    @app.get("/small")
+    async def small():
+        return {"id": 1}
+
+    @app.get("/image")
+    async def image():
+        return Response(b"\x89PNG" + b"\x00" * 4096, media_type="image/png")
+
+    @app.get("/export")
+    async def export():
+        async def _lines():
+            for row in ROWS:
+                yield f"{row['id']};{row['vehicle']}\n"
+
+        return StreamingResponse(_lines(), media_type="text/csv")
+
+    return app
+
+
+async def _get(app: FastAPI, path: str, accept_encoding: str):
+    # httpx decodes gzip/br itself, read the raw bytes to check the encoding
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        async with client.stream(
+            "GET", path, headers={"Accept-Encoding": accept_encoding}
+        ) as response:
+            body = b"".join([chunk async for chunk in response.aiter_raw()])
+            return response, body
+
+
+def test_accepted_encoding_prefers_brotli():
+    assert accepted_encoding("gzip, deflate, br") == "br"
+    assert accepted_encoding("gzip;q=1.0, br;q=0") == "gzip"
+    assert accepted_encoding("identity") is None
+
+
+@pytest.mark.parametrize("offload_size", [256 * 1024, 1])
+async def test_large_json_is_compressed(offload_size: int):
+    app = _app(offload_size=offload_size)
+    response, body = await _get(app, "/rows", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(body)
+    plain = gzip.decompress(body)
+
+    response, body = await _get(app, "/rows", "gzip, br")
+    assert response.headers["content-encoding"] == "br"
+    assert brotli.decompress(body) == plain
+    assert len(body) < len(plain)
+
+
+async def test_small_and_binary_responses_are_not_compressed():
+    app = _app()
+    response, body = await _get(app, "/small", "gzip, br")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert body == b'{"id":1}'
+
+    response, body = await _get(app, "/image", "gzip, br")
+    assert "content-encoding" not in response.headers
+    assert body.startswith(b"\x89PNG")
+
+
+async def test_streaming_response_is_compressed():
+    response, body = await _get(_app(), "/export", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body).decode().splitlines()[1] == "1;Trekker"
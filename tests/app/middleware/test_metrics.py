@@ -0,0 +1,45 @@
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+from starlette.middleware import Middleware
+
+from app.middleware.metrics import PrometheusMiddleware, metrics_endpoint
+
+pytestmark = pytest.mark.anyio
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+async def test_requests_are_labelled_by_route_template():
+    app = FastAPI(middleware=[Middleware(PrometheusMiddleware, app_name="test")])
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+    @app.get("/machines/{machine_id}")
+    async def get_machine(machine_id: int):
+        return {"id": machine_id}
+
+    labels = {"app": "test", "method": "GET", "route": "/machines/{machine_id}"}
+    before = _sample("http_requests_total", status="200", **labels)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for machine_id in (1, 2):
+            assert (await client.get(f"/machines/{machine_id}")).status_code == 200
+        assert (await client.get("/onbekend")).status_code == 404
+        response = await client.get("/metrics")
+
+    assert _sample("http_requests_total", status="200", **labels) == before + 2
+    assert _sample("http_request_duration_seconds_count", **labels) >= 2
+    assert _sample("http_response_size_bytes_sum", **labels) > 0
+    assert _sample(
+        "http_requests_total",
+        app="test",
+        method="GET",
+        route="__unmatched__",
+        status="404",
+    ) >= 1
+    # The scrape itself was the only request in flight
+    assert 'http_requests_in_progress{app="test",method="GET"} 1.0' in response.text
+    assert _sample("http_requests_in_progress", app="test", method="GET") == 0
+    assert 'route="/machines/{machine_id}"' in response.text
@@ -0,0 +1,50 @@
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_server_timing_header(test_client: TestClient, admin_token: str):
+    response = await test_client.get(
+        "/vakanties/all", headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+    database_timing = response.headers["server-timing"]
+    assert database_timing.startswith("db;dur=")
+    assert 'queries"' in database_timing
+
+
+async def test_slow_query_is_logged_with_route(
+    test_client: TestClient, admin_token: str, monkeypatch, caplog
+):
+    monkeypatch.setattr(get_settings(), "slow_query_threshold_ms", 0)
+    with caplog.at_level(logging.WARNING, logger="uvicorn"):
+        response = await test_client.get(
+            "/vakanties/all", headers={"Authorization": f"Bearer {admin_token}"}
+        )
+    assert response.status_code == 200
+    slow_queries = [
+        record.message
+        for record in caplog.records
+        if record.message.startswith("Trage query")
+    ]
+    assert any(
+        "/vakanties/all" in message and "vakanties" in message.split(": ", 1)[1]
+        for message in slow_queries
+    )
+
+
+async def test_max_queries_counts_queries_of_the_request(
+    test_client: TestClient, admin_token: str, max_queries
+):
+    async with max_queries(10) as stats:
+        response = await test_client.get(
+            "/vakanties/all", headers={"Authorization": f"Bearer {admin_token}"}
+        )
+    assert response.status_code == 200
+    assert stats.count > 0
+    assert any("vakanties" in query for query in stats.queries)
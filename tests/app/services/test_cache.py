@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models.tortoise import Roles
+from app.services.cache import ReadThroughCache, cache_stats
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def test_concurrent_misses_run_one_query(test_client: TestClient, max_queries):
+    cache = ReadThroughCache("roles_test", lambda key: Roles.all())
+
+    async with max_queries(1) as stats:
+        results = await asyncio.gather(*(cache.get() for _ in range(100)))
+
+    assert stats.count == 1
+    assert all(result is results[0] for result in results)
+    assert cache.stats()["misses"] == 100
+    assert cache.stats()["loads"] == 1
+    await cache.get()
+    assert cache.stats()["hits"] == 1
+
+
+async def test_values_expire_after_ttl():
+    clock, loads = Clock(), []
+
+    async def load(key):
+        loads.append(key)
+        return len(loads)
+
+    cache = ReadThroughCache("ttl_test", load, ttl=10, clock=clock)
+    assert await cache.get("a") == 1
+    clock.now = 9.9
+    assert await cache.get("a") == 1
+    clock.now = 10
+    assert await cache.get("a") == 2
+    assert cache.stats()["expirations"] == 1
+
+
+async def test_least_recently_used_key_is_evicted():
+    async def load(key):
+        return key * 2
+
+    cache = ReadThroughCache("lru_test", load, max_size=2)
+    await cache.get(1)
+    await cache.get(2)
+    await cache.get(1)
+    await cache.get(3)
+    assert list(cache._values) == [1, 3]
+    assert cache.stats()["evictions"] == 1
+
+
+async def test_load_during_invalidation_is_not_stored():
+    release = asyncio.Event()
+    loads = []
+
+    async def load(key):
+        loads.append(key)
+        number = len(loads)
+        await release.wait()
+        return number
+
+    cache = ReadThroughCache("invalidation_test", load)
+    first = asyncio.create_task(cache.get())
+    await asyncio.sleep(0)
+    cache.invalidate()
+    second = asyncio.create_task(cache.get())
+    await asyncio.sleep(0)
+    release.set()
+
+    # The caller from before the invalidation gets the old load, later ones a new
+    assert await first == 1
+    assert await second == 2
+    assert await cache.get() == 2
+    assert cache.stats()["loads"] == 2
+
+
+async def test_failed_load_is_shared_and_not_cached():
+    calls = []
+
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        if len(calls) == 1:
+            raise RuntimeError("database weg")
+        return "ok"
+
+    cache = ReadThroughCache("error_test", load)
+    results = await asyncio.gather(
+        cache.get(), cache.get(), return_exceptions=True
+    )
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert await cache.get() == "ok"
+    assert cache.stats()["load_errors"] == 1
+
+
+async def test_stats_of_all_caches():
+    cache = ReadThroughCache("stats_test", lambda key: asyncio.sleep(0, "x"))
+    await cache.get()
+    stats = next(s for s in cache_stats() if s["name"] == "stats_test")
+    assert stats["size"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0
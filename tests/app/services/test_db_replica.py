@@ -0,0 +1,82 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from tortoise import connections
+
+from app.models.tortoise import Users
+from app.services.db_replica import read_only_connection, replica_router
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(scope="function")
+async def aliased_replica(test_client: TestClient, monkeypatch):
+    # The test database aliased twice, reads go over a second connection
+    monkeypatch.setitem(
+        connections.db_config, "replica", connections.db_config["default"]
+    )
+    replica_router.reset()
+    replica = connections.get("replica")
+    queries = []
+    execute_query = replica.execute_query
+
+    async def _record(query, values=None):
+        queries.append(query)
+        return await execute_query(query, values)
+
+    monkeypatch.setattr(replica, "execute_query", _record)
+    yield queries
+    await connections.discard("replica").close()
+    replica_router.reset()
+
+
+async def test_reads_use_primary_without_replica(test_client: TestClient):
+    replica_router.reset()
+    assert await read_only_connection() is connections.get("default")
+
+
+async def test_reads_use_replica_when_up_to_date(aliased_replica, monkeypatch):
+    async def _no_lag():
+        return 0.0
+
+    monkeypatch.setattr(replica_router, "replica_lag", _no_lag)
+    assert await read_only_connection() is connections.get("replica")
+
+
+async def test_lagging_replica_falls_back_to_primary(aliased_replica, monkeypatch):
+    async def _lagging():
+        return 3600.0
+
+    monkeypatch.setattr(replica_router, "replica_lag", _lagging)
+    assert await read_only_connection() is connections.get("default")
+
+
+@pytest.mark.skipif(
+    not os.getenv("DATABASE_TEST_URL", "").startswith("postgres"),
+    reason="replication lag can only be measured on postgres",
+)
+async def test_replica_lag_of_primary_is_zero(aliased_replica):
+    assert await replica_router.replica_lag() == 0
+
+
+async def test_week_overview_reads_from_replica(
+    aliased_replica, test_client: TestClient, admin_token: str, monkeypatch
+):
+    async def _no_lag():
+        return 0.0
+
+    monkeypatch.setattr(replica_router, "replica_lag", _no_lag)
+    werknemer = await Users.get(email="werknemer@werknemer.com")
+    response = await test_client.get(
+        "/admin/working_hours/week_overview/",
+        headers={"Authorization": f"Bearer {admin_token}"},
+        params={
+            "from_date": "2030-01-07",
+            "to_date": "2030-01-20",
+            "user_id": werknemer.id,
+        },
+    )
+    assert response.status_code == 200
+    assert sorted(week["week"] for week in response.json()) == [2, 3]
+    assert any("working_hours" in query for query in aliased_replica)
@@ -0,0 +1,70 @@
+import asyncio
+import datetime
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.events import EventBroker, PostgresBackend
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_subscribers_receive_published_events():
+    broker = EventBroker()
+    async with broker.subscribe("kanaal") as first, broker.subscribe(
+        "kanaal"
+    ) as second:
+        await broker.publish(
+            "kanaal", {"type": "upsert", "date": datetime.date(2024, 1, 2)}
+        )
+        await broker.publish("ander_kanaal", {"type": "upsert"})
+
+        for subscription in (first, second):
+            assert await subscription.get() == {"type": "upsert", "date": "2024-01-02"}
+            assert subscription.queue.empty()
+
+
+async def test_slow_subscriber_gets_resync_instead_of_backlog():
+    broker = EventBroker(queue_size=3)
+    async with broker.subscribe("kanaal") as subscription:
+        for i in range(5):
+            await broker.publish("kanaal", {"type": "upsert", "id": i})
+        # The fourth event overflowed the queue, the fifth fits behind the resync
+        assert await subscription.get() == {"type": "resync"}
+        assert await subscription.get() == {"type": "upsert", "id": 4}
+        assert subscription.queue.empty()
+        assert subscription.dropped == 4
+
+
+async def test_subscription_ends_with_its_context():
+    broker = EventBroker()
+    async with broker.subscribe("kanaal") as subscription:
+        pass
+    await broker.publish("kanaal", {"type": "upsert"})
+    assert subscription.queue.empty()
+
+
+async def test_too_large_events_are_not_published():
+    broker = EventBroker()
+    async with broker.subscribe("kanaal") as subscription:
+        await broker.publish("kanaal", {"type": "upsert", "data": "x" * 8000})
+        assert subscription.queue.empty()
+
+
+@pytest.mark.skipif(
+    not os.getenv("DATABASE_TEST_URL", "").startswith("postgres"),
+    reason="LISTEN/NOTIFY needs postgres",
+)
+async def test_events_reach_the_other_workers(test_client: TestClient):
+    worker_a, worker_b = EventBroker(), EventBroker()
+    await worker_a.start(PostgresBackend.from_connection())
+    await worker_b.start(PostgresBackend.from_connection())
+    try:
+        async with worker_b.subscribe("working_hours_test") as subscription:
+            await worker_a.publish("working_hours_test", {"type": "submit", "id": 1})
+            event = await asyncio.wait_for(subscription.get(), timeout=5)
+            assert event == {"type": "submit", "id": 1}
+    finally:
+        await worker_a.stop()
+        await worker_b.stop()
@@ -0,0 +1,65 @@
+import asyncio
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models.tortoise import Roles
+from app.services.events import EventBroker, PostgresBackend
+from app.services.invalidation import InvalidationBus, invalidation_bus
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_saving_and_deleting_a_watched_model_evicts(test_client: TestClient):
+    evicted = []
+    invalidation_bus.on("roles", evicted.append)
+    try:
+        role = await Roles.create(name="invalidatie", description="test")
+        await role.delete()
+    finally:
+        invalidation_bus.off("roles", evicted.append)
+    assert evicted == [str(role.pk), str(role.pk)]
+
+
+async def test_own_events_are_handled_once_and_resync_evicts_all():
+    broker = EventBroker()
+    bus = InvalidationBus(broker)
+    await bus.start()
+    evicted = []
+    bus.on("users", evicted.append)
+
+    await bus.publish("users", 7)
+    assert evicted == ["7"]
+    broker._resync()
+    assert evicted == ["7", None]
+
+
+@pytest.mark.skipif(
+    not os.getenv("DATABASE_TEST_URL", "").startswith("postgres"),
+    reason="LISTEN/NOTIFY needs postgres",
+)
+async def test_changes_evict_the_caches_of_other_workers(test_client: TestClient):
+    workers = []
+    for _ in range(2):
+        broker = EventBroker()
+        await broker.start(PostgresBackend.from_connection())
+        bus = InvalidationBus(broker)
+        await bus.start()
+        evicted = asyncio.Queue()
+        bus.on("machines", evicted.put_nowait)
+        workers.append((broker, bus, evicted))
+    (broker_a, bus_a, evicted_a), (broker_b, bus_b, evicted_b) = workers
+    try:
+        await bus_a.publish("machines", 12)
+        assert evicted_a.get_nowait() == "12"
+        assert await asyncio.wait_for(evicted_b.get(), timeout=5) == "12"
+
+        await bus_b.publish("machines")
+        assert await asyncio.wait_for(evicted_a.get(), timeout=5) is None
+        # Worker a doesn't evict its own change a second time
+        await asyncio.sleep(0.2)
+        assert evicted_a.empty()
+    finally:
+        await broker_a.stop()
+        await broker_b.stop()
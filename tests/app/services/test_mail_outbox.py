@@ -0,0 +1,173 @@
+import datetime
+import socket
+from pathlib import Path
+
+import pytest
+from fastapi_mail import ConnectionConfig
+from fastapi.testclient import TestClient
+
+from app.models.pydantic import EmailSchema
+from app.models.tortoise import MailOutbox
+from app.services.mail_outbox import Outbox, SMTPPool
+
+aiosmtpd_controller = pytest.importorskip("aiosmtpd.controller")
+
+pytestmark = pytest.mark.anyio
+
+
+class RecordingHandler:
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _mail_config(port: int) -> ConnectionConfig:
+    return ConnectionConfig(
+        MAIL_USERNAME="",
+        MAIL_PASSWORD="",
+        MAIL_FROM="app@superleuk.nl",
+        MAIL_FROM_NAME="Superleuk",
+        MAIL_PORT=port,
+        MAIL_SERVER="127.0.0.1",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=False,
+        USE_CREDENTIALS=False,
+        VALIDATE_CERTS=False,
+        TEMPLATE_FOLDER=Path(__file__).parents[3] / "app" / "templates",
+    )
+
+
+@pytest.fixture(scope="function")
+def smtp_server():
+    handler = RecordingHandler()
+    controller = aiosmtpd_controller.Controller(
+        handler, hostname="127.0.0.1", port=_free_port()
+    )
+    controller.start()
+    yield controller
+    controller.stop()
+
+
+def _invitation(address: str) -> EmailSchema:
+    return EmailSchema(
+        recipient_addresses=[address],
+        body={"base_url": "http://localhost", "sender": "Gebroeders Vroege"},
+    )
+
+
+async def test_smtp_pool_reuses_session(smtp_server):
+    outbox = Outbox(_mail_config(smtp_server.port))
+    for address in ["een@test.com", "twee@test.com", "drie@test.com"]:
+        mail = MailOutbox(
+            subject="Uitnodiging",
+            template_name="invite_email.html",
+            recipients=[address],
+            body=_invitation(address).body,
+        )
+        await outbox._send(await outbox.render(mail))
+    await outbox.pool.close()
+    assert len(smtp_server.handler.messages) == 3
+    assert smtp_server.handler.connections == 1
+
+
+async def test_outbox_delivers_queued_mail(test_client: TestClient, smtp_server):
+    outbox = Outbox(_mail_config(smtp_server.port))
+    first = await outbox.enqueue(
+        "Uitnodiging", "invite_email.html", _invitation("een@test.com")
+    )
+    second = await outbox.enqueue(
+        "Uitnodiging", "invite_email.html", _invitation("twee@test.com")
+    )
+    # Nothing is sent until the worker processes the queue
+    assert smtp_server.handler.messages == []
+    assert await outbox.process_due() == 2
+    await outbox.pool.close()
+    assert [envelope.rcpt_tos for envelope in smtp_server.handler.messages] == [
+        ["een@test.com"],
+        ["twee@test.com"],
+    ]
+    assert smtp_server.handler.connections == 1
+    for mail in (first, second):
+        await mail.refresh_from_db()
+        assert mail.status == "sent"
+        assert mail.attempts == 1
+        # The links in the body contain tokens, they are not kept
+        assert mail.body == {}
+
+
+async def test_outbox_retries_with_backoff(test_client: TestClient):
+    outbox = Outbox(_mail_config(_free_port()))
+    mail = await outbox.enqueue(
+        "Uitnodiging", "invite_email.html", _invitation("drie@test.com")
+    )
+    assert await outbox.process_due() == 0
+    await mail.refresh_from_db()
+    assert mail.status == "pending"
+    assert mail.attempts == 1
+    assert mail.last_error
+    assert mail.next_attempt_at > datetime.datetime.now(mail.next_attempt_at.tzinfo)
+    # Not due yet, so it is not picked up again
+    assert await outbox.process_due() == 0
+    await mail.refresh_from_db()
+    assert mail.attempts == 1
+    await mail.delete()
+
+
+async def test_prune_deletes_old_mails(test_client: TestClient):
+    outbox = Outbox(_mail_config(_free_port()))
+    long_ago = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        days=30
+    )
+    old_sent = await MailOutbox.create(
+        subject="Uitnodiging",
+        template_name="invite_email.html",
+        recipients=["een@test.com"],
+        body={},
+        status="sent",
+        next_attempt_at=long_ago,
+    )
+    pending = await MailOutbox.create(
+        subject="Uitnodiging",
+        template_name="invite_email.html",
+        recipients=["twee@test.com"],
+        body=_invitation("twee@test.com").body,
+        next_attempt_at=long_ago,
+    )
+    # auto_now, so the age is set with an update
+    await MailOutbox.filter(id__in=[old_sent.id, pending.id]).update(
+        last_modified_at=long_ago
+    )
+    assert await outbox.prune() == 1
+    assert not await MailOutbox.exists(id=old_sent.id)
+    assert await MailOutbox.exists(id=pending.id)
+    await pending.delete()
+
+
+async def test_send_batch_uses_single_connection(test_client: TestClient, smtp_server):
+    outbox = Outbox(_mail_config(smtp_server.port))
+    outbox.precompile_templates()
+    addresses = ["een@test.com", "twee@test.com", "drie@test.com"]
+    results = await outbox.send_batch(
+        "Uitnodiging",
+        "invite_email.html",
+        [_invitation(address) for address in addresses],
+    )
+    await outbox.pool.close()
+    assert results == [True, True, True]
+    assert len(smtp_server.handler.messages) == 3
+    assert smtp_server.handler.connections == 1
@@ -0,0 +1,55 @@
+import pytest
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+
+from app.models.tortoise import Users
+from app.services.passwords import PasswordHasher, password_hasher
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_unknown_user_checks_dummy_hash(test_client: TestClient, monkeypatch):
+    checked = []
+    verify = password_hasher.verify
+
+    def _verify(password, hashed_password):
+        checked.append(hashed_password)
+        return verify(password, hashed_password)
+
+    monkeypatch.setattr(password_hasher, "verify", _verify)
+    response = await test_client.post(
+        "/auth/login", data={"username": "onbekend@test.com", "password": "x"}
+    )
+    assert response.status_code == 401
+    assert checked == [password_hasher.dummy_hash()]
+    assert checked[0].startswith(f"$2b${password_hasher.rounds:02d}$")
+
+
+async def test_outdated_hash_is_replaced(test_client: TestClient):
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("geheim")
+    user = await Users.create(
+        email="oude_hash@test.com", hashed_password=old_hash, is_active=True
+    )
+    hasher = PasswordHasher(rounds=5)
+
+    assert hasher.rehash_later(user.id, "geheim", old_hash) is not None
+    await hasher.wait()
+    await user.refresh_from_db()
+    assert user.hashed_password.startswith("$2b$05$")
+    assert hasher.verify("geheim", user.hashed_password)
+    # Up to date now
+    assert hasher.rehash_later(user.id, "geheim", user.hashed_password) is None
+
+
+async def test_rehash_keeps_a_changed_password(test_client: TestClient):
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("geheim")
+    user = await Users.create(
+        email="gewijzigd@test.com", hashed_password=old_hash, is_active=True
+    )
+    hasher = PasswordHasher(rounds=5)
+    hasher.rehash_later(user.id, "geheim", old_hash)
+    await Users.filter(id=user.id).update(hashed_password=hasher.hash("nieuw"))
+    await hasher.wait()
+
+    await user.refresh_from_db()
+    assert hasher.verify("nieuw", user.hashed_password)
@@ -0,0 +1,129 @@
+import datetime
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.payroll import PayrollRules, compute_payroll
+
+pytestmark = [
+    pytest.mark.anyio,
+    # Deprecated pandas behaviour shouldn't go unnoticed until it is removed
+    pytest.mark.filterwarnings("error::FutureWarning"),
+]
+
+# Monday 25 March up to Sunday 7 April 2024, Monday 1 April is Tweede paasdag
+FROM_DATE, TO_DATE = datetime.date(2024, 3, 25), datetime.date(2024, 4, 7)
+
+
+def frames(hours, users, vacations=()):
+    hours = pd.DataFrame(hours, columns=["user_id", "date", "hours", "milkings"])
+    hours["date"] = pd.to_datetime(hours["date"])
+    users = pd.DataFrame(users, columns=["user_id", "melker", "part_time"])
+    vacations = pd.DataFrame(vacations, columns=["user_id", "start_date", "end_date"])
+    for column in ("start_date", "end_date"):
+        vacations[column] = pd.to_datetime(vacations[column])
+    return hours, users.set_index("user_id"), vacations
+
+
+def test_overtime_is_computed_per_week():
+    week = [datetime.date(2024, 3, 25) + datetime.timedelta(days=i) for i in range(5)]
+    hours, users, vacations = frames(
+        # 45 hours in the first week, 30 in the second (4 working days)
+        [(1, day, 9, 0) for day in week]
+        + [(1, datetime.date(2024, 4, 2) + datetime.timedelta(days=i), 7.5, 0) for i in range(4)],
+        [(1, False, False)],
+    )
+    result = compute_payroll(hours, users, vacations, FROM_DATE, TO_DATE).loc[1]
+
+    assert result["contract_hours"] == 40 + 32
+    assert result["worked_hours"] == 75
+    # The short second week doesn't cancel the overtime of the first
+    assert result["overtime_hours"] == 5
+    assert result["days_worked"] == 9
+
+
+def test_weekend_and_holiday_hours_get_a_premium():
+    hours, users, vacations = frames(
+        [
+            (1, datetime.date(2024, 3, 30), 4, 0),  # Saturday
+            (1, datetime.date(2024, 3, 31), 3, 0),  # Eerste paasdag, a Sunday
+            (1, datetime.date(2024, 4, 1), 8, 0),  # Tweede paasdag
+        ],
+        [(1, False, False)],
+    )
+    rules = PayrollRules(weekend_premium=0.5, holiday_premium=1.0)
+    result = compute_payroll(hours, users, vacations, FROM_DATE, TO_DATE, rules).loc[1]
+
+    assert result["weekend_hours"] == 4
+    assert result["holiday_hours"] == 11
+    assert result["premium_hours"] == 4 * 0.5 + 11
+
+
+def test_vacation_days_lower_the_contract():
+    hours, users, vacations = frames(
+        [],
+        [(1, False, False), (2, False, True)],
+        [
+            # Wednesday to the Monday after, clipped to the range and overlapping
+            (1, datetime.date(2024, 3, 27), datetime.date(2024, 4, 1)),
+            (1, datetime.date(2024, 3, 29), datetime.date(2024, 3, 29)),
+            (2, datetime.date(2024, 3, 1), datetime.date(2024, 3, 25)),
+        ],
+    )
+    result = compute_payroll(hours, users, vacations, FROM_DATE, TO_DATE)
+
+    # Wednesday, Thursday and Friday; the Monday is a public holiday
+    assert result.loc[1, "vacation_days"] == 3
+    assert result.loc[1, "contract_hours"] == (9 - 3) * 8
+    assert result.loc[1, "overtime_hours"] == 0
+    # Part-time: 24 hours over five days
+    assert result.loc[2, "vacation_days"] == 1
+    assert result.loc[2, "contract_hours"] == (9 - 1) * 24 / 5
+
+
+def test_milkings_only_count_for_melkers():
+    hours, users, vacations = frames(
+        [(1, datetime.date(2024, 3, 25), 8, 2), (2, datetime.date(2024, 3, 25), 8, 2)],
+        [(1, True, False), (2, False, False)],
+    )
+    result = compute_payroll(hours, users, vacations, FROM_DATE, TO_DATE)
+
+    assert result.loc[1, "milkings"] == 2
+    assert result.loc[2, "milkings"] == 0
+
+
+async def test_payroll_endpoint(
+    test_client: TestClient, admin_token: str, werknemer_token: str
+):
+    params = {"from_date": "2021-01-04", "to_date": "2021-01-10"}
+    response = await test_client.get(
+        "/admin/working_hours/payroll",
+        params=params,
+        headers={"Authorization": f"Bearer {werknemer_token}"},
+    )
+    assert response.status_code == 403
+
+    response = await test_client.get(
+        "/admin/working_hours/payroll",
+        params=params,
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+    rows = {row["email"]: row for row in response.json()}
+    # The users with the werknemer role, also without hours
+    assert set(rows) >= {
+        "werknemer@werknemer.com",
+        "monteur@monteur.com",
+        "melker@melker.com",
+    }
+    assert rows["melker@melker.com"]["melker"] is True
+    assert rows["werknemer@werknemer.com"]["contract_hours"] == 40
+    assert rows["werknemer@werknemer.com"]["overtime_hours"] == 0
+
+    response = await test_client.get(
+        "/admin/working_hours/payroll",
+        params={"from_date": "2021-01-10", "to_date": "2021-01-04"},
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 400
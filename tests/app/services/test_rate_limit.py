@@ -0,0 +1,92 @@
+import pytest
+from fastapi import HTTPException, Request
+
+from app.config import get_settings
+from app.services.rate_limit import (
+    MemoryBackend,
+    check_login_attempt,
+    client_address,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self, now: float = 960.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def test_limit_within_window():
+    clock = Clock()
+    backend = MemoryBackend(clock=clock)
+    for _ in range(3):
+        assert await backend.hit("a", limit=3, window=60) is None
+    # Until the next window is a third on its way, the three attempts weigh too much
+    assert await backend.hit("a", limit=3, window=60) == pytest.approx(80)
+    # Other keys have their own counter
+    assert await backend.hit("b", limit=3, window=60) is None
+
+
+async def test_previous_window_fades_out():
+    clock = Clock()
+    backend = MemoryBackend(clock=clock)
+    for _ in range(3):
+        assert await backend.hit("a", limit=3, window=60) is None
+
+    # A third into the next window the three attempts still weigh for two
+    clock.now = 1040.0
+    assert await backend.hit("a", limit=3, window=60) is None
+    retry_after = await backend.hit("a", limit=3, window=60)
+    assert retry_after == pytest.approx(20.0)
+    clock.now += retry_after
+    assert await backend.hit("a", limit=3, window=60) is None
+
+    # Two windows later nothing is left
+    clock.now = 1200.0
+    assert await backend.hit("a", limit=1, window=60) is None
+
+
+async def test_number_of_keys_is_bounded():
+    clock = Clock()
+    backend = MemoryBackend(max_keys=100, clock=clock)
+    for i in range(1000):
+        await backend.hit(f"ip-{i}", limit=3, window=60)
+    assert len(backend._counters) <= 100
+
+
+async def test_ip_over_the_limit_does_not_charge_the_email(monkeypatch):
+    monkeypatch.setattr(get_settings(), "login_rate_limit_per_ip", 2)
+    monkeypatch.setattr(get_settings(), "login_rate_limit_per_email", 3)
+    backend = MemoryBackend(clock=Clock())
+    for _ in range(2):
+        await check_login_attempt(backend, "10.0.0.1", "jan@test.com")
+    for _ in range(5):
+        with pytest.raises(HTTPException) as e:
+            await check_login_attempt(backend, "10.0.0.1", "jan@test.com")
+        assert e.value.status_code == 429
+    # The refused attempts didn't count for the email, Jan can still log in
+    await check_login_attempt(backend, "10.0.0.2", "jan@test.com")
+
+
+def _request(peer: str, forwarded_for: str = None) -> Request:
+    headers = []
+    if forwarded_for is not None:
+        headers.append((b"x-forwarded-for", forwarded_for.encode()))
+    return Request({"type": "http", "client": (peer, 40000), "headers": headers})
+
+
+def test_forwarded_for_from_an_untrusted_peer_is_ignored(monkeypatch):
+    monkeypatch.setattr(get_settings(), "trusted_proxies", "172.16.0.0/12")
+    assert client_address(_request("203.0.113.7", "198.51.100.1")) == "203.0.113.7"
+
+
+def test_client_is_the_rightmost_untrusted_hop(monkeypatch):
+    monkeypatch.setattr(get_settings(), "trusted_proxies", "172.16.0.0/12, 10.0.0.1")
+    # The client made up the first address, the proxies appended the others
+    request = _request("172.18.0.2", "198.51.100.1, 203.0.113.7, 10.0.0.1")
+    assert client_address(request) == "203.0.113.7"
+    # Nothing forwarded: the proxy itself
+    assert client_address(_request("172.18.0.2")) == "172.18.0.2"
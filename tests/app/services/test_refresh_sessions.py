@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.models.tortoise import RefreshSessions, Users
+from app.services.refresh_sessions import (
+    RefreshTokenReused,
+    RotatedSession,
+    refresh_sessions,
+)
+from app.services.v2.auth import Auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_rotations_of_one_token(
+    test_client: TestClient, monkeypatch
+):
+    monkeypatch.setattr(get_settings(), "refresh_token_reuse_grace", 0)
+    user = await Users.get(email="werknemer@werknemer.com")
+    refresh_token = Auth.get_refresh_token(user.email)
+    family_id = await refresh_sessions.start(user.id, refresh_token)
+
+    results = await asyncio.gather(
+        *(
+            refresh_sessions.rotate(
+                refresh_token["jti"], Auth.get_refresh_token(user.email)
+            )
+            for _ in range(5)
+        ),
+        return_exceptions=True,
+    )
+    # One request wins, the first loser revokes the family and later ones find it
+    # revoked already
+    rotated = [result for result in results if isinstance(result, RotatedSession)]
+    assert len(rotated) == 1
+    assert rotated[0].email == user.email
+    assert rotated[0].family_id == family_id
+    assert any(isinstance(result, RefreshTokenReused) for result in results)
+    assert all(
+        result is None or isinstance(result, (RotatedSession, RefreshTokenReused))
+        for result in results
+    )
+    assert not await RefreshSessions.filter(family_id=family_id, revoked=False).exists()
+
+
+async def test_logout_ends_the_family(test_client: TestClient):
+    user = await Users.get(email="werknemer@werknemer.com")
+    first_token = Auth.get_refresh_token(user.email)
+    family_id = await refresh_sessions.start(user.id, first_token)
+    second_token = Auth.get_refresh_token(user.email)
+    assert await refresh_sessions.rotate(first_token["jti"], second_token)
+
+    await refresh_sessions.end(second_token["token"])
+    third_token = Auth.get_refresh_token(user.email)
+    assert await refresh_sessions.rotate(second_token["jti"], third_token) is None
+    assert await RefreshSessions.filter(family_id=family_id, revoked=True).count() == 2
+
+
+async def test_one_extra_rotation_within_the_grace_window(test_client: TestClient):
+    user = await Users.get(email="werknemer@werknemer.com")
+    refresh_token = Auth.get_refresh_token(user.email)
+    family_id = await refresh_sessions.start(user.id, refresh_token)
+
+    for _ in range(2):
+        result = await refresh_sessions.rotate(
+            refresh_token["jti"], Auth.get_refresh_token(user.email)
+        )
+        assert result.family_id == family_id
+        assert result.email == user.email
+    assert await RefreshSessions.filter(family_id=family_id, revoked=False).count() == 3
+
+    # A third exchange is a replay, also within the grace
+    with pytest.raises(RefreshTokenReused):
+        await refresh_sessions.rotate(
+            refresh_token["jti"], Auth.get_refresh_token(user.email)
+        )
+    assert not await RefreshSessions.filter(family_id=family_id, revoked=False).exists()
+
+
+async def test_concurrent_reuses_within_the_grace_window(test_client: TestClient):
+    user = await Users.get(email="werknemer@werknemer.com")
+    refresh_token = Auth.get_refresh_token(user.email)
+    await refresh_sessions.start(user.id, refresh_token)
+
+    results = await asyncio.gather(
+        *(
+            refresh_sessions.rotate(
+                refresh_token["jti"], Auth.get_refresh_token(user.email)
+            )
+            for _ in range(4)
+        ),
+        return_exceptions=True,
+    )
+    # The rotation itself and the one extra exchange
+    rotated = [result for result in results if isinstance(result, RotatedSession)]
+    assert len(rotated) <= 2
+    assert any(isinstance(result, RefreshTokenReused) for result in results)
@@ -0,0 +1,117 @@
+import datetime
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from app.config import Settings
+from app.services.token_keys import KeyRing
+
+pytestmark = pytest.mark.anyio
+
+CLAIMS = {"sub": "werknemer@werknemer.com", "scope": "login", "jti": "a" * 32}
+
+
+def write_private_key(path, key):
+    path.write_bytes(
+        key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+    )
+
+
+def write_public_key(path, key):
+    path.write_bytes(
+        key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+    )
+
+
+def claims(**extra):
+    expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        minutes=5
+    )
+    return {**CLAIMS, "exp": expires, **extra}
+
+
+def test_secret_only():
+    key_ring = KeyRing.from_settings(Settings())
+    token = key_ring.encode(claims())
+    assert "kid" not in jwt.get_unverified_header(token)
+    assert key_ring.decode(token)["sub"] == CLAIMS["sub"]
+    assert key_ring.jwks() == {"keys": []}
+
+
+def test_rotation_keeps_old_tokens_valid(tmp_path):
+    old_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    new_key = ec.generate_private_key(ec.SECP256R1())
+    write_private_key(tmp_path / "2024-01.pem", old_key)
+    before = KeyRing.from_settings(Settings(token_keys_dir=tmp_path))
+    old_token = before.encode(claims())
+    assert jwt.get_unverified_header(old_token) == {
+        "alg": "RS256",
+        "kid": "2024-01",
+        "typ": "JWT",
+    }
+
+    # The old private key is replaced by its public half, only to verify
+    write_public_key(tmp_path / "2024-01.pem", old_key)
+    write_private_key(tmp_path / "2024-06.pem", new_key)
+    after = KeyRing.from_settings(Settings(token_keys_dir=tmp_path))
+    new_token = after.encode(claims())
+    assert jwt.get_unverified_header(new_token)["kid"] == "2024-06"
+    assert jwt.get_unverified_header(new_token)["alg"] == "ES256"
+    assert after.decode(old_token)["sub"] == CLAIMS["sub"]
+    assert after.decode(new_token)["sub"] == CLAIMS["sub"]
+
+    jwks = after.jwks()["keys"]
+    assert [key["kid"] for key in jwks] == ["2024-01", "2024-06"]
+    assert all("d" not in key for key in jwks)
+
+
+def test_secret_tokens_while_switching(tmp_path):
+    write_private_key(tmp_path / "2024-01.pem", ec.generate_private_key(ec.SECP256R1()))
+    secret_token = KeyRing.from_settings(Settings()).encode(claims())
+
+    switching = KeyRing.from_settings(Settings(token_keys_dir=tmp_path))
+    assert switching.decode(secret_token)["sub"] == CLAIMS["sub"]
+    switched = KeyRing.from_settings(
+        Settings(token_keys_dir=tmp_path, token_accept_secret=False)
+    )
+    with pytest.raises(jwt.JWTError):
+        switched.decode(secret_token)
+
+
+def test_rejects_unknown_and_forged_tokens(tmp_path):
+    write_private_key(tmp_path / "2024-01.pem", ec.generate_private_key(ec.SECP256R1()))
+    key_ring = KeyRing.from_settings(Settings(token_keys_dir=tmp_path))
+    other_key = ec.generate_private_key(ec.SECP256R1())
+
+    unknown = jwt.encode(claims(), other_key, algorithm="ES256", headers={"kid": "x"})
+    with pytest.raises(jwt.JWTError):
+        key_ring.decode(unknown)
+    forged = jwt.encode(
+        claims(), other_key, algorithm="ES256", headers={"kid": "2024-01"}
+    )
+    with pytest.raises(jwt.JWTError):
+        key_ring.decode(forged)
+    with pytest.raises(jwt.JWTError):
+        key_ring.decode("")
+
+
+async def test_jwks_endpoint(test_client: TestClient, tmp_path, monkeypatch):
+    write_private_key(tmp_path / "2024-01.pem", ec.generate_private_key(ec.SECP256R1()))
+    key_ring = KeyRing.from_settings(Settings(token_keys_dir=tmp_path))
+    monkeypatch.setattr("app.api.jwks.get_key_ring", lambda: key_ring)
+
+    response = await test_client.get("http://test/api/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "public, max-age=300"
+    assert response.json() == key_ring.jwks()
+    assert response.json()["keys"][0]["kid"] == "2024-01"
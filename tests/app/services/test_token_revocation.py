@@ -0,0 +1,57 @@
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.models.tortoise import RevokedTokens
+from app.services.token_revocation import RevocationList
+from app.services.v2.auth import Auth
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_revocations_of_other_workers_are_synced(test_client: TestClient):
+    worker_a, worker_b = RevocationList(), RevocationList()
+    await worker_b.sync()
+    access_token = Auth.get_access_token("werknemer@werknemer.com")
+
+    assert await worker_a.revoke_token(access_token["token"])
+    assert worker_a.is_revoked(access_token["jti"])
+    assert not worker_b.is_revoked(access_token["jti"])
+    await worker_b.sync()
+    assert worker_b.is_revoked(access_token["jti"])
+
+
+async def test_revocations_that_commit_late_are_synced(test_client: TestClient):
+    worker_a, worker_b = RevocationList(), RevocationList()
+    await worker_b.sync()
+    access_token = Auth.get_access_token("werknemer@werknemer.com")
+
+    # Created before the last sync of worker b, but committed after it
+    assert await worker_a.revoke_token(access_token["token"])
+    await RevokedTokens.filter(jti=access_token["jti"]).update(
+        created_at=datetime.datetime.now(datetime.timezone.utc)
+        - datetime.timedelta(seconds=30)
+    )
+    await worker_b.sync()
+    assert worker_b.is_revoked(access_token["jti"])
+
+
+async def test_expired_revocations_are_pruned(test_client: TestClient):
+    revocation_list = RevocationList()
+    expired = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(
+        minutes=1
+    )
+    valid = expired + datetime.timedelta(days=1)
+    await revocation_list.revoke("a" * 32, expired)
+    await revocation_list.revoke("b" * 32, valid)
+
+    await revocation_list.prune()
+    assert not revocation_list.is_revoked("a" * 32)
+    assert revocation_list.is_revoked("b" * 32)
+    assert not await RevokedTokens.exists(jti="a" * 32)
+    assert await RevokedTokens.exists(jti="b" * 32)
+
+
+async def test_foreign_tokens_are_not_revoked(test_client: TestClient):
+    assert not await RevocationList().revoke_token("geen.geldige.token")
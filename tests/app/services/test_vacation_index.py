@@ -0,0 +1,145 @@
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.helpers.date_functions import public_holidays
+from app.models.tortoise import Users, Vakanties, WorkingHours
+from app.services.vacation_index import VacationIndex
+
+pytestmark = pytest.mark.anyio
+
+d = datetime.date
+
+
+def test_overlapping_and_adjacent_vacations_are_merged():
+    index = VacationIndex(
+        [
+            (1, d(2031, 3, 10), d(2031, 3, 14)),
+            (1, d(2031, 3, 12), d(2031, 3, 16)),
+            (1, d(2031, 3, 17), d(2031, 3, 18)),
+            (1, d(2031, 5, 1), d(2031, 5, 1)),
+            (1, None, d(2031, 6, 1)),
+            (2, d(2031, 3, 20), d(2031, 3, 21)),
+        ]
+    )
+
+    assert index.vacation(1, d(2031, 3, 15)) == (d(2031, 3, 10), d(2031, 3, 18))
+    assert index.vacation(1, d(2031, 3, 9)) is None
+    assert index.vacation(1, d(2031, 3, 19)) is None
+    assert index.is_vacation_day(1, d(2031, 5, 1))
+    assert not index.is_vacation_day(1, d(2031, 5, 2))
+    assert not index.is_vacation_day(2, d(2031, 3, 15))
+    assert not index.is_vacation_day(3, d(2031, 3, 15))
+
+
+def test_vacation_days_are_clipped_to_the_range():
+    index = VacationIndex(
+        [
+            (1, d(2031, 3, 10), d(2031, 3, 12)),
+            (1, d(2031, 3, 14), d(2031, 3, 20)),
+        ]
+    )
+
+    assert index.vacation_days(1, d(2031, 3, 11), d(2031, 3, 15)) == [
+        d(2031, 3, 11),
+        d(2031, 3, 12),
+        d(2031, 3, 14),
+        d(2031, 3, 15),
+    ]
+    assert index.vacation_days(1, d(2031, 3, 21), d(2031, 3, 31)) == []
+    assert index.vacation_days(2, d(2031, 3, 1), d(2031, 3, 31)) == []
+
+
+def test_week_off_skips_the_weekend_and_public_holidays():
+    # Tweede paasdag is Monday 14 April 2031
+    index = VacationIndex(
+        [
+            (1, d(2031, 4, 15), d(2031, 4, 18)),
+            (2, d(2031, 4, 14), d(2031, 4, 17)),
+        ]
+    )
+
+    assert index.week_off(1, d(2031, 4, 14))
+    assert not index.week_off(2, d(2031, 4, 14))
+    assert not index.week_off(3, d(2031, 4, 14))
+
+
+async def test_week_overview_counts_a_week_off_as_submitted(
+    test_client: TestClient, werknemer_token: str
+):
+    werknemer = await Users.get(email="werknemer@werknemer.com")
+    await Vakanties.create(
+        start_date=d(2031, 6, 6), end_date=d(2031, 6, 13), user=werknemer
+    )
+
+    response = await test_client.get(
+        "/working_hours/week_overview/",
+        params={"from_date": "2031-06-02", "to_date": "2031-06-15"},
+        headers={"Authorization": f"Bearer {werknemer_token}"},
+    )
+    assert response.status_code == 200
+    weeks = {week["week"]: week for week in response.json()}
+    # Only the Friday of week 23 is a vacation day, the rest is missing
+    assert weeks[23]["submitted"] is False
+    assert weeks[23]["vacation_days"] == ["2031-06-06", "2031-06-07", "2031-06-08"]
+    assert weeks[24]["submitted"] is True
+    assert len(weeks[24]["vacation_days"]) == 5
+
+    response = await test_client.get(
+        "http://test/api/v1/working_hours/week_overview/",
+        params={
+            "from_date": "2031-06-02",
+            "to_date": "2031-06-15",
+            "user_id": werknemer.id,
+        },
+        headers={"Authorization": f"Bearer {werknemer_token}"},
+    )
+    assert response.status_code == 200
+    weeks = {week["week"]: week for week in response.json()["week_data"]}
+    assert weeks[23]["submitted"] is False
+    assert weeks[24]["submitted"] is True
+
+
+async def test_vacation_conflicts(
+    test_client: TestClient, admin_token: str, werknemer_token: str
+):
+    monteur = await Users.get(email="monteur@monteur.com")
+    await Vakanties.create(
+        start_date=d(2031, 8, 4), end_date=d(2031, 8, 8), user=monteur
+    )
+    for day, hours in ((d(2031, 8, 1), 8), (d(2031, 8, 5), 4), (d(2031, 8, 6), 0)):
+        await WorkingHours.create(
+            date=day,
+            hours=hours,
+            milkings=0,
+            description="",
+            created_by=monteur.email,
+            user=monteur,
+        )
+
+    params = {"from_date": "2031-08-01", "to_date": "2031-08-31"}
+    response = await test_client.get(
+        "/admin/working_hours/vacation_conflicts",
+        params=params,
+        headers={"Authorization": f"Bearer {werknemer_token}"},
+    )
+    assert response.status_code == 403
+
+    response = await test_client.get(
+        "/admin/working_hours/vacation_conflicts",
+        params=params,
+        headers={"Authorization": f"Bearer {admin_token}"},
+    )
+    assert response.status_code == 200
+    # The day before the vacation and the empty day are no conflicts
+    assert [
+        (row["email"], row["date"], row["vacation_start"], row["vacation_end"])
+        for row in response.json()
+    ] == [("monteur@monteur.com", "2031-08-05", "2031-08-04", "2031-08-08")]
+
+
+def test_public_holidays_are_cached_and_read_only():
+    assert public_holidays(2025) is public_holidays(2025)
+    with pytest.raises(TypeError):
+        public_holidays(2025)[datetime.date(2025, 6, 1)] = "Zondag"
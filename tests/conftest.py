@@ -6,12 +6,15 @@ from tortoise import Tortoise
 
 from app.config import Settings
 from app.main import create_application
+from app.middleware.query_stats import instrument_connection
 from app.models.pydantic import AllowedUsersCreateSchema, MachineCreateSchema
 from app.models.pydantic_models.auth import RegisterUserRequest
+from app.services.rate_limit import MemoryBackend
 from app.services.v2.mail import fm
 from app.models.tortoise import Users
 from pathlib import Path
 
+from tests.fixtures.query_stats import *
 from tests.fixtures.working_hours import *
 
 
@@ -48,6 +51,7 @@ async def init_db(
         modules={"models": ["app.models.tortoise"]},
         _create_db=create_db,
     )
+    instrument_connection()
     if create_schemas:
         await Tortoise.generate_schemas()
     if create_test_data:
@@ -74,6 +78,14 @@ async def test_client(anyio_backend):
     print("Database dropped")
 
 
+@pytest.fixture(scope="function", autouse=True)
+def login_rate_limit_backend(monkeypatch):
+    # All tests log in from the same client, every test starts without attempts
+    backend = MemoryBackend()
+    monkeypatch.setattr("app.services.rate_limit.login_backend", backend)
+    return backend
+
+
 @pytest.fixture(scope="function")
 async def admin_token(test_client):
     # Get admin access token
@@ -0,0 +1,30 @@
+from contextlib import asynccontextmanager
+
+import pytest
+
+from app.middleware.query_stats import QueryStats, query_stats
+
+
+@pytest.fixture(scope="function")
+def max_queries():
+    """
+    Fails the test when the code in the block issues more queries than allowed.
+
+        async with max_queries(2):
+            await test_client.get("/vakanties/all")
+    """
+
+    @asynccontextmanager
+    async def _max_queries(limit: int):
+        stats = QueryStats(parent=query_stats.get(), record_queries=True)
+        token = query_stats.set(stats)
+        try:
+            yield stats
+        finally:
+            query_stats.reset(token)
+        assert stats.count <= limit, (
+            f"{stats.count} queries uitgevoerd, maximaal {limit} verwacht:\n"
+            + "\n".join(stats.queries)
+        )
+
+    return _max_queries